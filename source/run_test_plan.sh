@@ -8,7 +8,18 @@ source ./.venv/bin/activate
 # Set the env variables from this project
 set -o allexport; source .env; set +o allexport
 
-# Run 2 sets of tests in parallel: the non-locust user apps and the locust test plan
+# The host of the test run, LOCUST_HOST or else the host of locust.conf
+host="${LOCUST_HOST:-$(sed -n 's/^host *= *//p' locust.conf)}"
 
-python3 ./tests-dev/appviewer_requestshtml.py & \
-locust --headless -f ./tests/test_plan_normal.py --users 10 --run-time 60s --html ./reports/locust-report-normal.html
+# Run 2 sets of tests in parallel: the non-locust user apps and the locust test plan.
+# Keep the exit status of a failing run, so that its results are still ingested.
+
+status=0
+python3 ./tests-dev/appviewer_browser.py & \
+locust --headless -f ./tests/test_plan_normal.py --host "$host" --users 10 --run-time 60s \
+    --html ./reports/locust-report-normal.html || status=$?
+
+# Keep the results of the test plan run in the results store
+python3 ./tools/results_store.py ingest --test-plan normal --host "$host" --users 10
+
+exit $status
@@ -1,12 +1,17 @@
 import logging
 import os
+import sys
 import time
 import warnings
 
 from locust import HttpUser, between, task
-from lxml import etree
 from requests_html import HTML, AsyncHTMLSession
 
+# Use the helper modules of the test plans in the tests directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from form_parsing import get_first_option_values  # noqa: E402
+
 # import asyncio
 # from io import StringIO
 # import requests
@@ -100,35 +105,23 @@ class CreatingUser(HttpUser):
             logger.debug("create JupyterLab app response.status_code = %s, %s", response.status_code, response.reason)
             html_content = response.content
 
-        # Parse the HTML content
-        parser = etree.HTMLParser()
-        tree = etree.fromstring(html_content, parser)
-
         # Must first get the volume, flavor, and environment values from the form
-        volume = None
-        flavor = None
-        environment = None
-
-        # Extract the form values of the option elements using XPath
+        # Extract the values of the first option elements of the select elements, for example
         # Flavor: <select name="flavor" class="form-control" rows="3" id="id_flavor">
         # <option value="28" selected>2 vCPU, 4 GB RAM</option></select>
-        el_volume = tree.xpath('//select[@name="volume"]/option')
-        el_flavor = tree.xpath('//select[@name="flavor"]/option')
-        el_environment = tree.xpath('//select[@name="environment"]/option')
+        form_values = get_first_option_values(app_create_url, html_content, ("volume", "flavor", "environment"))
+
+        volume = form_values["volume"]
+        flavor = form_values["flavor"]
+        environment = form_values["environment"]
 
-        if el_volume:
-            volume = el_volume[0].get("value")
-        else:
+        if volume is None:
             print("Option element VOLUME not found")
 
-        if el_flavor:
-            flavor = el_flavor[0].get("value")
-        else:
+        if flavor is None:
             print("Option element FLAVOR not found")
 
-        if el_environment:
-            environment = el_environment[0].get("value")
-        else:
+        if environment is None:
             print("Option element ENVIRONMENT not found")
 
         print(f"The parsed form values to use are: volume={volume}, flavor={flavor}, environment={environment}")
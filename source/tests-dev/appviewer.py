@@ -1,9 +1,17 @@
 """A Locust test file."""
 
 import logging
+import os
+import sys
+import time
 import warnings
 
-from locust import HttpUser, between, task
+from appviewer_browser import open_user_app_sync, stop_browser_pool
+from locust import HttpUser, User, between, events, task
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from synthetic_requests import log_synthetic_request  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -32,3 +40,34 @@ class AppViewerUser(HttpUser):
         APP_SHINYPROXY += "/app/loadtest-shinyproxy2"
         logger.info("making GET request to URL: %s", APP_SHINYPROXY)
         self.client.get(APP_SHINYPROXY, name="user-app-shiny-proxy")
+
+
+class BrowserAppViewerUser(User):
+    """Simulates a non-authenticated user that opens a user app in a headless browser, as a real visitor does.
+    Unlike AppViewerUser, this creates a pod on k8s for each app open.
+    The browsers are borrowed from a browser pool that is shared by the users, see appviewer_browser.py.
+    The time until the app is rendered is reported as a request of type BROWSER, which is not counted in the
+    Aggregated row, see synthetic_requests.py.
+    """
+
+    weight = 1
+    wait_time = between(30, 60)
+
+    @task
+    def open_user_app_in_browser(self):
+        app_url = self.host.replace("https://", "https://loadtest-shinyproxy2.") + "/app/loadtest-shinyproxy2"
+        logger.info("opening user app in a browser, URL: %s", app_url)
+        started = time.perf_counter()
+        result = open_user_app_sync(app_url)
+        # The render time of the browser is from the start of the navigation, without the wait for a browser
+        rendered_time = (
+            result.time_to_rendered if result.time_to_rendered is not None else time.perf_counter() - started
+        )
+        log_synthetic_request(
+            self.environment, "BROWSER", "user-app-rendered", rendered_time * 1000, error=result.error
+        )
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    stop_browser_pool()
@@ -0,0 +1,271 @@
+"""
+Handles opening user apps.
+This implementation does not use Locust and does not work through Locust.
+It can however be run concurrently with Locust load tests to put additional
+realistic load on the system.
+
+The apps are opened concurrently by an asyncio engine that borrows headless Chromium browsers from a pool
+of long-lived browsers, see browser_pool.py. Each app open uses its own incognito browser context
+so that it gets its own shinyproxy session and pod.
+The number of concurrent app opens is bounded, and the start times of the app opens follow a ramp profile.
+The time to first byte and the time until the app is rendered are recorded per app open and written as JSON.
+The app is rendered when the app inside the iframe of the shinyproxy app page has rendered its outputs,
+not when the app page itself has loaded, since the page contains the iframe before the app container is up.
+
+Note that shiny proxy pods are configured with
+- heartbeat-rate=10s
+- heartbeat-timeout=60s
+"""
+
+import asyncio
+import json
+import logging
+import os
+import statistics
+import warnings
+from dataclasses import asdict, dataclass
+from time import perf_counter, sleep, time
+
+from browser_pool import BrowserPool, BrowserPoolThread
+from gevent.lock import BoundedSemaphore
+
+logger = logging.getLogger(__name__)
+
+warnings.filterwarnings("ignore")
+
+
+# SETTINGS
+
+# The user app URLs to open
+URL_LIST = [
+    "https://loadtest-shinyproxy.serve-dev.scilifelab.se/app/loadtest-shinyproxy"
+    # "https://loadtest-shinyproxy.serve-staging.serve-dev.scilifelab.se/app/loadtest-shinyproxy"
+    # "https://demo-bayesianlinmod.serve.scilifelab.se/app/demo-bayesianlinmod",
+    # "https://demo-markovchain.serve.scilifelab.se/app/demo-markovchain"
+]
+
+# The maximum number of apps are allowed to be opened
+MAX_APPS_PER_APP_TYPE_LIMIT = 100
+
+# The initial delay to wait before opening any user apps
+INITIAL_DELAY_SECONDS = 10
+
+# The max number of apps that are being opened at the same time
+MAX_CONCURRENT_APP_OPENS = 10
+
+# The number of browsers in the browser pool, the max number of apps that are opened in each browser at a time,
+# and the number of app opens after which a browser is replaced by a new browser
+BROWSER_POOL_SIZE = 2
+PAGES_PER_BROWSER = 5
+MAX_RENDERS_PER_BROWSER = 50
+
+# The ramp profile of the app opens, as points of (seconds since the start, fraction of the app opens started).
+# The start times are linearly interpolated between the points. Examples:
+# [(0, 1.0)]                                      all apps at once, a pod startup spike
+# [(60, 1.0)]                                     evenly spread over one minute
+# [(0, 0.5), (30, 0.5), (30, 1.0)]                half of the apps at once, the other half 30 seconds later
+RAMP_PROFILE: list[tuple[float, float]] = [(0, 1.0)]
+
+# The CSS selector of the iframe of the app on the shinyproxy app page. The iframe is in the initial HTML of the
+# page, and shinyproxy loads the app into it once the app container is up.
+APP_FRAME_SELECTOR = "#shinyframe"
+# The CSS selector of an element inside the app frame that shows that the app is rendered,
+# the outputs of a Shiny app once they are bound to the server
+APP_RENDERED_SELECTOR = ".shiny-bound-output"
+
+# The max time to wait for an app to be rendered
+RENDER_TIMEOUT_SECONDS = 120
+
+# The JSON file of the results of the app opens
+RESULTS_FILE = "./reports/appviewer-results.json"
+
+
+@dataclass
+class AppOpenResult:
+    """The result of opening a user app. Times are in seconds."""
+
+    url: str
+    # The scheduled start time of the app open according to the ramp profile, since the start of the run
+    scheduled_at: float
+    # The actual start time, which is later than scheduled if the max number of concurrent app opens was reached
+    started_at: float | None = None
+    status: int | None = None
+    # The time from the start of the navigation to the first byte of the app page
+    ttfb: float | None = None
+    # The time from the start of the navigation until the app is rendered
+    time_to_rendered: float | None = None
+    error: str | None = None
+
+
+def apps_runner(n_requests: int = 1):
+    """
+    Opens user apps.
+        This results in pods created.
+
+        :param n_requests int: The number of instances of each app to be opened.
+    """
+
+    if n_requests > MAX_APPS_PER_APP_TYPE_LIMIT:
+        raise Exception(f"Too many instances of user apps requested to be opened. Max = {MAX_APPS_PER_APP_TYPE_LIMIT}")
+
+    start_time = time()
+
+    sleep(INITIAL_DELAY_SECONDS)
+    logger.info("START apps_runner")
+
+    urls = [url for url in URL_LIST for _ in range(n_requests)]
+    results = asyncio.run(open_apps_concurrently(urls))
+
+    n_fails = sum(1 for result in results if result.error)
+    duration_s = time() - start_time
+    logger.info("Duration (sec) for opening %s user apps = %s. Nr failures = %s", len(urls), duration_s, n_fails)
+    log_summary(results)
+    write_results(results)
+    return results
+
+
+async def open_apps_concurrently(urls: list[str]) -> list[AppOpenResult]:
+    """Opens the apps concurrently in the browsers of a browser pool, starting them according to the ramp profile."""
+    offsets = get_start_offsets(len(urls), RAMP_PROFILE)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_APP_OPENS)
+
+    async with create_browser_pool() as browser_pool:
+        run_start = perf_counter()
+        return await asyncio.gather(
+            *(_open_app_at(browser_pool, semaphore, url, offset, run_start) for url, offset in zip(urls, offsets))
+        )
+
+
+async def _open_app_at(browser_pool, semaphore, url: str, offset: float, run_start: float) -> AppOpenResult:
+    await asyncio.sleep(max(0.0, run_start + offset - perf_counter()))
+    async with semaphore, browser_pool.browser() as browser:
+        result = AppOpenResult(url, scheduled_at=offset, started_at=perf_counter() - run_start)
+        await open_user_app_async(browser, url, result)
+        return result
+
+
+def create_browser_pool() -> BrowserPool:
+    return BrowserPool(BROWSER_POOL_SIZE, PAGES_PER_BROWSER, MAX_RENDERS_PER_BROWSER)
+
+
+async def open_user_app_async(browser, url: str, result: AppOpenResult):
+    """
+    Opens a user app as an anonymous user in a new incognito context of the browser.
+    This results in a pod created on k8s.
+    """
+    logger.info("Opening user app url: %s", url)
+
+    # A separate context per app open, so that the apps do not share the shinyproxy session cookies
+    context = await browser.createIncognitoBrowserContext()
+    try:
+        page = await context.newPage()
+        response = await page.goto(url, waitUntil="domcontentloaded", timeout=RENDER_TIMEOUT_SECONDS * 1000)
+        result.status = response.status if response else None
+        # Wait for the app inside the frame, which is only loaded when the proxy to the app container is up
+        frame_element = await page.waitForSelector(APP_FRAME_SELECTOR, timeout=RENDER_TIMEOUT_SECONDS * 1000)
+        frame = await frame_element.contentFrame()
+        await frame.waitForSelector(APP_RENDERED_SELECTOR, timeout=RENDER_TIMEOUT_SECONDS * 1000)
+
+        # The navigation timing of the browser is relative to the start of the navigation, in ms
+        result.ttfb = await page.evaluate("() => performance.getEntriesByType('navigation')[0].responseStart") / 1000
+        result.time_to_rendered = await page.evaluate("() => performance.now()") / 1000
+
+        if result.status != 200:
+            result.error = f"Status code {result.status}"
+    except Exception as ex:
+        result.error = str(ex) or type(ex).__name__
+        logger.warning("Unable to open a user app. Error: %s", result.error)
+    finally:
+        await context.close()
+
+
+def get_start_offsets(n_apps: int, ramp_profile: list[tuple[float, float]]) -> list[float]:
+    """Returns the start time in seconds of each app open, interpolated from the points of the ramp profile."""
+    offsets = []
+    for i in range(n_apps):
+        fraction = i / n_apps
+        previous_seconds, previous_fraction = 0.0, 0.0
+        offset = ramp_profile[-1][0]
+        for seconds, started_fraction in ramp_profile:
+            if started_fraction > fraction:
+                offset = previous_seconds + (seconds - previous_seconds) * (fraction - previous_fraction) / (
+                    started_fraction - previous_fraction
+                )
+                break
+            previous_seconds, previous_fraction = seconds, started_fraction
+        offsets.append(offset)
+    return offsets
+
+
+def log_summary(results: list[AppOpenResult]):
+    for name in ("ttfb", "time_to_rendered"):
+        values = sorted(getattr(result, name) for result in results if getattr(result, name) is not None)
+        if values:
+            logger.info(
+                "%s (sec) of %s apps: median = %.2f, p95 = %.2f, max = %.2f",
+                name,
+                len(values),
+                statistics.median(values),
+                values[min(len(values) - 1, int(0.95 * len(values)))],
+                values[-1],
+            )
+
+
+def write_results(results: list[AppOpenResult]):
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, "w") as f:
+        json.dump([asdict(result) for result in results], f, indent=2)
+    logger.info("Wrote the results of the app opens to %s", RESULTS_FILE)
+
+
+_browser_pool_thread: BrowserPoolThread | None = None
+# Held while the browser pool is started, so that concurrent first callers share one pool
+_browser_pool_lock = BoundedSemaphore()
+
+
+def open_user_app_sync(url: str) -> AppOpenResult:
+    """
+    Opens a user app that requires js support as an anonymous user, from synchronous code such as a Locust user,
+    see BrowserAppViewerUser in appviewer.py.
+    The browser is borrowed from a browser pool that is started on the first call and shared by all callers.
+    This results in a pod created on k8s.
+    :param url: The app URL.
+    """
+    global _browser_pool_thread
+    with _browser_pool_lock:
+        if _browser_pool_thread is None:
+            browser_pool_thread = BrowserPoolThread(create_browser_pool())
+            browser_pool_thread.start()
+            _browser_pool_thread = browser_pool_thread
+
+    async def open_app() -> AppOpenResult:
+        async with _browser_pool_thread.pool.browser() as browser:
+            result = AppOpenResult(url, scheduled_at=0.0, started_at=0.0)
+            await open_user_app_async(browser, url, result)
+            return result
+
+    return _browser_pool_thread.run(open_app())
+
+
+def stop_browser_pool():
+    """Closes the browsers of the browser pool of open_user_app_sync, if it has been started."""
+    global _browser_pool_thread
+    with _browser_pool_lock:
+        if _browser_pool_thread is not None:
+            _browser_pool_thread.stop()
+            _browser_pool_thread = None
+
+
+# Private functions
+
+
+def __test_open_sync(n_requests):
+    apps_runner(n_requests)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    loglevel = logging.getLevelName(logger.getEffectiveLevel())
+    print(f"Begin running appviewer_browser.py using logging level {loglevel}")
+    apps_runner(4)
+    print("Completed running appviewer_browser.py")
@@ -0,0 +1,201 @@
+"""
+A pool of long-lived headless Chromium browsers for rendering user apps.
+
+Launching a browser takes seconds and hundreds of MB of memory, so the browsers are launched once when the pool
+is started and then lent out, so that the browser startup is not part of the measured latency. Each browser
+is lent to at most pages_per_browser borrowers at a time, which each open their own page. A browser is health
+checked when it is borrowed and replaced if it does not respond, and it is closed and replaced by a new browser
+after max_renders_per_browser renders, to bound the memory that Chromium accumulates over time.
+
+The pool runs on asyncio. Synchronous code, such as Locust users that run on gevent, uses it through
+BrowserPoolThread, which runs the pool on an event loop in a separate native thread.
+"""
+
+import asyncio
+import logging
+from collections.abc import Coroutine
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+import gevent
+from gevent import monkey
+from pyppeteer import launch
+from pyppeteer.browser import Browser
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+DEFAULT_LAUNCH_OPTIONS = {"headless": True, "ignoreHTTPSErrors": True, "args": ["--no-sandbox"]}
+
+# The max time in seconds that a browser may take to answer the health check
+HEALTH_CHECK_TIMEOUT_SECONDS = 5
+
+
+@dataclass(eq=False)
+class _PooledBrowser:
+    browser: Browser
+    renders: int = 0
+    active: int = 0
+    retiring: bool = False
+
+
+class BrowserPool:
+    """Lends out pre-launched browsers, health checks them and recycles them after a number of renders."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        pages_per_browser: int = 5,
+        max_renders_per_browser: int = 50,
+        launch_options: dict | None = None,
+    ):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.max_renders_per_browser = max_renders_per_browser
+        self.launch_options = dict(launch_options or DEFAULT_LAUNCH_OPTIONS)
+        self._browsers: list[_PooledBrowser] = []
+        self._n_launching = 0
+        self._condition = asyncio.Condition()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Launches the browsers of the pool."""
+        logger.info("Launching %s browsers into the browser pool", self.size)
+        self._n_launching += self.size
+        await asyncio.gather(*(self._launch() for _ in range(self.size)))
+        if not self._browsers:
+            raise Exception("No browser could be launched into the browser pool")
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for pooled in self._browsers:
+            await self._close_browser(pooled)
+        self._browsers.clear()
+
+    @asynccontextmanager
+    async def browser(self):
+        """Borrows a healthy browser for the duration of the async with block."""
+        while True:
+            pooled = await self._lease()
+            if await self._is_healthy(pooled):
+                break
+            logger.warning("A browser of the browser pool failed the health check. Replacing it.")
+            await self._release(pooled, retire=True, count_render=False)
+
+        try:
+            yield pooled.browser
+        finally:
+            await self._release(pooled)
+
+    async def _lease(self) -> _PooledBrowser:
+        async with self._condition:
+            await self._condition.wait_for(self._can_lease)
+            if not self._browsers:
+                raise Exception("The browser pool has no browsers left, since none could be launched")
+            pooled = min(self._available(), key=lambda candidate: candidate.active)
+            pooled.active += 1
+            return pooled
+
+    def _available(self) -> list[_PooledBrowser]:
+        return [
+            p
+            for p in self._browsers
+            if not p.retiring
+            and p.active < self.pages_per_browser
+            and p.renders + p.active < self.max_renders_per_browser
+        ]
+
+    def _can_lease(self) -> bool:
+        # Also stop waiting when the pool is empty and no browser is being launched, to raise instead
+        return bool(self._available()) or (not self._browsers and not self._n_launching)
+
+    async def _release(self, pooled: _PooledBrowser, retire: bool = False, count_render: bool = True):
+        async with self._condition:
+            pooled.active -= 1
+            pooled.renders += int(count_render)
+            if retire or pooled.renders >= self.max_renders_per_browser:
+                pooled.retiring = True
+            if pooled.retiring and pooled.active == 0 and pooled in self._browsers:
+                self._browsers.remove(pooled)
+                self._n_launching += 1
+                # Replace the browser in the background, so that the borrower is not delayed
+                task = asyncio.create_task(self._replace(pooled))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._condition.notify_all()
+
+    async def _replace(self, pooled: _PooledBrowser):
+        logger.debug("Replacing a browser of the browser pool after %s renders", pooled.renders)
+        await self._close_browser(pooled)
+        await self._launch()
+
+    async def _launch(self):
+        """Launches a browser into the pool. The caller has counted it in _n_launching."""
+        try:
+            browser = await launch(**self.launch_options)
+        except Exception as ex:
+            logger.error("Unable to launch a browser into the browser pool. Error: %s", ex)
+            browser = None
+        async with self._condition:
+            self._n_launching -= 1
+            if browser is not None:
+                self._browsers.append(_PooledBrowser(browser))
+            self._condition.notify_all()
+
+    async def _is_healthy(self, pooled: _PooledBrowser) -> bool:
+        process = pooled.browser.process
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            await asyncio.wait_for(pooled.browser.version(), HEALTH_CHECK_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception as ex:
+            logger.debug("Unable to close a browser of the browser pool. Error: %s", ex)
+
+
+class BrowserPoolThread:
+    """Runs a browser pool on an asyncio event loop in a native thread, for use from synchronous code.
+    The callers wait in the thread pool of the gevent hub, so that other greenlets, such as the other
+    Locust users, keep running while a page is rendered.
+    """
+
+    def __init__(self, pool: BrowserPool):
+        self.pool = pool
+        self.loop = asyncio.new_event_loop()
+        # Locust monkey patches threading, so get the original native thread
+        thread_class = monkey.get_original("threading", "Thread")
+        self._thread = thread_class(target=self.loop.run_forever, name="browser-pool", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        # pyppeteer installs signal handlers when launching, which is only possible in the main thread
+        for option in ("handleSIGINT", "handleSIGTERM", "handleSIGHUP"):
+            self.pool.launch_options.setdefault(option, False)
+        self.run(self.pool.start())
+
+    def stop(self):
+        self.run(self.pool.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def run(self, coroutine: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Runs a coroutine on the event loop of the pool and returns its result."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        result: T = gevent.get_hub().threadpool.apply(future.result, (timeout,))
+        return result
@@ -0,0 +1,149 @@
+"""Connection pool, keep-alive and TLS session resumption settings of the user types, and connection setup timing.
+
+By default each user has the connection pool of its HTTP client, with up to 10 kept alive connections per host,
+and does a full TLS handshake for each new connection. The user types can instead model the connections of
+their clients, see ConnectionUserMixin in base_user_types.py: the max number of parallel connections per host,
+such as 6 for the browsers and 1 for the API clients, whether the connections are kept alive,
+and whether the TLS sessions are resumed on new connections, as browsers and most HTTP libraries do.
+
+When SERVE_LOCUST_REPORT_CONNECTIONS is True, the setup of each new connection is reported next to the requests,
+to tell how much of the latency of Serve is the connection setup at the ingress and how much the application time:
+the TCP connects as requests of type CONNECT, and the TLS handshakes as requests of type TLS, or TLS-RESUMED
+when the TLS session was resumed, named by the host. The geventhttpclient based FastHttpSession only reports the
+TLS handshakes, since its connection pool can not be extended.
+
+HTTP/2 is not available, since neither the requests nor the geventhttpclient client supports it.
+"""
+
+import logging
+import ssl
+import time
+from typing import Any
+
+from env_vars import get_env_bool
+from locust import events
+from synthetic_requests import log_synthetic_request
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+logger = logging.getLogger(__name__)
+
+
+# Report the TCP connects and the TLS handshakes of the users as requests
+SERVE_LOCUST_REPORT_CONNECTIONS = get_env_bool("SERVE_LOCUST_REPORT_CONNECTIONS")
+
+_environment = None
+
+
+def report_connection(request_type: str, name: str, started: float, exception=None):
+    """Reports the setup of a connection as a request, when SERVE_LOCUST_REPORT_CONNECTIONS is True.
+    It is not counted in the Aggregated row, see synthetic_requests.py.
+    """
+    if not SERVE_LOCUST_REPORT_CONNECTIONS or _environment is None:
+        return
+    log_synthetic_request(_environment, request_type, name, (time.perf_counter() - started) * 1000, error=exception)
+
+
+class SessionSavingSSLSocket(ssl.SSLSocket):
+    """A TLS socket that saves its TLS session to its UserSSLContext when closed. With TLS 1.3 the server sends
+    the session tickets after the handshake, so the session is only resumable once the connection has been used.
+    """
+
+    def close(self):
+        if isinstance(self.context, UserSSLContext):
+            self.context.save_session(self)
+        super().close()
+
+
+class UserSSLContext(ssl.SSLContext):
+    """The TLS context of the connections of a user, that times the TLS handshakes, and resumes the TLS sessions
+    of the user per host when session resumption is enabled. Like the user types, it does not verify certificates.
+    Works for both the requests based HttpSession and the geventhttpclient based FastHttpSession,
+    which both wrap the connected sockets with the context.
+    """
+
+    sslsocket_class = SessionSavingSSLSocket
+
+    def __new__(cls, resume_sessions: bool = False):
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self, resume_sessions: bool = False):
+        self.check_hostname = False
+        self.verify_mode = ssl.CERT_NONE
+        self.resume_sessions = resume_sessions
+        # The last TLS sessions of the user by server host name
+        self.sessions: dict[str | None, ssl.SSLSession] = {}
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and self.resume_sessions:
+            session = self.sessions.get(server_hostname)
+        started = time.perf_counter()
+        try:
+            ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+        except Exception as ex:
+            report_connection("TLS", str(server_hostname), started, ex)
+            raise
+        report_connection("TLS-RESUMED" if ssl_sock.session_reused else "TLS", str(server_hostname), started)
+        self.save_session(ssl_sock)
+        return ssl_sock
+
+    def save_session(self, ssl_sock: ssl.SSLSocket):
+        """Keeps the TLS session of a connection for resuming it on the next connection to the host."""
+        if not self.resume_sessions:
+            return
+        try:
+            session = ssl_sock.session
+        except (OSError, ValueError):
+            return
+        # A TLS 1.3 session can only be resumed once the server has sent a session ticket
+        if session is not None and (session.has_ticket or ssl_sock.version() != "TLSv1.3"):
+            self.sessions[ssl_sock.server_hostname] = session
+
+
+class TimedConnectMixin:
+    """Reports the time of the TCP connect of a urllib3 connection.
+    The TLS handshake of an HTTPS connection is timed by its UserSSLContext.
+    """
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            sock = super()._new_conn()
+        except Exception as ex:
+            report_connection("CONNECT", f"{self.host}:{self.port}", started, ex)
+            raise
+        report_connection("CONNECT", f"{self.host}:{self.port}", started)
+        return sock
+
+
+class TimedHTTPConnection(TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+def create_pool_manager(pool_size: int | None, ssl_context: UserSSLContext | None) -> PoolManager:
+    """Returns the urllib3 pool manager of a requests based HttpSession, with at most pool_size connections
+    per host that are used at a time, like the connections per host of a browser.
+    A request waits for a free connection when all connections to the host are in use.
+    """
+    pool_kwargs: dict[str, Any] = {"maxsize": pool_size, "block": True} if pool_size else {}
+    pool_manager = PoolManager(ssl_context=ssl_context, **pool_kwargs)
+    pool_manager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+    return pool_manager
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    global _environment
+    _environment = environment
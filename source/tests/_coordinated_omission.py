@@ -0,0 +1,86 @@
+"""Coordinated omission correction of the response times of the closed loop user types.
+
+A user of a closed loop user type sends its next request only after the previous response. When Serve stalls,
+the requests that the user would have sent during the stall are never sent, so the slow responses are
+underrepresented in the statistics. When SERVE_LOCUST_CORRECT_COORDINATED_OMISSION is True, each request of the
+user types is also recorded in a corrected statistics series, together with the requests that the user intended
+to send during the response time, as in HdrHistogram's recordValueWithExpectedInterval.
+The intended send times are every expected interval after the send time of the request, and the expected interval
+is the mean wait time of the user type. A response time of 10 s with an expected interval of 3 s is recorded as
+10 s, 7 s and 4 s in the corrected series. The user types add the expected interval to the context of their
+requests, see CoordinatedOmissionUserMixin in base_user_types.py.
+The wait time is the gap between the tasks of a user, not between its requests, so only the first request of
+each task is corrected. The following requests of a task, such as the steps of the power user workflow, are sent
+right after the previous response as intended, so they have an expected interval of 0 and are recorded as is.
+
+The corrected series of a request name has the request type suffixed with +CO, such as GET+CO /home/,
+so it is shown next to the raw series in the statistics and the HTML report. The corrected series are not
+included in the Aggregated row. Their request counts include the intended requests.
+"""
+
+import logging
+from statistics import fmean
+
+from locust import events
+
+logger = logging.getLogger(__name__)
+
+
+CORRECTED_REQUEST_TYPE_SUFFIX = "+CO"
+# The key of the expected interval in ms in the request context
+EXPECTED_INTERVAL_CONTEXT_KEY = "serve_expected_interval_ms"
+# The number of samples of the wait time of a user type used to estimate its mean
+WAIT_TIME_SAMPLES = 1000
+# The max number of intended requests recorded for one response, to bound the cost of very long stalls
+MAX_INTENDED_REQUESTS = 10000
+
+# The expected intervals in ms between the tasks of the users, by user class
+_expected_intervals: dict[type, float] = {}
+
+_environment = None
+
+
+def get_expected_interval_ms(user) -> float:
+    """Returns the expected interval between the tasks of the user type, from its expected_interval setting
+    or its mean wait time.
+    """
+    user_class = type(user)
+    if user_class not in _expected_intervals:
+        if user.expected_interval is not None:
+            interval = user.expected_interval
+        else:
+            # The wait time functions such as between() and constant() return random or constant wait times
+            interval = fmean(user.wait_time() for _ in range(WAIT_TIME_SAMPLES))
+        _expected_intervals[user_class] = interval * 1000
+        logger.info("The expected interval between the requests of %s is %.2f s", user_class.__name__, interval)
+    return _expected_intervals[user_class]
+
+
+def record_corrected(stats, request_type: str, name: str, response_time: float, expected_interval_ms: float):
+    """Records the response time and the response times of the requests intended during it in the corrected series.
+    The entry is logged directly, instead of firing a request event, so that the Aggregated row is not affected.
+    """
+    entry = stats.get(name, request_type + CORRECTED_REQUEST_TYPE_SUFFIX)
+    entry.log(response_time, 0)
+    if expected_interval_ms <= 0:
+        return
+    missing = response_time - expected_interval_ms
+    intended_requests = 0
+    while missing >= expected_interval_ms and intended_requests < MAX_INTENDED_REQUESTS:
+        entry.log(missing, 0)
+        missing -= expected_interval_ms
+        intended_requests += 1
+
+
+def _on_request(request_type, name, response_time, context, **kwargs):
+    expected_interval_ms = context.get(EXPECTED_INTERVAL_CONTEXT_KEY) if context else None
+    if expected_interval_ms is None or response_time is None:
+        return
+    record_corrected(_environment.stats, request_type, name, response_time, expected_interval_ms)
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    global _environment
+    _environment = environment
+    environment.events.request.add_listener(_on_request)
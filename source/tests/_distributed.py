@@ -0,0 +1,110 @@
+"""Support for running the test plans in distributed mode, with one master and several worker processes.
+
+The user types are assigned individual ids that are used to select the pre-created test user accounts
+locust_test_user_{id}@test.uu.net. Each worker process has its own copy of any class level counter,
+so in distributed mode the ids are instead allocated by the master node. The workers request the ids
+from the master using custom messages, so that each worker gets a disjoint set of ids.
+
+If the master does not respond in time, the worker falls back to allocating ids from its own range,
+offset by the worker index: (worker_index + 1) * SERVE_LOCUST_USER_ID_BLOCK_SIZE + local id. The ranges
+start after the first block, so they do not overlap the ids that the master has already allocated.
+"""
+
+import itertools
+import logging
+import os
+from collections import defaultdict
+
+from gevent.event import AsyncResult
+from gevent.timeout import Timeout
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+USER_ID_REQUEST_MESSAGE = "serve_user_id_request"
+USER_ID_RESPONSE_MESSAGE = "serve_user_id_response"
+
+# The max time in seconds that a worker waits for the master to allocate a user id
+SERVE_LOCUST_USER_ID_TIMEOUT = float(os.environ.get("SERVE_LOCUST_USER_ID_TIMEOUT", 10))
+# The size of the id range of each worker if the ids cannot be allocated by the master
+SERVE_LOCUST_USER_ID_BLOCK_SIZE = int(os.environ.get("SERVE_LOCUST_USER_ID_BLOCK_SIZE", 1000))
+
+# The latest allocated id per counter name. Used by the master node and when running locally.
+_user_id_counters: defaultdict[str, int] = defaultdict(int)
+
+# The pending user id requests of this worker node, by request id
+_pending_requests: dict[int, AsyncResult] = {}
+_request_ids = itertools.count(1)
+
+
+def allocate_user_id(environment, counter: str) -> int:
+    """Allocates the next unique id of a counter, such as the counter of a user type.
+    The ids are unique across all worker nodes and start at 1.
+
+    :param environment: The Locust environment of the user.
+    :param counter: The name of the counter to increment.
+    """
+    runner = environment.runner
+
+    if not isinstance(runner, WorkerRunner):
+        return _next_user_id(counter)
+
+    request_id = next(_request_ids)
+    result = AsyncResult()
+    _pending_requests[request_id] = result
+
+    runner.send_message(USER_ID_REQUEST_MESSAGE, {"counter": counter, "request_id": request_id})
+
+    try:
+        return int(result.get(timeout=SERVE_LOCUST_USER_ID_TIMEOUT))
+    except Timeout:
+        user_id: int = (runner.worker_index + 1) * SERVE_LOCUST_USER_ID_BLOCK_SIZE + _next_user_id(counter)
+        logger.warning(
+            "The master did not allocate a %s user id within %s seconds. Using id %s from the range of worker %s.",
+            counter,
+            SERVE_LOCUST_USER_ID_TIMEOUT,
+            user_id,
+            runner.worker_index,
+        )
+        return user_id
+    finally:
+        _pending_requests.pop(request_id, None)
+
+
+def _next_user_id(counter: str) -> int:
+    _user_id_counters[counter] += 1
+    return _user_id_counters[counter]
+
+
+def _on_user_id_request(environment, msg, **kwargs):
+    """Master node: allocates a user id and sends it back to the requesting worker."""
+    user_id = _next_user_id(msg.data["counter"])
+    logger.debug("Allocated %s user id %s to worker %s", msg.data["counter"], user_id, msg.node_id)
+    environment.runner.send_message(
+        USER_ID_RESPONSE_MESSAGE,
+        {"request_id": msg.data["request_id"], "user_id": user_id},
+        client_id=msg.node_id,
+    )
+
+
+def _on_user_id_response(environment, msg, **kwargs):
+    """Worker node: hands over an allocated user id to the waiting user."""
+    result = _pending_requests.get(msg.data["request_id"])
+    if result is not None:
+        result.set(msg.data["user_id"])
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if isinstance(environment.runner, MasterRunner):
+        environment.runner.register_message(USER_ID_REQUEST_MESSAGE, _on_user_id_request)
+    elif isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message(USER_ID_RESPONSE_MESSAGE, _on_user_id_response)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """Starts each new test run from user id 1 again."""
+    _user_id_counters.clear()
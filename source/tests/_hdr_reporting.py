@@ -0,0 +1,136 @@
+"""Records the response times of all requests into HDR histograms per request name, for accurate high percentiles.
+
+Locust rounds the response times into coarse buckets for its statistics, and its CSV files only have fixed
+percentile columns. When SERVE_LOCUST_HDR_HISTOGRAMS is set to a file prefix, such as ./stats/hdr, every
+request is also recorded in microseconds into a histogram of its type and name, with a relative error of at most
+0.1% and bounded memory. At the end of the run the percentiles are written to {prefix}_percentiles.csv,
+and the histograms to {prefix}_histograms.json.
+
+In distributed mode the workers send the histograms of the requests since their last report to the master
+with their statistics reports, and the master merges them.
+"""
+
+import csv
+import json
+import logging
+import os
+
+from hdr_histogram import UNITS_PER_MS, HdrHistogram
+from locust import events
+from locust.runners import WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+# The file prefix of the histogram files. Unset disables the histograms.
+SERVE_LOCUST_HDR_HISTOGRAMS = os.environ.get("SERVE_LOCUST_HDR_HISTOGRAMS")
+
+# The key of the histograms in the reports of the workers to the master
+WORKER_REPORT_KEY = "serve_hdr_histograms"
+
+# The percentiles written to the percentiles file
+PERCENTILES = (50, 90, 95, 99, 99.9, 99.99)
+
+# The histograms by request type and name. On the workers, the histograms of the requests since the last report.
+_histograms: dict[tuple[str, str], HdrHistogram] = {}
+
+
+def get_histogram(request_type: str, name: str) -> HdrHistogram:
+    key = (request_type, name)
+    if key not in _histograms:
+        _histograms[key] = HdrHistogram()
+    return _histograms[key]
+
+
+def _on_request(request_type, name, response_time, **kwargs):
+    if response_time is None:
+        return
+    get_histogram(request_type, name).record(round(response_time * UNITS_PER_MS))
+
+
+def _on_report_to_master(client_id, data, **kwargs):
+    """Worker node: adds the histograms since the last report to the report, and starts new histograms."""
+    data[WORKER_REPORT_KEY] = [
+        {"type": request_type, "name": name, "histogram": histogram.to_dict()}
+        for (request_type, name), histogram in _histograms.items()
+    ]
+    _histograms.clear()
+
+
+def _on_worker_report(client_id, data, **kwargs):
+    """Master node: merges the histograms of a worker."""
+    for entry in data.get(WORKER_REPORT_KEY, ()):
+        get_histogram(entry["type"], entry["name"]).merge(HdrHistogram.from_dict(entry["histogram"]))
+
+
+def _get_total_histogram() -> HdrHistogram:
+    total = HdrHistogram()
+    for histogram in _histograms.values():
+        total.merge(histogram)
+    return total
+
+
+def write_histograms(prefix: str):
+    """Writes the percentiles of each request name, in ms, and the histograms, in microseconds."""
+    rows = sorted(_histograms.items(), key=lambda item: (item[0][1], item[0][0]))
+    rows.append((("", "Aggregated"), _get_total_histogram()))
+
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    with open(f"{prefix}_percentiles.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Type", "Name", "Request Count", "Min", "Average", *(f"{p}%" for p in PERCENTILES), "Max"])
+        for (request_type, name), histogram in rows:
+            values = [
+                histogram.min_value or 0,
+                histogram.mean,
+                *(histogram.value_at_percentile(p) for p in PERCENTILES),
+                histogram.max_value,
+            ]
+            writer.writerow([request_type, name, histogram.total_count, *(f"{v / UNITS_PER_MS:.3f}" for v in values)])
+
+    with open(f"{prefix}_histograms.json", "w") as f:
+        json.dump(
+            {
+                "unit": "us",
+                "histograms": [
+                    {
+                        "type": request_type,
+                        "name": name,
+                        "significant_digits": histogram.significant_digits,
+                        "total_count": histogram.total_count,
+                        "min": histogram.min_value,
+                        "max": histogram.max_value,
+                        # The lowest value of each non-empty sub-bucket and its count
+                        "buckets": list(histogram.iter_buckets()),
+                    }
+                    for (request_type, name), histogram in rows
+                ],
+            },
+            f,
+        )
+
+    logger.info("Wrote the HDR histograms of %s request names to %s_*", len(rows) - 1, prefix)
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if not SERVE_LOCUST_HDR_HISTOGRAMS:
+        return
+    environment.events.request.add_listener(_on_request)
+    if isinstance(environment.runner, WorkerRunner):
+        environment.events.report_to_master.add_listener(_on_report_to_master)
+    else:
+        environment.events.worker_report.add_listener(_on_worker_report)
+
+
+@events.reset_stats.add_listener
+def on_reset_stats(**kwargs):
+    """Resets the histograms together with the statistics of Locust."""
+    _histograms.clear()
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    """Master node or local runner: writes the histograms of the run."""
+    if SERVE_LOCUST_HDR_HISTOGRAMS and not isinstance(environment.runner, WorkerRunner):
+        write_histograms(SERVE_LOCUST_HDR_HISTOGRAMS)
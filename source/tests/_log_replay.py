@@ -0,0 +1,230 @@
+"""Trace-driven replay of the access logs of the Serve ingress, reproducing the production traffic.
+
+The synthetic user types model the traffic with task weights and wait times. The replay instead sends the requests
+of a production access log, see access_log.py, with their original inter-arrival times, optionally compressed by
+a speedup factor, such as 2 or 10 to replay an hour of traffic in 30 or 6 minutes.
+
+A dispatcher greenlet streams the log from the start of the test run and hands out each request at its time since
+the first request of the log, divided by the speedup. The requests are grouped into sessions by client, the remote
+address and the user agent, and a session ends when the client has been idle for SERVE_LOCUST_REPLAY_SESSION_GAP
+seconds of log time. Each session is replayed by one replay user at a time, see ReplayUserMixin in
+base_user_types.py, in the order of the log and with a fresh cookie jar, so the users of the test run are a pool
+that replays the sessions of the log. When all replay users are busy, the new sessions wait for a free user,
+which is logged as a warning to increase the number of users.
+
+The hosts of the absolute URLs of the log are rewritten with SERVE_LOCUST_REPLAY_HOST_MAP. The requests to the
+hosts that are not in the host map are skipped, since they would otherwise be sent to the production hosts.
+
+Only the methods in SERVE_LOCUST_REPLAY_METHODS are replayed, by default GET and HEAD, since the request bodies
+of the other methods are not in the access logs. The times in the access logs have a resolution of one second,
+so the requests of a second are sent together at the start of the second.
+
+In distributed mode, the master assigns each worker a partition of the clients, and each worker streams the whole
+log and replays the sessions of its clients only.
+"""
+
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import gevent
+from access_log import iter_log_records, parse_host_map, rewrite_host
+from gevent.queue import Empty, Queue
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+REPLAY_PARTITION_MESSAGE = "serve_replay_partition"
+
+# The path of the access log to replay, optionally gzip compressed. Unset disables the replay.
+SERVE_LOCUST_REPLAY_LOG = os.environ.get("SERVE_LOCUST_REPLAY_LOG") or None
+# The factor by which the time between the requests of the log is compressed, such as 2 or 10
+SERVE_LOCUST_REPLAY_SPEEDUP = float(os.environ.get("SERVE_LOCUST_REPLAY_SPEEDUP", 1))
+# The time in seconds of log time after which an idle client starts a new session
+SERVE_LOCUST_REPLAY_SESSION_GAP = float(os.environ.get("SERVE_LOCUST_REPLAY_SESSION_GAP", 1800))
+# Rewrites the hosts of the absolute URLs of the log, such as serve.scilifelab.se=staging.serve.scilifelab.se
+SERVE_LOCUST_REPLAY_HOST_MAP = parse_host_map(os.environ.get("SERVE_LOCUST_REPLAY_HOST_MAP"))
+# The HTTP methods of the requests that are replayed
+SERVE_LOCUST_REPLAY_METHODS = {
+    method.strip().upper() for method in os.environ.get("SERVE_LOCUST_REPLAY_METHODS", "GET,HEAD").split(",")
+}
+
+# Sessions that wait for a free replay user for more than this many seconds mean that there are too few users
+LATE_SESSION_SECONDS = 1
+# The min time in seconds between the warnings about late sessions
+LATE_SESSION_WARNING_INTERVAL_SECONDS = 10
+
+
+class ReplaySession:
+    """The requests of a client of the access log, handed out by the dispatcher at their replay times.
+    The queue holds the (method, url) of the requests, and None when the session has ended.
+    """
+
+    def __init__(self, client: str):
+        self.client = client
+        self.requests: Queue = Queue()
+        # The time at which the session became ready to be replayed
+        self.created = time.time()
+        # The log time of the last request of the session
+        self.last_timestamp = 0.0
+
+    def __iter__(self):
+        """Yields the (method, url) of the requests of the session as they are handed out, until the session ends."""
+        while (request := self.requests.get()) is not None:
+            yield request
+
+
+class LogReplayer:
+    """Streams an access log and hands out its requests at their replay times, grouped into sessions by client.
+
+    :param path: The path of the access log, None if no access log is replayed.
+    :param speedup: The factor by which the time between the requests is compressed.
+    :param session_gap: The idle time in seconds of log time after which a client starts a new session.
+    """
+
+    def __init__(self, path: str | None, speedup: float = 1.0, session_gap: float = 1800.0):
+        self.path = path
+        self.speedup = speedup
+        self.session_gap = session_gap
+        # The partition of the clients that this Locust process replays, as (index, count)
+        self.partition = (0, 1)
+        self.reset()
+
+    def reset(self):
+        """Starts a new test run from the start of the log."""
+        # The sessions that wait for a free replay user
+        self.pending_sessions: Queue = Queue()
+        # The sessions that are being replayed by client, the least recently active client first
+        self.active_sessions: OrderedDict[str, ReplaySession] = OrderedDict()
+        self.replayed_requests = 0
+        self.replayed_sessions = 0
+        self.late_sessions = 0
+        # The requests to hosts that are not in the host map, which are not replayed
+        self.skipped_requests = 0
+        self.unmapped_hosts: set[str | None] = set()
+        self._last_warning = 0.0
+
+    def run(self):
+        """Hands out the requests of the log until the end of the log. Run it in a greenlet."""
+        index, count = self.partition
+        logger.info(
+            "Replaying the access log %s at %sx speed, partition %s of %s", self.path, self.speedup, index + 1, count
+        )
+        start = time.time()
+        first_timestamp = None
+        for record in iter_log_records(self.path):
+            if record.method not in SERVE_LOCUST_REPLAY_METHODS:
+                continue
+            if count > 1 and zlib.crc32(record.client.encode()) % count != index:
+                continue
+            url = rewrite_host(record.url, SERVE_LOCUST_REPLAY_HOST_MAP)
+            if url is None:
+                self.skip_unmapped(record.url)
+                continue
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+            delay = start + (record.timestamp - first_timestamp) / self.speedup - time.time()
+            if delay > 0:
+                gevent.sleep(delay)
+
+            self.end_idle_sessions(record.timestamp)
+            session = self.active_sessions.get(record.client)
+            if session is None:
+                session = ReplaySession(record.client)
+                self.active_sessions[record.client] = session
+                self.pending_sessions.put(session)
+                self.replayed_sessions += 1
+            else:
+                self.active_sessions.move_to_end(record.client)
+            session.last_timestamp = record.timestamp
+            session.requests.put((record.method, url))
+            self.replayed_requests += 1
+
+        self.end_idle_sessions(None)
+        logger.info(
+            "The access log %s has been replayed: %s requests in %s sessions, %s requests to unmapped hosts skipped",
+            self.path,
+            self.replayed_requests,
+            self.replayed_sessions,
+            self.skipped_requests,
+        )
+
+    def skip_unmapped(self, url: str):
+        """Counts a skipped request to a host that is not in the host map, and logs each such host once."""
+        self.skipped_requests += 1
+        host = urlsplit(url).hostname
+        if host not in self.unmapped_hosts:
+            self.unmapped_hosts.add(host)
+            logger.warning("Skipping the requests to %s, which is not in SERVE_LOCUST_REPLAY_HOST_MAP", host)
+
+    def end_idle_sessions(self, timestamp: float | None):
+        """Ends the sessions that have been idle for the session gap at the log time, or all sessions if None."""
+        while self.active_sessions:
+            client, session = next(iter(self.active_sessions.items()))
+            if timestamp is not None and timestamp - session.last_timestamp < self.session_gap:
+                break
+            del self.active_sessions[client]
+            session.requests.put(None)
+
+    def next_session(self, timeout: float) -> ReplaySession | None:
+        """Returns the next session to replay, or None if no session is ready within the timeout."""
+        try:
+            session: ReplaySession = self.pending_sessions.get(timeout=timeout)
+        except Empty:
+            return None
+
+        now = time.time()
+        lateness = now - session.created
+        if lateness > LATE_SESSION_SECONDS:
+            self.late_sessions += 1
+            if now - self._last_warning > LATE_SESSION_WARNING_INTERVAL_SECONDS:
+                self._last_warning = now
+                logger.warning(
+                    "The replayed sessions are %.1f s late because all replay users are busy. Increase the users.",
+                    lateness,
+                )
+        return session
+
+
+replayer = LogReplayer(SERVE_LOCUST_REPLAY_LOG, SERVE_LOCUST_REPLAY_SPEEDUP, SERVE_LOCUST_REPLAY_SESSION_GAP)
+_replay_greenlet = None
+
+
+def _on_replay_partition(environment, msg, **kwargs):
+    """Worker node: sets the partition of the clients sent by the master, before the test run starts."""
+    replayer.partition = (msg.data["index"], msg.data["count"])
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message(REPLAY_PARTITION_MESSAGE, _on_replay_partition)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    global _replay_greenlet
+    if SERVE_LOCUST_REPLAY_LOG is None:
+        return
+    runner = environment.runner
+    if isinstance(runner, MasterRunner):
+        workers = sorted(worker.id for worker in runner.clients.ready + runner.clients.running)
+        for index, worker_id in enumerate(workers):
+            runner.send_message(REPLAY_PARTITION_MESSAGE, {"index": index, "count": len(workers)}, client_id=worker_id)
+        return
+
+    replayer.reset()
+    _replay_greenlet = gevent.spawn(replayer.run)
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if _replay_greenlet is not None:
+        _replay_greenlet.kill(block=False)
+    if replayer.late_sessions:
+        logger.info("%s replayed sessions waited for a free replay user", replayer.late_sessions)
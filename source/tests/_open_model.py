@@ -0,0 +1,356 @@
+"""Support for running the test plans as an open model, where the users arrive at a target rate.
+
+In the closed model of the test plans, a fixed number of users wait between(...) seconds between their tasks,
+so when Serve slows down, the users send fewer requests and the offered load drops too. In the open model,
+the task executions, which are sessions of the power users, arrive at a target rate per user type,
+independent of the response times. A dispatcher greenlet per user type generates the arrivals at the current
+arrival rate and puts them on a queue, and a pool of idle users takes the arrivals from the queue and executes them.
+When all users of a type are busy, the arrivals queue up and are executed late, which is logged as a warning to
+increase the pool size. An arrival is counted when a user starts executing it.
+
+The arrival rate over time is given by an arrival profile, such as steady, step, spike or classroom.
+The ArrivalRateShape load shape spawns the pool of users and sets the arrival rate of each user type,
+split by the user type weights. In distributed mode, the master sends the rates to the workers,
+divided by the number of workers.
+"""
+
+import logging
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import gevent
+from gevent.event import Event
+from gevent.queue import Queue
+from locust import LoadTestShape, User, events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+ARRIVAL_RATES_MESSAGE = "serve_arrival_rates"
+
+# The arrival profile, one of steady, step, spike or classroom. Unset disables the open model load shape.
+SERVE_LOCUST_ARRIVAL_PROFILE = os.environ.get("SERVE_LOCUST_ARRIVAL_PROFILE") or None
+# The total arrival rate of all user types in arrivals per second. The start rate of the step profile.
+SERVE_LOCUST_ARRIVAL_RATE = float(os.environ.get("SERVE_LOCUST_ARRIVAL_RATE", 1))
+# The duration in seconds of the arrival profile, after which the test run is stopped
+SERVE_LOCUST_ARRIVAL_DURATION = float(os.environ.get("SERVE_LOCUST_ARRIVAL_DURATION", 300))
+# The number of users in the pool that executes the arrivals, of all user types and Locust processes
+SERVE_LOCUST_OPEN_MODEL_USERS = int(os.environ.get("SERVE_LOCUST_OPEN_MODEL_USERS", 50))
+# The number of users to spawn per second when starting the pool of users
+SERVE_LOCUST_OPEN_MODEL_SPAWN_RATE = float(os.environ.get("SERVE_LOCUST_OPEN_MODEL_SPAWN_RATE", 10))
+# The number of students that log in during the classroom profile
+SERVE_LOCUST_CLASSROOM_STUDENTS = int(os.environ.get("SERVE_LOCUST_CLASSROOM_STUDENTS", 30))
+
+# The step profile increases the arrival rate by the start rate after each step
+STEP_SECONDS = 60
+# The spike profile multiplies the arrival rate by the spike factor in the middle of the profile
+SPIKE_FACTOR = 5
+SPIKE_SECONDS = 30
+# The classroom profile spreads the student arrivals over a bell curve of this length in seconds
+CLASSROOM_WINDOW_SECONDS = 60
+
+# Arrivals that are late by more than this many seconds mean that the pool of users is too small
+LATE_ARRIVAL_SECONDS = 1
+# The min time in seconds between the warnings about late arrivals of a user type
+LATE_ARRIVAL_WARNING_INTERVAL_SECONDS = 10
+
+
+@dataclass(frozen=True)
+class ArrivalProfile:
+    """The total arrival rate in arrivals per second as a function of the time in seconds since the start.
+
+    :param name: The name of the profile.
+    :param duration: The duration of the profile in seconds.
+    :param rate_at: Returns the arrival rate at a time within the duration.
+    :param poisson: Whether the times between the arrivals are exponentially distributed, as in a Poisson process,
+        instead of evenly spaced.
+    """
+
+    name: str
+    duration: float
+    rate_at: Callable[[float], float]
+    poisson: bool = True
+
+    def rate(self, elapsed: float) -> float | None:
+        """Returns the arrival rate at the elapsed time, or None after the end of the profile."""
+        if elapsed >= self.duration:
+            return None
+        return max(0.0, self.rate_at(max(0.0, elapsed)))
+
+
+def steady(rate: float, duration: float) -> ArrivalProfile:
+    """A constant arrival rate."""
+    return ArrivalProfile("steady", duration, lambda elapsed: rate)
+
+
+def step(rate: float, duration: float, step_seconds: float = STEP_SECONDS) -> ArrivalProfile:
+    """An arrival rate that increases by the start rate after each step, for finding the throughput ceiling."""
+    return ArrivalProfile("step", duration, lambda elapsed: rate * (1 + elapsed // step_seconds))
+
+
+def spike(
+    rate: float, duration: float, factor: float = SPIKE_FACTOR, spike_seconds: float = SPIKE_SECONDS
+) -> ArrivalProfile:
+    """A constant arrival rate that is multiplied by the factor during a spike in the middle of the profile."""
+    spike_start = (duration - spike_seconds) / 2
+
+    def rate_at(elapsed: float) -> float:
+        return rate * factor if spike_start <= elapsed < spike_start + spike_seconds else rate
+
+    return ArrivalProfile("spike", duration, rate_at)
+
+
+def classroom_bell(students: int, duration: float, window_seconds: float = CLASSROOM_WINDOW_SECONDS) -> ArrivalProfile:
+    """The students of a class log in within the window, with arrival times on a bell curve,
+    a normal distribution truncated to +-3 standard deviations around the middle of the window.
+    The arrivals are evenly spaced by the rate, so that the number of arrivals is close to the number of students.
+    """
+    mean = window_seconds / 2
+    sigma = window_seconds / 6
+    # The truncated distribution is scaled so that the expected number of arrivals is the number of students
+    scale = students / (sigma * math.sqrt(2 * math.pi) * math.erf(3 / math.sqrt(2)))
+
+    def rate_at(elapsed: float) -> float:
+        if elapsed >= window_seconds:
+            return 0.0
+        return scale * math.exp(-0.5 * ((elapsed - mean) / sigma) ** 2)
+
+    return ArrivalProfile("classroom", max(duration, window_seconds), rate_at, poisson=False)
+
+
+ARRIVAL_PROFILES: dict[str, Callable[[], ArrivalProfile]] = {
+    "steady": lambda: steady(SERVE_LOCUST_ARRIVAL_RATE, SERVE_LOCUST_ARRIVAL_DURATION),
+    "step": lambda: step(SERVE_LOCUST_ARRIVAL_RATE, SERVE_LOCUST_ARRIVAL_DURATION),
+    "spike": lambda: spike(SERVE_LOCUST_ARRIVAL_RATE, SERVE_LOCUST_ARRIVAL_DURATION),
+    "classroom": lambda: classroom_bell(SERVE_LOCUST_CLASSROOM_STUDENTS, SERVE_LOCUST_ARRIVAL_DURATION),
+}
+
+
+def get_arrival_profile(name: str = SERVE_LOCUST_ARRIVAL_PROFILE or "steady") -> ArrivalProfile:
+    """Returns the built-in arrival profile with the name, configured by the env vars."""
+    try:
+        return ARRIVAL_PROFILES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown arrival profile {name}. Use one of {', '.join(ARRIVAL_PROFILES)}") from None
+
+
+class ArrivalScheduler:
+    """Generates the arrivals of a user type at its current arrival rate, and hands them out to the idle users
+    of the type, one arrival per task execution.
+
+    The dispatcher greenlet advances a clock of the expected number of arrivals, the integral of the rate over time,
+    and generates an arrival each time the clock reaches the next arrival: after an exponentially distributed
+    number of expected arrivals for a Poisson process, or after exactly one. When the rate changes, the clock keeps
+    the progress made at the previous rate, so the arrivals follow the rate as it changes, such as the rate of the
+    classroom profile that changes every second.
+    """
+
+    def __init__(self, user_type: str):
+        self.user_type = user_type
+        self.rate = 0.0
+        self.poisson = True
+        # The times of the arrivals that wait for an idle user
+        self.queue: Queue = Queue()
+        self.arrivals = 0
+        self.late_arrivals = 0
+        self.max_lateness = 0.0
+        self._last_warning = 0.0
+        self._rate_changed = Event()
+        self._dispatcher: gevent.Greenlet | None = None
+
+    def set_rate(self, rate: float, poisson: bool = True):
+        self.poisson = poisson
+        if rate != self.rate:
+            self.rate = rate
+            self._rate_changed.set()
+        if self._dispatcher is None and rate > 0:
+            self._dispatcher = gevent.spawn(self._dispatch)
+
+    def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.kill(block=False)
+            self._dispatcher = None
+
+    def _dispatch(self):
+        """Puts the arrivals on the queue at their times, following the current arrival rate."""
+        # The expected number of arrivals until the next arrival
+        remaining = self._next_gap()
+        while True:
+            self._rate_changed.clear()
+            rate = self.rate
+            if rate <= 0:
+                self._rate_changed.wait()
+                continue
+            started = time.time()
+            if self._rate_changed.wait(timeout=remaining / rate):
+                remaining = max(0.0, remaining - rate * (time.time() - started))
+                continue
+            self.queue.put(started + remaining / rate)
+            remaining = self._next_gap()
+
+    def _next_gap(self) -> float:
+        return random.expovariate(1) if self.poisson else 1.0
+
+    def next_arrival(self) -> float:
+        """Waits for an arrival that has not been started yet and returns its time, which is earlier than now
+        if the arrival has waited for an idle user.
+        """
+        arrival: float = self.queue.get()
+        now = time.time()
+        self.arrivals += 1
+
+        lateness = now - arrival
+        if lateness > LATE_ARRIVAL_SECONDS:
+            self.late_arrivals += 1
+            self.max_lateness = max(self.max_lateness, lateness)
+            if now - self._last_warning > LATE_ARRIVAL_WARNING_INTERVAL_SECONDS:
+                self._last_warning = now
+                logger.warning(
+                    "The arrivals of %s are %.1f s late because all its users are busy. "
+                    "Increase SERVE_LOCUST_OPEN_MODEL_USERS.",
+                    self.user_type,
+                    lateness,
+                )
+        return arrival
+
+
+# The arrival schedulers of this Locust process, by user type class name
+_schedulers: dict[str, ArrivalScheduler] = {}
+
+
+def get_scheduler(user_type: str) -> ArrivalScheduler:
+    if user_type not in _schedulers:
+        _schedulers[user_type] = ArrivalScheduler(user_type)
+    return _schedulers[user_type]
+
+
+def arrival_rate():
+    """Returns a wait_time function that waits until the user takes the next arrival of the user type,
+    and sets user.intended_start to the arrival time. Unlike the other wait_time functions, the wait happens
+    in the function, which returns 0.
+    """
+
+    def wait_time_func(user) -> float:
+        user.intended_start = get_scheduler(type(user).__name__).next_arrival()
+        return 0.0
+
+    return wait_time_func
+
+
+class OpenModelUserMixin(User):
+    """Makes a user type execute its tasks at the arrivals of the user type instead of after its own wait time.
+    Put the mixin before the base user type, and run the user type with an ArrivalRateShape.
+    """
+
+    abstract = True
+
+    wait_time = arrival_rate()
+    # The arrivals do not wait for the responses, so the response times need no coordinated omission correction
+    correct_coordinated_omission = False
+
+    # The time of the arrival that the user is executing, which is earlier than now if the arrival is late
+    intended_start: float | None = None
+
+    def on_start(self):
+        super().on_start()
+        # Wait for the first arrival instead of running a task as soon as the user has been spawned
+        self.wait()
+
+
+class ArrivalRateShape(LoadTestShape):
+    """Spawns the pool of users of the user classes and sets their arrival rates from the arrival profile.
+    The arrivals start after the pool has been spawned.
+    Subclass it in a test plan, and set user_classes to the open model user types of the test plan.
+    """
+
+    abstract = True
+
+    user_classes: list[type[User]] = []
+    users = SERVE_LOCUST_OPEN_MODEL_USERS
+    spawn_rate = SERVE_LOCUST_OPEN_MODEL_SPAWN_RATE
+
+    def __init__(self):
+        super().__init__()
+        self.profile = self.get_profile()
+        self.spawn_seconds = self.users / self.spawn_rate
+        logger.info(
+            "Using the %s arrival profile of %s s with a pool of %s users",
+            self.profile.name,
+            self.profile.duration,
+            self.users,
+        )
+
+    def get_profile(self) -> ArrivalProfile:
+        return get_arrival_profile()
+
+    def get_user_classes(self) -> list[type[User]]:
+        return self.user_classes
+
+    def tick(self):
+        user_classes = self.get_user_classes()
+        run_time = self.get_run_time()
+        if run_time < self.spawn_seconds:
+            rate = 0.0
+        elif (rate := self.profile.rate(run_time - self.spawn_seconds)) is None:
+            return None
+
+        total_weight = sum(user_class.weight for user_class in user_classes)
+        rates = {user_class.__name__: rate * user_class.weight / total_weight for user_class in user_classes}
+        set_arrival_rates(self.runner.environment, rates, self.profile.poisson)
+        return self.users, self.spawn_rate, user_classes
+
+
+def set_arrival_rates(environment, rates: dict[str, float], poisson: bool = True):
+    """Sets the arrival rates by user type. The master node sends the rates to the workers."""
+    runner = environment.runner
+    if isinstance(runner, MasterRunner):
+        workers = max(runner.worker_count, 1)
+        runner.send_message(
+            ARRIVAL_RATES_MESSAGE,
+            {"rates": {user_type: rate / workers for user_type, rate in rates.items()}, "poisson": poisson},
+        )
+        return
+    for user_type, rate in rates.items():
+        get_scheduler(user_type).set_rate(rate, poisson)
+
+
+def _on_arrival_rates(environment, msg, **kwargs):
+    """Worker node: sets the arrival rates sent by the master."""
+    for user_type, rate in msg.data["rates"].items():
+        get_scheduler(user_type).set_rate(rate, msg.data["poisson"])
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message(ARRIVAL_RATES_MESSAGE, _on_arrival_rates)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """Starts each new test run without arrivals."""
+    for scheduler in _schedulers.values():
+        scheduler.stop()
+    _schedulers.clear()
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    for scheduler in _schedulers.values():
+        scheduler.stop()
+        if scheduler.queue.qsize():
+            logger.info("%s had %s arrivals that were never started", scheduler.user_type, scheduler.queue.qsize())
+        if scheduler.arrivals:
+            logger.info(
+                "%s had %s arrivals, of which %s were late by more than %s s, at most %.1f s",
+                scheduler.user_type,
+                scheduler.arrivals,
+                scheduler.late_arrivals,
+                LATE_ARRIVAL_SECONDS,
+                scheduler.max_lateness,
+            )
@@ -0,0 +1,120 @@
+"""A rendezvous point that holds the users of a user type until all of them have been spawned,
+and then releases them at the same moment, such as the students of a class that start a workshop together.
+
+The number of users to wait for is the target number of users of the user type, once all users have been spawned.
+In distributed mode the workers report their arrived users to the master with custom messages,
+and the master releases the users on all workers when all of them have arrived.
+If not all users arrive in time, the arrived users are released anyway.
+"""
+
+import logging
+import os
+from collections import defaultdict
+
+from gevent.event import Event
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+RENDEZVOUS_ARRIVED_MESSAGE = "serve_rendezvous_arrived"
+RENDEZVOUS_RELEASE_MESSAGE = "serve_rendezvous_release"
+
+# The max time in seconds that a user waits for the other users at the rendezvous point
+SERVE_LOCUST_RENDEZVOUS_TIMEOUT = float(os.environ.get("SERVE_LOCUST_RENDEZVOUS_TIMEOUT", 300))
+
+# The number of arrived users per user type. Used by the master node and when running locally.
+_arrived: defaultdict[str, int] = defaultdict(int)
+# Whether all users have been spawned, after which the target number of users per user type is known
+_spawning_complete = False
+# The runner of this Locust process, as the spawning_complete event is fired without the environment
+_runner = None
+
+# The release events of the user types in this Locust process
+_released: defaultdict[str, Event] = defaultdict(Event)
+
+
+def wait_for_all_users(user) -> bool:
+    """Waits until all users of the user type have arrived at the rendezvous point.
+    Returns True if the users were released together, and False if the wait timed out.
+
+    :param user: The user that has arrived.
+    """
+    user_type = type(user).__name__
+    released = _released[user_type]
+    runner = user.environment.runner
+
+    if isinstance(runner, WorkerRunner):
+        runner.send_message(RENDEZVOUS_ARRIVED_MESSAGE, {"user_type": user_type})
+    else:
+        _arrive(runner, user_type)
+
+    if released.wait(timeout=SERVE_LOCUST_RENDEZVOUS_TIMEOUT):
+        return True
+
+    logger.warning(
+        "Not all %s users arrived at the rendezvous point within %s seconds. Releasing the arrived users.",
+        user_type,
+        SERVE_LOCUST_RENDEZVOUS_TIMEOUT,
+    )
+    released.set()
+    return False
+
+
+def _arrive(runner, user_type: str):
+    """Master node or local runner: counts an arrived user, and releases the users if all have arrived."""
+    _arrived[user_type] += 1
+    _release_if_all_arrived(runner, user_type)
+
+
+def _release_if_all_arrived(runner, user_type: str):
+    expected = runner.target_user_classes_count.get(user_type, 0)
+    if not _spawning_complete or _arrived[user_type] < expected:
+        return
+
+    logger.info("All %s %s users have arrived at the rendezvous point. Releasing them.", expected, user_type)
+    if isinstance(runner, MasterRunner):
+        runner.send_message(RENDEZVOUS_RELEASE_MESSAGE, {"user_type": user_type})
+    else:
+        _released[user_type].set()
+
+
+def _on_arrived(environment, msg, **kwargs):
+    """Master node: counts an arrived user of a worker."""
+    _arrive(environment.runner, msg.data["user_type"])
+
+
+def _on_release(environment, msg, **kwargs):
+    """Worker node: releases the waiting users."""
+    _released[msg.data["user_type"]].set()
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    global _runner
+    _runner = environment.runner
+    if isinstance(environment.runner, MasterRunner):
+        environment.runner.register_message(RENDEZVOUS_ARRIVED_MESSAGE, _on_arrived)
+    elif isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message(RENDEZVOUS_RELEASE_MESSAGE, _on_release)
+
+
+@events.spawning_complete.add_listener
+def on_spawning_complete(user_count, **kwargs):
+    """Master node or local runner: releases the users that have all arrived before the spawning was complete."""
+    global _spawning_complete
+    if _runner is None or isinstance(_runner, WorkerRunner):
+        return
+    _spawning_complete = True
+    for user_type in list(_arrived):
+        _release_if_all_arrived(_runner, user_type)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """Holds the users of each new test run again."""
+    global _spawning_complete
+    _spawning_complete = False
+    _arrived.clear()
+    _released.clear()
@@ -0,0 +1,131 @@
+"""A pool of pre-authenticated Serve sessions of the locust test users.
+
+Logging in is slow in Serve because of the password hashing. When the pool is enabled, a fixed number
+of the test users locust_test_user_{id}@test.uu.net are logged in once at the start of the test run.
+Their cookies are cached and the power users check out a logged in session instead of logging in,
+and check it back in when done. The power users then measure the project and app pages only.
+
+Enable the pool by setting the env var SERVE_LOCUST_SESSION_POOL_SIZE to the number of sessions per
+Locust process. Leave it unset, or 0, to run the login storm scenario where each power user logs in.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.cookiejar import Cookie
+
+import gevent
+from _distributed import allocate_user_id
+from gevent.event import Event
+from gevent.pool import Pool
+from gevent.queue import Queue
+from locust import events
+from locust.clients import HttpSession
+from locust.runners import MasterRunner
+
+logger = logging.getLogger(__name__)
+
+
+# The number of logged in sessions in the pool of each Locust process. 0 disables the pool.
+SERVE_LOCUST_SESSION_POOL_SIZE = int(os.environ.get("SERVE_LOCUST_SESSION_POOL_SIZE", 0))
+# The max time in seconds that a user waits to check out a session
+SERVE_LOCUST_SESSION_POOL_TIMEOUT = float(os.environ.get("SERVE_LOCUST_SESSION_POOL_TIMEOUT", 60))
+# The number of sessions that are logged in concurrently when filling the pool
+SESSION_POOL_LOGIN_CONCURRENCY = 5
+
+
+@dataclass
+class PooledSession:
+    """A logged in session of a test user."""
+
+    username: str
+    csrftoken: str
+    cookies: list[Cookie] = field(default_factory=list)
+
+
+class SessionPool:
+    """Holds the logged in sessions and hands them out to one user at a time."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._sessions: Queue = Queue()
+        self._filled = Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def fill(self, environment):
+        """Logs in the test users and adds their sessions to the pool."""
+        logger.info("Logging in %s test users into the session pool", self.size)
+
+        pool = Pool(SESSION_POOL_LOGIN_CONCURRENCY)
+        for _ in range(self.size):
+            pool.spawn(self._login_test_user, environment)
+        pool.join()
+
+        logger.info("The session pool contains %s logged in sessions", self._sessions.qsize())
+        if self._sessions.empty():
+            logger.error("No test user could be logged in. The power users will not be able to check out sessions.")
+        self._filled.set()
+
+    def _login_test_user(self, environment):
+        user_id = allocate_user_id(environment, "power")
+        username = f"locust_test_user_{user_id}@test.uu.net"
+
+        client = HttpSession(base_url=environment.host, request_event=environment.events.request, user=None)
+        client.verify = False  # Don't check if certificate is valid
+
+        client.get("/accounts/login/", name="---SESSION-POOL---LOGIN-PAGE")
+        login_data = dict(
+            username=username,
+            password=os.environ.get("SERVE_LOCUST_TEST_USER_PASS"),
+            csrfmiddlewaretoken=client.cookies.get("csrftoken"),
+        )
+
+        with client.post(
+            url="/accounts/login/",
+            data=login_data,
+            headers={"Referer": "foo"},
+            name="---SESSION-POOL---LOGIN",
+            catch_response=True,
+        ) as response:
+            # If login succeeds then the url contains /projects/, else /accounts/login/
+            if "/projects" not in response.url:
+                logger.warning(f"Session pool login as user {username} failed. Response URL {response.url}")
+                response.failure(f"Login as user {username} failed. Response URL does not contain /projects")
+                return
+
+        # Django rotates the csrf token on login so read it after logging in
+        self._sessions.put(PooledSession(username, client.cookies["csrftoken"], list(client.cookies)))
+
+    @contextmanager
+    def checkout(self):
+        """Checks out a logged in session for the duration of the with block.
+        Raises gevent.queue.Empty if no session becomes available in time.
+        """
+        self._filled.wait(timeout=SERVE_LOCUST_SESSION_POOL_TIMEOUT)
+        pooled_session = self._sessions.get(timeout=SERVE_LOCUST_SESSION_POOL_TIMEOUT)
+        try:
+            yield pooled_session
+        finally:
+            self._sessions.put(pooled_session)
+
+    def clear(self):
+        while not self._sessions.empty():
+            self._sessions.get_nowait()
+        self._filled.clear()
+
+
+session_pool = SessionPool(SERVE_LOCUST_SESSION_POOL_SIZE)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    if not session_pool.enabled or isinstance(environment.runner, MasterRunner):
+        return
+    session_pool.clear()
+    # Fill the pool in the background. The user ids are allocated by the master,
+    # and the answers can only be received after this listener has returned.
+    gevent.spawn(session_pool.fill, environment)
@@ -0,0 +1,122 @@
+"""Streaming parser of the access logs of the Serve ingress, for replaying the production traffic.
+
+The lines are parsed in the nginx combined log format, which the ingress-nginx log format starts with:
+    $remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent "$http_referer" "$http_user_agent"
+Any fields after the user agent, such as the request time and the upstream of ingress-nginx, are ignored.
+The file is read one line at a time, also when gzip compressed, so that logs of any size can be replayed.
+"""
+
+import gzip
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TextIO
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+
+_LOG_LINE_PATTERN = re.compile(
+    r'(?P<remote_addr>\S+) \S+ (?P<remote_user>\S+) \[(?P<time_local>[^\]]+)\] "(?P<request>(?:[^"\\]|\\.)*)" '
+    r'(?P<status>\d{3}) (?P<body_bytes_sent>\d+|-)(?: "(?P<referer>(?:[^"\\]|\\.)*)" '
+    r'"(?P<user_agent>(?:[^"\\]|\\.)*)")?'
+)
+_TIME_LOCAL_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+# Path segments that are ids, which are replaced in the request names to group the statistics
+_ID_SEGMENT_PATTERN = re.compile(r"/(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(?=/|$)")
+
+
+@dataclass
+class LogRecord:
+    """A request of an access log."""
+
+    # The time of the request as a UNIX timestamp
+    timestamp: float
+    # The client that sent the request, the remote address and the user agent
+    client: str
+    method: str
+    # The path and query of the request, or the absolute URL if the request line has one
+    url: str
+
+
+class _TimeParser:
+    """Parses the time_local field, reusing the result for the consecutive lines of the same second."""
+
+    def __init__(self) -> None:
+        self._last_text: str | None = None
+        self._last_timestamp = 0.0
+
+    def parse(self, text: str) -> float:
+        if text != self._last_text:
+            self._last_timestamp = datetime.strptime(text, _TIME_LOCAL_FORMAT).timestamp()
+            self._last_text = text
+        return self._last_timestamp
+
+
+def parse_log_line(line: str, time_parser: _TimeParser | None = None) -> LogRecord | None:
+    """Returns the request of an access log line, or None if the line is not in the combined log format."""
+    match = _LOG_LINE_PATTERN.match(line)
+    if match is None:
+        return None
+    method, _, rest = match["request"].partition(" ")
+    url = rest.rsplit(" ", 1)[0] if " " in rest else rest
+    if not method or not url:
+        return None
+    try:
+        timestamp = (time_parser or _TimeParser()).parse(match["time_local"])
+    except ValueError:
+        return None
+    client = f"{match['remote_addr']} {match['user_agent'] or ''}"
+    return LogRecord(timestamp, client, method, url)
+
+
+def _open_log(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def iter_log_records(path: str):
+    """Yields the requests of an access log file in the order of the file, skipping the lines that do not parse."""
+    time_parser = _TimeParser()
+    skipped = 0
+    with _open_log(path) as f:
+        for line in f:
+            record = parse_log_line(line, time_parser)
+            if record is None:
+                skipped += 1
+                continue
+            yield record
+    if skipped:
+        logger.info("Skipped %s lines of %s that are not in the combined log format", skipped, path)
+
+
+def get_request_name(url: str) -> str:
+    """Returns the name of a replayed request for the statistics: the path without the query,
+    with the numeric and UUID path segments replaced by [id].
+    """
+    return _ID_SEGMENT_PATTERN.sub("/[id]", urlsplit(url).path) or "/"
+
+
+def parse_host_map(value: str | None) -> dict[str, str]:
+    """Parses a host map such as serve.scilifelab.se=staging.serve.scilifelab.se,other.se=other-staging.se"""
+    host_map = {}
+    for entry in (value or "").split(","):
+        source, separator, target = entry.strip().partition("=")
+        if separator:
+            host_map[source.strip()] = target.strip()
+    return host_map
+
+
+def rewrite_host(url: str, host_map: dict[str, str]) -> str | None:
+    """Rewrites the host of an absolute URL using the host map. Paths are sent to the host of the test run.
+    Returns None for an absolute URL whose host is not in the host map, which must not be sent to its original host.
+    """
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url
+    if parts.hostname not in host_map:
+        return None
+    netloc = host_map[parts.hostname] + (f":{parts.port}" if parts.port else "")
+    return urlunsplit(parts._replace(netloc=netloc))
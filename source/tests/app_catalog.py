@@ -0,0 +1,114 @@
+"""The catalog of the user apps that the app viewer users open, per host of the Serve environment.
+
+The catalog is a JSON object that maps host patterns to weighted lists of app URLs, for example:
+
+    {
+      "https://serve-dev.scilifelab.se": [
+        {"url": "https://loadtest-shinyproxy.{netloc}/app/loadtest-shinyproxy", "weight": 10},
+        {"url": "https://another-app.{netloc}/app/another-app", "weight": 1}
+      ],
+      "http://localhost*": [{"url": "{host}/app/loadtest-shinyproxy", "weight": 1}]
+    }
+
+The host patterns are matched with fnmatch. A pattern that equals the host is used first, and else the matching
+pattern with the most characters that are not wildcards, so the order of the patterns does not matter.
+In the URLs, {host} is replaced by the host, such as https://serve-dev.scilifelab.se,
+and {netloc} by the host without the scheme, such as serve-dev.scilifelab.se.
+The apps are opened with probabilities proportional to their weights. A host without a matching pattern
+opens DEFAULT_APP_URL, the app of the local mock of Serve, and an error is logged.
+
+The env var SERVE_LOCUST_APP_CATALOG is either the path of a JSON file or the JSON itself.
+By default the catalog app_catalog.json next to this file is used.
+"""
+
+import json
+import logging
+import os
+import random
+from bisect import bisect
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import cache
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_APP_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_catalog.json")
+
+SERVE_LOCUST_APP_CATALOG = os.environ.get("SERVE_LOCUST_APP_CATALOG") or DEFAULT_APP_CATALOG_PATH
+
+# The app of the hosts that are not in the catalog
+DEFAULT_APP_URL = "{host}/app/loadtest-shinyproxy"
+
+
+@dataclass(frozen=True)
+class HostApps:
+    """The app URLs of a host with their cumulative weights, for choosing an app without any string processing."""
+
+    urls: tuple[str, ...]
+    cum_weights: tuple[float, ...]
+
+    def choose(self) -> str:
+        """Returns a random app URL, with probabilities proportional to the app weights."""
+        return self.urls[bisect(self.cum_weights, random.random() * self.cum_weights[-1])]
+
+
+class AppCatalog:
+    """Maps host patterns to weighted lists of app URLs."""
+
+    def __init__(self, catalog: dict[str, list[dict]]):
+        self.entries = [(pattern, self._validate(pattern, apps)) for pattern, apps in catalog.items()]
+
+    @staticmethod
+    def _validate(pattern: str, apps: list[dict]) -> list[dict]:
+        if not isinstance(apps, list) or not apps:
+            raise ValueError(f"The app catalog entry {pattern} must be a non-empty list of apps")
+        for app in apps:
+            if not isinstance(app.get("url"), str) or not app.get("weight", 1) > 0:
+                raise ValueError(f"The app catalog entry {pattern} has an invalid app {app}")
+        return apps
+
+    @cache
+    def get_apps(self, host: str) -> HostApps:
+        """Returns the apps of the most specific host pattern that matches the host,
+        or DEFAULT_APP_URL if no pattern matches.
+        """
+        matches = [(pattern, apps) for pattern, apps in self.entries if fnmatchcase(host, pattern)]
+        if not matches:
+            logger.error(
+                "The app catalog %s has no apps for the host %s. Add the host to the catalog. Opening %s instead.",
+                SERVE_LOCUST_APP_CATALOG,
+                host,
+                DEFAULT_APP_URL.format(host=host.rstrip("/")),
+            )
+            matches = [("", [{"url": DEFAULT_APP_URL}])]
+        pattern, apps = max(matches, key=lambda match: (match[0] == host, _literal_length(match[0])))
+
+        netloc = urlsplit(host).netloc
+        urls = tuple(app["url"].format(host=host.rstrip("/"), netloc=netloc) for app in apps)
+        cum_weights, total = [], 0.0
+        for app in apps:
+            total += app.get("weight", 1)
+            cum_weights.append(total)
+        logger.info("The app catalog has %s apps for host %s", len(urls), host)
+        return HostApps(urls, tuple(cum_weights))
+
+
+def _literal_length(pattern: str) -> int:
+    """Returns the number of characters of a host pattern that are not wildcards."""
+    return len(pattern) - sum(pattern.count(wildcard) for wildcard in "*?")
+
+
+def load_app_catalog(source: str) -> AppCatalog:
+    """Loads the app catalog from a JSON file, or from a JSON string."""
+    if source.lstrip().startswith("{"):
+        return AppCatalog(json.loads(source))
+    with open(source) as f:
+        return AppCatalog(json.load(f))
+
+
+@cache
+def get_app_catalog() -> AppCatalog:
+    """Returns the app catalog, which is loaded on the first call."""
+    return load_app_catalog(SERVE_LOCUST_APP_CATALOG)
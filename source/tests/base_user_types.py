@@ -1,9 +1,42 @@
 import logging
 import os
+import time
 import warnings
-
-from locust import HttpUser, between, task
-from lxml import etree
+from collections import Counter
+from http.cookiejar import CookieJar
+from typing import TYPE_CHECKING, Any, Callable, TypeAlias
+from urllib.parse import urlsplit
+
+import _hdr_reporting  # noqa: F401 Records the HDR histograms when enabled
+from _connections import (
+    SERVE_LOCUST_REPORT_CONNECTIONS,
+    UserSSLContext,
+    create_pool_manager,
+)
+from _coordinated_omission import (
+    EXPECTED_INTERVAL_CONTEXT_KEY,
+    get_expected_interval_ms,
+)
+from _distributed import allocate_user_id
+from _log_replay import replayer
+from _rendezvous import wait_for_all_users
+from _session_pool import PooledSession, session_pool
+from access_log import get_request_name
+from app_catalog import get_app_catalog
+from env_vars import get_env_bool
+from form_parsing import get_first_option_values
+from gevent.queue import Empty
+from locust import FastHttpUser, HttpUser, User, constant, task
+from locust.clients import HttpSession
+from openapi_client import OPENAPI_PATH, OpenAPIClient
+from page_resources import SubresourceFetcher, get_cached_subresources
+from shinyproxy import AppStartupError, ShinyProxyClient
+from streaming import get_streamed
+from synthetic_requests import log_synthetic_request
+from transactions import Transaction
+from urllib3 import PoolManager
+from wait_times import think_time
+from workload_model import get_workload_model
 
 logger = logging.getLogger(__name__)
 
@@ -12,57 +45,272 @@ warnings.filterwarnings("ignore")
 
 SERVE_LOCUST_TEST_USER_PASS = os.environ.get("SERVE_LOCUST_TEST_USER_PASS")
 SERVE_LOCUST_DO_CREATE_OBJECTS = bool(os.environ.get("SERVE_LOCUST_DO_CREATE_OBJECTS", False))
+# Use the geventhttpclient based FastHttpUser variants of the user types in the test plans
+SERVE_LOCUST_USE_FAST_HTTP_CLIENT = get_env_bool("SERVE_LOCUST_USE_FAST_HTTP_CLIENT")
+# Reuse the csrftoken cookie of the session instead of loading a page before each form submission
+SERVE_LOCUST_CACHE_CSRF_TOKEN = get_env_bool("SERVE_LOCUST_CACHE_CSRF_TOKEN")
+# Stop the user apps started by the app startup users when started, instead of waiting for the heartbeat timeout
+SERVE_LOCUST_STOP_STARTED_APPS = get_env_bool("SERVE_LOCUST_STOP_STARTED_APPS", default=True)
+# Also record the coordinated omission corrected response times of the closed loop user types
+SERVE_LOCUST_CORRECT_COORDINATED_OMISSION = get_env_bool("SERVE_LOCUST_CORRECT_COORDINATED_OMISSION")
+# Stream the pages of the visiting users, reporting the time to first byte and the time to last byte
+SERVE_LOCUST_STREAM_PAGES = get_env_bool("SERVE_LOCUST_STREAM_PAGES")
+# A string that the streamed pages must contain, such as </html>. Unset skips the check.
+SERVE_LOCUST_STREAM_PAGES_MARKER = os.environ.get("SERVE_LOCUST_STREAM_PAGES_MARKER") or None
+# Fetch the stylesheets, scripts and images of the public pages visited by the visiting users, as a browser does
+SERVE_LOCUST_FETCH_SUBRESOURCES = get_env_bool("SERVE_LOCUST_FETCH_SUBRESOURCES")
+# The max number of subresources that a user fetches at a time, as the connections per host of a browser
+SERVE_LOCUST_SUBRESOURCE_CONCURRENCY = int(os.environ.get("SERVE_LOCUST_SUBRESOURCE_CONCURRENCY", 6))
+# Keep the connections of the users alive between requests
+SERVE_LOCUST_KEEP_ALIVE = get_env_bool("SERVE_LOCUST_KEEP_ALIVE", default=True)
+# Resume the TLS sessions of the users on new connections, instead of a full TLS handshake for each connection
+SERVE_LOCUST_TLS_SESSION_RESUMPTION = get_env_bool("SERVE_LOCUST_TLS_SESSION_RESUMPTION")
+
+# The max number of app details that the extended API clients fetch at a time
+SERVE_LOCUST_API_FAN_OUT = int(os.environ.get("SERVE_LOCUST_API_FAN_OUT", 4))
+# The number of listed public apps that the extended API clients fetch the details of
+SERVE_LOCUST_API_MAX_APP_DETAILS = int(os.environ.get("SERVE_LOCUST_API_MAX_APP_DETAILS", 10))
+
+# The max number of connections per host that browsers use at a time
+BROWSER_CONNECTIONS_PER_HOST = 6
+
+
+# Utility functions
+def get_cookiejar(client) -> CookieJar:
+    """Returns the cookie jar of the client session.
+    Works for both the requests based HttpSession and the geventhttpclient based FastHttpSession.
+    """
+    cookiejar: CookieJar = client.cookies if isinstance(client, HttpSession) else client.cookiejar
+    return cookiejar
+
+
+def get_cookie(client, name: str) -> str:
+    """Returns the value of a cookie from the client session.
+    Raises a KeyError if the cookie is not set, as with the requests cookie jar.
+    """
+    for cookie in get_cookiejar(client):
+        if cookie.name == name and cookie.value is not None:
+            return cookie.value
+    raise KeyError(name)
+
+
+def get_cached_csrftoken(client) -> str | None:
+    """Returns the csrftoken cookie of the client session if the csrf token cache is enabled and the cookie is set.
+    Django keeps the csrftoken cookie valid for the whole session, and rotates it on login using a new cookie.
+    """
+    if not SERVE_LOCUST_CACHE_CSRF_TOKEN:
+        return None
+    try:
+        return get_cookie(client, "csrftoken")
+    except KeyError:
+        return None
+
+
+def handle_csrf_failure(client, response):
+    """Removes the cached csrftoken cookie if a form submission was rejected,
+    so that the csrf token is fetched again before the next form submission.
+    """
+    if SERVE_LOCUST_CACHE_CSRF_TOKEN and response.status_code == 403:
+        logger.info("Form submission was rejected with status 403. Removing the cached csrf token.")
+        cookiejar = get_cookiejar(client)
+        for cookie in [cookie for cookie in cookiejar if cookie.name == "csrftoken"]:
+            cookiejar.clear(cookie.domain, cookie.path, cookie.name)
+
 
+class ConnectionUserMixin(User):
+    """The connection settings of a user type, applied to the HTTP client of each user when it is created.
+    Works for both the requests based HttpUser and the geventhttpclient based FastHttpUser. See _connections.py.
+    """
+
+    abstract = True
+
+    # The max number of connections per host that a user uses at a time. None uses the default of the HTTP client.
+    connection_pool_size: int | None = None
+    # Whether the connections are kept alive between requests
+    keep_alive = SERVE_LOCUST_KEEP_ALIVE
+    # Whether the TLS sessions are resumed on new connections to the same host
+    tls_session_resumption = SERVE_LOCUST_TLS_SESSION_RESUMPTION
+
+    # The settings of the HTTP clients that are set from the above, defined by FastHttpUser and HttpUser
+    concurrency: int
+    default_headers: dict | None
+    ssl_context_factory: Callable | None
+    pool_manager: PoolManager | None
+
+    def __init__(self, environment):
+        # The settings of the HTTP clients are read when the clients are created by the base classes
+        ssl_context = None
+        if self.tls_session_resumption or SERVE_LOCUST_REPORT_CONNECTIONS:
+            ssl_context = UserSSLContext(resume_sessions=self.tls_session_resumption)
+
+        if isinstance(self, FastHttpUser):
+            if self.connection_pool_size:
+                self.concurrency = self.connection_pool_size
+            if ssl_context is not None:
+                self.ssl_context_factory = lambda **kwargs: ssl_context
+            if not self.keep_alive:
+                self.default_headers = {**(self.default_headers or {}), "Connection": "close"}
+        elif isinstance(self, HttpUser) and self.pool_manager is None:
+            self.pool_manager = create_pool_manager(self.connection_pool_size, ssl_context)
+
+        super().__init__(environment)
+
+        if not self.keep_alive and isinstance(self.client, HttpSession):
+            self.client.headers["Connection"] = "close"
+
+
+class CoordinatedOmissionUserMixin(User):
+    """Adds the expected interval between the tasks of the user to the request context, so that the requests
+    are also recorded in the coordinated omission corrected series when SERVE_LOCUST_CORRECT_COORDINATED_OMISSION
+    is True. See _coordinated_omission.py.
+    The wait time is the gap between tasks, so only the first request of a task is corrected. The following
+    requests of a task are sent right after the previous response as intended, and get an expected interval of 0.
+    """
+
+    abstract = True
+
+    # Whether the requests of the user type are recorded in the corrected series
+    correct_coordinated_omission = SERVE_LOCUST_CORRECT_COORDINATED_OMISSION
+    # The expected interval in seconds between the tasks of a user. None uses the mean wait time.
+    expected_interval: float | None = None
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        if not self.correct_coordinated_omission:
+            return
+        # Sample the wait time before it is wrapped below
+        self._expected_interval_ms = get_expected_interval_ms(self)
+        self._first_request_of_task = True
+        task_wait_time = self.wait_time
+
+        def wait_time() -> float:
+            # Locust waits once between two tasks, so the next request is the first of its task
+            self._first_request_of_task = True
+            return float(task_wait_time())
+
+        self.wait_time = wait_time
+
+    def context(self) -> dict:
+        if not self.correct_coordinated_omission:
+            return {}
+        expected_interval_ms = self._expected_interval_ms if self._first_request_of_task else 0.0
+        self._first_request_of_task = False
+        return {EXPECTED_INTERVAL_CONTEXT_KEY: expected_interval_ms}
+
+
+class WorkloadModelUserMixin(User):
+    """Applies the workload model of SERVE_LOCUST_WORKLOAD_MODEL to the user classes of the test plans.
+    The weight, wait time and task weights of a user class that sets its own wait_time are replaced by the values
+    fitted for its workload_user_type. The tasks that are not in the model keep their weights. See workload_model.py.
+    """
 
-class VisitingBaseUser(HttpUser):
-    """Base class for a visiting website user type that may also register a new user account in Serve.
+    abstract = True
+
+    # The user type of the traffic in the workload model, such as visiting. None does not use the model.
+    workload_user_type: str | None = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("abstract") or "wait_time" not in cls.__dict__:
+            return
+        workload = get_workload_model().get(cls.workload_user_type)
+        if workload is None:
+            return
+        if workload.weight is not None:
+            cls.weight = workload.weight
+        if workload.min_wait is not None:
+            cls.wait_time = think_time(workload.min_wait, workload.max_wait, workload.histogram)
+        if workload.task_weights:
+            # The tasks list of a user class repeats each task by its weight
+            tasks = []
+            for task_func, weight in Counter(cls.tasks).items():
+                tasks.extend([task_func] * workload.task_weights.get(task_func.__name__, weight))
+            cls.tasks = tasks
+        logger.info(
+            "Using the workload model of %s for %s: weight %s, wait time between(%s, %s)",
+            cls.workload_user_type,
+            cls.__name__,
+            cls.weight,
+            workload.min_wait,
+            workload.max_wait,
+        )
+
+
+class VisitingUserMixin(ConnectionUserMixin, CoordinatedOmissionUserMixin, WorkloadModelUserMixin):
+    """Tasks of a visiting website user type that may also register a new user account in Serve.
     Simulates a casual, visiting, non-authenticated user that browses the public pages.
     Some of these users may register new user accounts, using emails with pattern:
         locust_test_user_created_by_testrun_{i}@test.uu.net
+    Use one of the HTTP client specific base classes VisitingBaseUser or FastVisitingBaseUser.
     """
 
+    # The HttpSession or the FastHttpSession of the HTTP client specific base class
+    client: Any
+
     abstract = True
 
     user_type = ""
-    user_individual_id = 0
+    workload_user_type = "visiting"
+    connection_pool_size = BROWSER_CONNECTIONS_PER_HOST
     local_individual_id = 0
     user_has_registered = False
+    # Whether the public pages are streamed, see streaming.py
+    stream_pages = SERVE_LOCUST_STREAM_PAGES
+    # Whether the subresources of the public pages are fetched, see page_resources.py
+    fetch_subresources = SERVE_LOCUST_FETCH_SUBRESOURCES
+    subresource_fetcher: SubresourceFetcher | None = None
 
     @classmethod
-    def get_user_id(cls) -> int:
-        """Increments the class property user_individual_id.
-        Used to assign a unique id to each individual of this user type.
+    def get_user_id(cls, environment) -> int:
+        """Allocates the next id of the visiting user type counter.
+        Used to assign a unique id to each individual of this user type, also across worker nodes.
         """
-        VisitingBaseUser.user_individual_id += 1
-        return VisitingBaseUser.user_individual_id
+        return allocate_user_id(environment, "visiting")
 
     def on_start(self):
         """Called when a User starts running."""
-        self.client.verify = False  # Don't check if certificate is valid
-        self.local_individual_id = VisitingBaseUser.get_user_id()
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't check if certificate is valid
+        self.local_individual_id = VisitingUserMixin.get_user_id(self.environment)
+        if self.fetch_subresources:
+            # Each user has its own HTTP cache, as each browser does
+            self.subresource_fetcher = SubresourceFetcher(self.client, SERVE_LOCUST_SUBRESOURCE_CONCURRENCY)
         logger.info("ONSTART new user type %s, individual %s", self.user_type, self.local_individual_id)
 
+    def browse_page(self, path: str):
+        """Loads a public page, streaming it when SERVE_LOCUST_STREAM_PAGES is True,
+        and its subresources when SERVE_LOCUST_FETCH_SUBRESOURCES is True.
+        """
+        # The content of a page is only needed the first time its subresources are extracted
+        parse_page = self.subresource_fetcher is not None and get_cached_subresources(path) is None
+        if self.stream_pages and not parse_page:
+            response = get_streamed(self.client, path, marker=SERVE_LOCUST_STREAM_PAGES_MARKER)
+        else:
+            response = self.client.get(path)
+        if self.subresource_fetcher is not None and response.status_code == 200:
+            self.subresource_fetcher.fetch(path, response.content if parse_page else None)
+
     # Tasks
 
     @task(3)
     def browse_homepage(self):
-        self.client.get("/home/")
+        self.browse_page("/home/")
 
     @task
     def browse_about(self):
-        self.client.get("/about/")
+        self.browse_page("/about/")
 
     @task
     def browse_apps(self):
-        self.client.get("/apps/")
+        self.browse_page("/apps/")
 
     @task
     def browse_models(self):
-        self.client.get("/models/")
+        self.browse_page("/models/")
 
     @task
     def browse_user_guide(self):
-        self.client.get("/docs/")
+        self.browse_page("/docs/")
 
     @task
     def register_user(self):
@@ -100,7 +348,7 @@ class VisitingBaseUser(HttpUser):
                 name="---REGISTER-NEW-USER-ACCOUNT",
                 catch_response=True,
             ) as response:
-                logger.debug("signup response.status_code = %s, %s", response.status_code, response.reason)
+                logger.debug("signup response.status_code = %s", response.status_code)
                 # If the signup succeeds then url = /accounts/login/
                 logger.debug("signup response.url = %s", response.url)
                 if "/accounts/login" in response.url:
@@ -111,26 +359,37 @@ class VisitingBaseUser(HttpUser):
                             Response URL {response.url} does not contain /accounts/login"
                     )
                     logger.debug(response.content)
+                    handle_csrf_failure(self.client, response)
                     response.failure(
                         f"Register as new user {self.email} failed. \
                             Response URL {response.url} does not contain /accounts/login"
                     )
 
     def get_token(self):
+        if csrftoken := get_cached_csrftoken(self.client):
+            self.csrftoken = csrftoken
+            logger.debug("Using the cached csrf token")
+            return
+
         self.client.get("/signup/")
-        self.csrftoken = self.client.cookies["csrftoken"]
+        self.csrftoken = get_cookie(self.client, "csrftoken")
         logger.debug("self.csrftoken = %s", self.csrftoken)
 
 
-class PowerBaseUser(HttpUser):
-    """Base class for the power user type that logs into Serve using an existing user account,
+class PowerUserMixin(ConnectionUserMixin, CoordinatedOmissionUserMixin, WorkloadModelUserMixin):
+    """Tasks of the power user type that logs into Serve using an existing user account,
     then creates resources such as a project and finally deletes the project.
+    Use one of the HTTP client specific base classes PowerBaseUser or FastPowerBaseUser.
     """
 
+    # The HttpSession or the FastHttpSession of the HTTP client specific base class
+    client: Any
+
     abstract = True
 
     user_type = ""
-    user_individual_id = 0
+    workload_user_type: str | None = "power"
+    connection_pool_size = BROWSER_CONNECTIONS_PER_HOST
     local_individual_id = 0
 
     # Student type of Power users also create JupyterLab notebooks
@@ -142,20 +401,29 @@ class PowerBaseUser(HttpUser):
     project_url = "UNSET"
 
     is_authenticated = False
+    # The user continues a logged in session from the session pool
+    is_pooled_session = False
     task_has_run = False
+    # Whether each user runs the power user task only once, instead of once per arrival in the open model
+    run_task_once = True
+    # The number of workflows that the user has started, to name the projects of the workflows uniquely
+    workflow_count = 0
 
     @classmethod
-    def get_user_id(cls) -> int:
-        """Increments the class property user_individual_id.
-        Used to assign a unique id to each individual of this user type.
+    def get_user_id(cls, environment) -> int:
+        """Allocates the next id of the power user type counter.
+        Used to assign a unique id to each individual of this user type, also across worker nodes,
+        so that each individual logs in using its own test user account.
+        When the session pool is enabled, the test user accounts are instead logged in by the pool,
+        and the id is only used to name the resources created by the user.
         """
-        PowerBaseUser.user_individual_id += 1
-        return PowerBaseUser.user_individual_id
+        return allocate_user_id(environment, "pooled-power" if session_pool.enabled else "power")
 
     def on_start(self):
         """Called when a User starts running."""
-        self.client.verify = False  # Don't check if certificate is valid
-        self.local_individual_id = PowerBaseUser.get_user_id()
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't check if certificate is valid
+        self.local_individual_id = PowerUserMixin.get_user_id(self.environment)
         logger.info(
             f"ONSTART new user type {self.user_type}, individual {self.local_individual_id}, \
             IsStudent? {self.is_student_user}"
@@ -167,7 +435,7 @@ class PowerBaseUser(HttpUser):
 
     @task
     def power_user_task(self):
-        if self.task_has_run is True:
+        if self.task_has_run is True and self.run_task_once:
             logger.debug("Skipping power user task for user %s. It has already been run.", self.local_individual_id)
             return
 
@@ -175,21 +443,57 @@ class PowerBaseUser(HttpUser):
 
         logger.info("executing power user task")
 
+        # Each run of the task starts logged out, so that a failed login does not continue an earlier session
+        self.is_authenticated = False
+        self.is_pooled_session = False
+
+        if not session_pool.enabled:
+            self.power_user_workflow()
+            return
+
+        # Use an already logged in session of a test user from the session pool
+        try:
+            with session_pool.checkout() as pooled_session:
+                self.use_pooled_session(pooled_session)
+                try:
+                    self.power_user_workflow()
+                finally:
+                    # Keep any cookies updated by Serve for the next user of the session
+                    pooled_session.cookies = list(get_cookiejar(self.client))
+        except Empty:
+            logger.warning("No logged in session available in the session pool. Ending task.")
+
+    def power_user_workflow(self):
+        # The workflow and each of its phases are reported as custom requests of type TRANSACTION and PHASE
+        workflow = "student-workflow" if self.is_student_user else "power-user-workflow"
+        transaction = Transaction(self.environment, workflow)
+        try:
+            self.run_power_user_phases(transaction)
+        finally:
+            transaction.end()
+
+    def run_power_user_phases(self, transaction: Transaction):
         # Open the home page
-        self.client.get("/home/")
+        with transaction.phase("home") as phase:
+            phase.check(self.client.get("/home/"))
 
-        # Open the login page and get the csrf token
-        self.get_token()
+        if not self.is_pooled_session:
+            with transaction.phase("login") as phase:
+                # Open the login page and get the csrf token
+                self.get_token()
 
-        # Login as user locust_test_user_{id}@test.uu.net
-        self.login()
+                # Login as user locust_test_user_{id}@test.uu.net
+                self.login()
+                if self.is_authenticated is False:
+                    phase.fail(f"User {self.username} is not authenticated")
 
         if self.is_authenticated is False:
             logger.info(f"After login function but user {self.username} is not authenticated. Ending task.")
             return
 
         # Open user docs pages
-        self.client.get("/docs/")
+        with transaction.phase("docs") as phase:
+            phase.check(self.client.get("/docs/"))
 
         if SERVE_LOCUST_DO_CREATE_OBJECTS is False or SERVE_LOCUST_DO_CREATE_OBJECTS == "False":
             logger.info(
@@ -202,13 +506,18 @@ class PowerBaseUser(HttpUser):
                 f"Creating and deleting projects and apps as user {self.username}, IsStudent? {self.is_student_user}"
             )
 
-            # Create project: locust_test_project_new_<id>
-            project_name = f"locust_test_project_new_{self.local_individual_id}"
-            self.create_project(project_name)
+            # Create project: locust_test_project_new_<id>_<workflow>
+            self.workflow_count += 1
+            project_name = f"locust_test_project_new_{self.local_individual_id}_{self.workflow_count}"
+            with transaction.phase("create-project") as phase:
+                project_created = self.create_project(project_name)
+                if not project_created:
+                    phase.fail(f"Creating the project {project_name} failed")
 
             # Open the project
             logger.info("Opening project at URL %s", self.project_url)
-            self.client.get(self.project_url, name="/projects/locust_test_project_new")
+            with transaction.phase("open-project") as phase:
+                phase.check(self.client.get(self.project_url, name="/projects/locust_test_project_new"))
 
             # Student type of users also create and use JupyterLab notebooks
             if self.is_student_user:
@@ -217,25 +526,51 @@ class PowerBaseUser(HttpUser):
                 logger.info(
                     f"Creating a JupyterLab notebook {app_name}. This test user is a Student type of PowerUser."
                 )
-                self._create_app(project_name, app_name)
+                with transaction.phase("create-app") as phase:
+                    if not self._create_app(project_name, app_name):
+                        phase.fail(f"Creating the app {app_name} failed")
 
                 # TODO: Consider also opening the app (and deleting after some time)
 
-            else:
-                # Delete the project if the user is not a Student
-                self.delete_project()
+            # Delete the project, with its app, unless the user is a Student that keeps them for the rest of the run.
+            # The users that run the task for each arrival of the open model always delete it, so that the objects
+            # of the arrivals do not pile up on Serve.
+            if project_created and (not self.is_student_user or not self.run_task_once):
+                with transaction.phase("delete-project") as phase:
+                    if not self.delete_project():
+                        phase.fail(f"Deleting the project {self.project_url} failed")
 
         # Logout the user
-        self.logout()
+        with transaction.phase("logout") as phase:
+            if not self.logout():
+                phase.fail(f"Logging out the user {self.username} failed")
+
+    def use_pooled_session(self, pooled_session: PooledSession):
+        """Continues a logged in session from the session pool, instead of logging in."""
+        for cookie in pooled_session.cookies:
+            get_cookiejar(self.client).set_cookie(cookie)
+        self.username = pooled_session.username
+        self.csrftoken = pooled_session.csrftoken
+        self.is_authenticated = True
+        self.is_pooled_session = True
+        logger.debug("Using the pooled session of user %s", self.username)
 
     def get_token(self, relative_url: str = "/accounts/login/"):
-        self.client.get(relative_url)
-        self.csrftoken = self.client.cookies["csrftoken"]
+        if csrftoken := get_cached_csrftoken(self.client):
+            self.csrftoken = csrftoken
+            logger.debug("Using the cached csrf token instead of opening %s", relative_url)
+            return
+
+        # Name the request by its path also for absolute URLs, as the requests client does
+        url_parts = urlsplit(relative_url)
+        request_name = f"{url_parts.path}?{url_parts.query}" if url_parts.query else url_parts.path
+        self.client.get(relative_url, name=request_name)
+        self.csrftoken = get_cookie(self.client, "csrftoken")
         logger.debug("self.csrftoken = %s", self.csrftoken)
 
-    def create_project(self, project_name: str):
+    def create_project(self, project_name: str) -> bool:
         # Update the csrf token
-        self.get_token("/projects/create/?template=Default project")
+        self.get_token("/projects/create/?template=Default%20project")
 
         project_data = dict(
             name=project_name,
@@ -251,20 +586,23 @@ class PowerBaseUser(HttpUser):
             name="---CREATE-NEW-PROJECT",
             catch_response=True,
         ) as response:
-            logger.debug("create project response.status_code = %s, %s", response.status_code, response.reason)
+            logger.debug("create project response.status_code = %s", response.status_code)
             # If succeeds then url = /projects/<project-name>/
             logger.debug("create project response.url = %s", response.url)
             if project_name in response.url:
                 logger.info("Successfully created project %s", project_name)
                 self.project_url = response.url
+                return True
             else:
                 logger.warning(
                     f"Create project failed. Response URL {response.url} does not contain project name {project_name}"
                 )
                 # logger.debug(response.content)
+                handle_csrf_failure(self.client, response)
                 response.failure("Create project failed. Response URL does not contain project name.")
+                return False
 
-    def delete_project(self):
+    def delete_project(self) -> bool:
         # Update the csrf token
         self.get_token("/projects")
 
@@ -280,27 +618,30 @@ class PowerBaseUser(HttpUser):
             name="---DELETE-PROJECT",
             catch_response=True,
         ) as response:
-            logger.debug("delete project response.status_code = %s, %s", response.status_code, response.reason)
+            logger.debug("delete project response.status_code = %s", response.status_code)
             # If succeeds then status_code == 200 and url = /projects/
             logger.debug("delete project response.url = %s", response.url)
             if response.status_code == 200 and "/projects" in response.url:
                 logger.info("Successfully deleted project at %s", self.project_url)
+                return True
             else:
                 logger.warning(
                     f"Delete project failed for project {self.project_url}. \
                         Response status not 200 or URL does not contain /projects."
                 )
                 # logger.debug(response.content)
+                handle_csrf_failure(self.client, response)
                 response.failure("Delete project failed. Response URL does not contain /projects.")
+                return False
 
-    def _create_app(self, project_name: str, app_name: str):
+    def _create_app(self, project_name: str, app_name: str) -> bool:
         # Update the csrf token
         app_create_url = self.project_url + "apps/create/jupyter-lab?from=overview"
         logger.info(f"Using this URL to create a JL notebook app: {app_create_url}")
         self.get_token(app_create_url)
 
         # First make a dummy POST to the form to get the html and parse out the select option values
-        app_data = dict(csrfmiddlewaretoken=self.csrftoken)
+        app_data: dict[str, str | None] = dict(csrfmiddlewaretoken=self.csrftoken)
 
         html_content = ""
         with self.client.post(
@@ -310,38 +651,26 @@ class PowerBaseUser(HttpUser):
             name="---CREATE-NEW-APP-JUPYTERLAB",
             catch_response=True,
         ) as response:
-            logger.debug("create JupyterLab app response.status_code = %s, %s", response.status_code, response.reason)
+            logger.debug("create JupyterLab app response.status_code = %s", response.status_code)
             html_content = response.content
 
-        # Parse the HTML content
-        parser = etree.HTMLParser()
-        tree = etree.fromstring(html_content, parser)
-
         # Must first get the volume, flavor, and environment values from the form
-        volume = None
-        flavor = None
-        environment = None
-
-        # Extract the form values of the option elements using XPath
+        # Extract the values of the first option elements of the select elements, for example
         # Flavor: <select name="flavor" class="form-control" rows="3" id="id_flavor">
         # <option value="28" selected>2 vCPU, 4 GB RAM</option></select>
-        el_volume = tree.xpath('//select[@name="volume"]/option')
-        el_flavor = tree.xpath('//select[@name="flavor"]/option')
-        el_environment = tree.xpath('//select[@name="environment"]/option')
+        form_values = get_first_option_values(app_create_url, html_content, ("volume", "flavor", "environment"))
 
-        if el_volume:
-            volume = el_volume[0].get("value")
-        else:
+        volume = form_values["volume"]
+        flavor = form_values["flavor"]
+        environment = form_values["environment"]
+
+        if volume is None:
             print("Option element VOLUME not found")
 
-        if el_flavor:
-            flavor = el_flavor[0].get("value")
-        else:
+        if flavor is None:
             print("Option element FLAVOR not found")
 
-        if el_environment:
-            environment = el_environment[0].get("value")
-        else:
+        if environment is None:
             print("Option element ENVIRONMENT not found")
 
         print(f"The parsed form values to use are: volume={volume}, flavor={flavor}, environment={environment}")
@@ -366,16 +695,19 @@ class PowerBaseUser(HttpUser):
             name="---CREATE-NEW-APP-JUPYTERLAB",
             catch_response=True,
         ) as response:
-            logger.debug("create JupyterLab app response.status_code = %s, %s", response.status_code, response.reason)
+            logger.debug("create JupyterLab app response.status_code = %s", response.status_code)
             # If succeeds then url = /projects/<project-name>/
             logger.debug("create JupyterLab app response.url = %s", response.url)
             if project_name in response.url and "create/jupyter-lab" not in response.url:
                 # The returned URL should NOT be back at the create app page
                 logger.info("Successfully created JupyterLab app %s", app_name)
+                return True
             else:
                 logger.warning(f"Create JupyterLab app failed. Response URL {response.url} does not indicate success.")
                 logger.debug(response.content)
+                handle_csrf_failure(self.client, response)
                 response.failure("Create JupyterLab app failed. Response URL does not indicate success.")
+                return False
 
     def login(self):
         logger.info("Login as user %s", self.username)
@@ -393,7 +725,7 @@ class PowerBaseUser(HttpUser):
             name="---ON START---LOGIN",
             catch_response=True,
         ) as response:
-            logger.debug("login response.status_code = %s, %s", response.status_code, response.reason)
+            logger.debug("login response.status_code = %s", response.status_code)
             # If login succeeds then the url contains /projects/, else /accounts/login/
             logger.debug("login response.url = %s", response.url)
             if "/projects" in response.url:
@@ -402,10 +734,12 @@ class PowerBaseUser(HttpUser):
                 logger.warning(
                     f"Login as user {self.username} failed. Response URL {response.url} does not contain /projects"
                 )
+                handle_csrf_failure(self.client, response)
                 response.failure(f"Login as user {self.username} failed. Response URL does not contain /projects")
 
-    def logout(self):
-        if self.is_authenticated:
+    def logout(self) -> bool:
+        """Logs out the user, unless the session is pooled. Returns False if the logout request did not succeed."""
+        if self.is_authenticated and not self.is_pooled_session:
             logger.debug("Logout user %s", self.username)
             logout_data = dict(username=self.username, csrfmiddlewaretoken=self.csrftoken)
             with self.client.post(
@@ -414,20 +748,96 @@ class PowerBaseUser(HttpUser):
                 headers={"Referer": "foo"},
                 name="---ON STOP---LOGOUT",
                 catch_response=True,
-            ):
-                pass
+            ) as response:
+                self.is_authenticated = False
+                return bool(response.status_code and response.ok)
+        return True
+
+
+class ClassroomBurstUserMixin(PowerUserMixin):
+    """Tasks of the student power user type in a classroom burst, where all students start a workshop together.
+    The students are held at a rendezvous point until all of them have been spawned, and are then released
+    at the same moment to log in, create a project and create a JupyterLab app.
+    The time from the release until each milestone is reached is reported as a request of type MILESTONE,
+    so that the distribution over the students of the time until each milestone has its own percentiles.
+    Use one of the HTTP client specific base classes ClassroomBurstUser or FastClassroomBurstUser.
+    """
+
+    abstract = True
+
+    is_student_user = True
+    # The burst is a scenario of its own, not the traffic of a workload model
+    workload_user_type = None
+
+    # The perf_counter time when the students were released from the rendezvous point, None after the first workflow
+    released_at: float | None = None
+
+    def on_start(self):
+        super().on_start()
+        logger.info("User %s waits for the other students at the rendezvous point", self.local_individual_id)
+        wait_for_all_users(self)
+        self.released_at = time.perf_counter()
+
+    def power_user_workflow(self):
+        # The first workflow of a student is timed from the release, and the later ones from their own start
+        transaction = Transaction(self.environment, "classroom", started=self.released_at)
+        self.released_at = None
+        try:
+            self.run_classroom_milestones(transaction)
+        finally:
+            transaction.end()
+
+    def run_classroom_milestones(self, transaction: Transaction):
+        with transaction.milestone("login") as milestone:
+            milestone.check(self.client.get("/home/"))
+            if not self.is_pooled_session:
+                self.get_token()
+                self.login()
+            if self.is_authenticated is False:
+                milestone.fail(f"User {self.username} is not authenticated")
+        if self.is_authenticated is False:
+            logger.info(f"After login function but user {self.username} is not authenticated. Ending task.")
+            return
+
+        if SERVE_LOCUST_DO_CREATE_OBJECTS is False or SERVE_LOCUST_DO_CREATE_OBJECTS == "False":
+            logger.info("Skipping the creation of the project and app because SERVE_LOCUST_DO_CREATE_OBJECTS == False")
+            self.logout()
+            return
+
+        project_name = f"locust_test_project_new_{self.local_individual_id}"
+        with transaction.milestone("create-project") as milestone:
+            project_created = self.create_project(project_name)
+            if not project_created:
+                milestone.fail(f"Creating the project {project_name} failed")
+
+        if project_created:
+            with transaction.milestone("create-app") as milestone:
+                if not self._create_app(project_name, "locust-jupyterlab-app"):
+                    milestone.fail("Creating the app locust-jupyterlab-app failed")
+
+        self.logout()
 
 
-class AppViewerUser(HttpUser):
-    """Base class for app viewer user that opens up a user app."""
+class AppViewerUserMixin(ConnectionUserMixin, CoordinatedOmissionUserMixin, WorkloadModelUserMixin):
+    """Tasks of the app viewer user that opens up a user app.
+    Use one of the HTTP client specific base classes AppViewerUser or FastAppViewerUser.
+    """
+
+    # The HttpSession or the FastHttpSession of the HTTP client specific base class
+    client: Any
 
     abstract = True
 
     user_type = ""
+    workload_user_type = "app_viewer"
+    connection_pool_size = BROWSER_CONNECTIONS_PER_HOST
 
     def on_start(self):
         """Called when a User starts running."""
-        self.client.verify = False  # Don't to check if certificate is valid
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't to check if certificate is valid
+        # The weighted user apps of the host, from the app catalog
+        self.user_apps = get_app_catalog().get_apps(self.host)
 
     # Tasks
 
@@ -436,42 +846,73 @@ class AppViewerUser(HttpUser):
         """Note that this approach does not actually create any resources on the k8s cluster."""
         logger.info("executing task open_user_app, running on host: %s", self.host)
 
-        APP_SHINYPROXY = "UNSET"
+        APP_SHINYPROXY = self.user_apps.choose()
+        logger.debug("making GET request to user app URL: %s", APP_SHINYPROXY)
 
-        if self.host == "https://serve-dev.scilifelab.se":
-            # Dev
-            # ex: https://loadtest-shinyproxy.serve-dev.scilifelab.se/app/loadtest-shinyproxy
-            # from host: https://serve-dev.scilifelab.se
-            APP_SHINYPROXY = self.host.replace("https://", "https://loadtest-shinyproxy.")
-            APP_SHINYPROXY += "/app/loadtest-shinyproxy"
+        self.client.get(APP_SHINYPROXY, name="user-app-shiny-proxy")
 
-        elif "staging" in self.host:
-            # Staging
-            # ex: https://loadtest-shinyproxy.serve-staging.serve-dev.scilifelab.se/app/loadtest-shinyproxy
-            # from host: https://serve-staging.serve-dev.scilifelab.se
-            APP_SHINYPROXY = self.host.replace("https://", "https://loadtest-shinyproxy.")
-            APP_SHINYPROXY += "/app/loadtest-shinyproxy"
 
-        elif "serve.scilifelab.se" in self.host:
-            # Production
-            # ex: https://adhd-medication-sweden.serve.scilifelab.se/app/adhd-medication-sweden
-            APP_SHINYPROXY = self.host.replace("https://", "https://adhd-medication-sweden.")
-            APP_SHINYPROXY += "/app/adhd-medication-sweden"
+class AppStartupUserMixin(ConnectionUserMixin):
+    """Tasks of the app viewer user that starts a user app the way the ShinyProxy web page does,
+    and waits until the app is serving. This creates a pod on the k8s cluster for each app start.
+    The time from opening the app page until the app is serving is reported as the request app-startup.
+    Use one of the HTTP client specific base classes AppStartupUser or FastAppStartupUser.
+    """
 
-        logger.debug("making GET request to user app URL: %s", APP_SHINYPROXY)
+    abstract = True
 
-        self.client.get(APP_SHINYPROXY, name="user-app-shiny-proxy")
+    user_type = ""
+    connection_pool_size = BROWSER_CONNECTIONS_PER_HOST
 
+    def on_start(self):
+        """Called when a User starts running."""
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't to check if certificate is valid
+        # The weighted user apps of the host, from the app catalog
+        self.user_apps = get_app_catalog().get_apps(self.host)
 
-class OpenAPIClientBaseUser(HttpUser):
-    """Base class for API client system that makes API calls."""
+    # Tasks
+
+    @task
+    def start_user_app(self):
+        app_url = self.user_apps.choose()
+        logger.info("executing task start_user_app, app URL: %s", app_url)
+
+        shinyproxy = ShinyProxyClient(self.client, app_url)
+        started = time.perf_counter()
+        exception = None
+        try:
+            shinyproxy.start_app()
+        except AppStartupError as ex:
+            logger.warning("Unable to start the user app %s. Error: %s", app_url, ex)
+            exception = ex
+
+        # The startup is made of the requests of the app page, which have their own rows
+        startup_time = (time.perf_counter() - started) * 1000
+        log_synthetic_request(self.environment, "APP", "app-startup", startup_time, error=exception)
+
+        if SERVE_LOCUST_STOP_STARTED_APPS:
+            shinyproxy.stop_app()
+
+
+class OpenAPIClientUserMixin(ConnectionUserMixin, CoordinatedOmissionUserMixin, WorkloadModelUserMixin):
+    """Tasks of the API client system that makes API calls.
+    Use one of the HTTP client specific base classes OpenAPIClientBaseUser or FastOpenAPIClientBaseUser.
+    """
+
+    # The HttpSession or the FastHttpSession of the HTTP client specific base class
+    client: Any
 
     abstract = True
 
     user_type = ""
+    workload_user_type = "api_client"
+    # An API client sends its requests one at a time over one kept alive connection
+    connection_pool_size = 1
 
     def on_start(self):
-        self.client.verify = False  # Don't check if certificate is valid
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't check if certificate is valid
         logger.info("ONSTART new user type %s", self.user_type)
 
     # Tasks
@@ -487,3 +928,209 @@ class OpenAPIClientBaseUser(HttpUser):
     @task(3)
     def get_public_apps(self):
         self.client.get("/openapi/v1/public-apps")
+
+
+class ExtendedOpenAPIClientUserMixin(ConnectionUserMixin, CoordinatedOmissionUserMixin):
+    """Tasks of a scripted integration that harvests the public apps using the API.
+    It pages through the list of public apps, fetches the details of some of the apps in parallel,
+    and sends conditional requests using the ETags of the earlier responses. See openapi_client.py.
+    Use one of the HTTP client specific base classes ExtendedOpenAPIClientBaseUser or
+    FastExtendedOpenAPIClientBaseUser.
+    """
+
+    abstract = True
+
+    user_type = ""
+    # One connection per concurrent request of the fan-out
+    connection_pool_size = SERVE_LOCUST_API_FAN_OUT
+
+    def on_start(self):
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't check if certificate is valid
+        self.api_client = OpenAPIClient(self.client, SERVE_LOCUST_API_FAN_OUT)
+        logger.info("ONSTART new user type %s", self.user_type)
+
+    # Tasks
+
+    @task
+    def call_api_info(self):
+        self.api_client.get_json(f"{OPENAPI_PATH}/api-info", f"{OPENAPI_PATH}/api-info")
+
+    @task
+    def call_system_version(self):
+        self.api_client.get_json(f"{OPENAPI_PATH}/system-version", f"{OPENAPI_PATH}/system-version")
+
+    @task(3)
+    def harvest_public_apps(self):
+        apps = self.api_client.list_public_apps()
+        self.api_client.fetch_app_details(apps, SERVE_LOCUST_API_MAX_APP_DETAILS)
+
+
+class ReplayUserMixin(ConnectionUserMixin):
+    """Tasks of a replay user that replays the sessions of a production access log, one session at a time.
+    The requests are sent when the dispatcher hands them out at their replay times, without following redirects,
+    since the redirected requests are in the log too. See _log_replay.py.
+    Use one of the HTTP client specific base classes ReplayBaseUser or FastReplayBaseUser.
+    """
+
+    abstract = True
+
+    user_type = ""
+    # The replay user waits for the next session in its task instead
+    wait_time = constant(0)
+
+    # The time in seconds that an idle replay user waits for a session before its task returns
+    session_poll_seconds = 1
+
+    def on_start(self):
+        if isinstance(self.client, HttpSession):
+            self.client.verify = False  # Don't check if certificate is valid
+
+    # Tasks
+
+    @task
+    def replay_session(self):
+        session = replayer.next_session(self.session_poll_seconds)
+        if session is None:
+            return
+        # Each session of the log is a different client, with its own cookies
+        get_cookiejar(self.client).clear()
+        for method, url in session:
+            self.client.request(method, url, name=get_request_name(url), allow_redirects=False)
+
+
+# The HTTP client specific base user types.
+# The HttpUser based classes use the python-requests client.
+# The FastHttpUser based classes use the geventhttpclient client that uses considerably less CPU
+# on the load generator, allowing more simulated users per core.
+
+
+class VisitingBaseUser(VisitingUserMixin, HttpUser):
+    """Base class for the visiting website user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastVisitingBaseUser(VisitingUserMixin, FastHttpUser):
+    """Base class for the visiting website user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class PowerBaseUser(PowerUserMixin, HttpUser):
+    """Base class for the power user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastPowerBaseUser(PowerUserMixin, FastHttpUser):
+    """Base class for the power user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class ClassroomBurstUser(ClassroomBurstUserMixin, HttpUser):
+    """Base class for the classroom burst student user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastClassroomBurstUser(ClassroomBurstUserMixin, FastHttpUser):
+    """Base class for the classroom burst student user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class AppViewerUser(AppViewerUserMixin, HttpUser):
+    """Base class for the app viewer user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastAppViewerUser(AppViewerUserMixin, FastHttpUser):
+    """Base class for the app viewer user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class AppStartupUser(AppStartupUserMixin, HttpUser):
+    """Base class for the app startup user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastAppStartupUser(AppStartupUserMixin, FastHttpUser):
+    """Base class for the app startup user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class OpenAPIClientBaseUser(OpenAPIClientUserMixin, HttpUser):
+    """Base class for the API client user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastOpenAPIClientBaseUser(OpenAPIClientUserMixin, FastHttpUser):
+    """Base class for the API client user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+class ExtendedOpenAPIClientBaseUser(ExtendedOpenAPIClientUserMixin, HttpUser):
+    """Base class for the extended API client user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastExtendedOpenAPIClientBaseUser(ExtendedOpenAPIClientUserMixin, FastHttpUser):
+    """Base class for the extended API client user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+# Replay user types
+class ReplayBaseUser(ReplayUserMixin, HttpUser):
+    """Base class for the replay user type using the requests based HttpUser."""
+
+    abstract = True
+
+
+class FastReplayBaseUser(ReplayUserMixin, FastHttpUser):
+    """Base class for the replay user type using the geventhttpclient based FastHttpUser."""
+
+    abstract = True
+    insecure = True  # Don't check if certificate is valid
+
+
+# The base user types of the test plans, with the HTTP client selected by SERVE_LOCUST_USE_FAST_HTTP_CLIENT.
+# Type checkers see the requests based classes, which have the same tasks as the FastHttpUser based classes.
+if TYPE_CHECKING:
+    SelectedVisitingUser: TypeAlias = VisitingBaseUser
+    SelectedPowerUser: TypeAlias = PowerBaseUser
+    SelectedClassroomBurstUser: TypeAlias = ClassroomBurstUser
+    SelectedAppViewerUser: TypeAlias = AppViewerUser
+    SelectedAppStartupUser: TypeAlias = AppStartupUser
+    SelectedOpenAPIClientUser: TypeAlias = OpenAPIClientBaseUser
+    SelectedExtendedOpenAPIClientUser: TypeAlias = ExtendedOpenAPIClientBaseUser
+    SelectedReplayUser: TypeAlias = ReplayBaseUser
+else:
+    SelectedVisitingUser = FastVisitingBaseUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else VisitingBaseUser
+    SelectedPowerUser = FastPowerBaseUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else PowerBaseUser
+    SelectedClassroomBurstUser = FastClassroomBurstUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else ClassroomBurstUser
+    SelectedAppViewerUser = FastAppViewerUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else AppViewerUser
+    SelectedAppStartupUser = FastAppStartupUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else AppStartupUser
+    SelectedOpenAPIClientUser = (
+        FastOpenAPIClientBaseUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else OpenAPIClientBaseUser
+    )
+    SelectedExtendedOpenAPIClientUser = (
+        FastExtendedOpenAPIClientBaseUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else ExtendedOpenAPIClientBaseUser
+    )
+    SelectedReplayUser = FastReplayBaseUser if SERVE_LOCUST_USE_FAST_HTTP_CLIENT else ReplayBaseUser
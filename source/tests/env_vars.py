@@ -0,0 +1,11 @@
+"""Reading of the settings of the test plans from environment variables, shared by the modules of the test plans."""
+
+import os
+
+
+def get_env_bool(name: str, default: bool = False) -> bool:
+    """Reads a boolean setting from an environment variable, accepting values such as True, true and 1."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("true", "1", "yes")
@@ -0,0 +1,102 @@
+"""Fast extraction of form field values from the HTML of Serve form pages.
+
+Building a full lxml DOM of a form page and running one XPath query per field uses a lot of CPU on the
+load generator. Instead, the HTML from the first select element onwards is fed in chunks to an event based lxml parser
+that does not build any tree, and the parsing stops as soon as all requested fields have been found.
+The results are cached per form URL and hash of the response content.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+
+from lxml import etree
+
+# The size of the chunks of HTML fed to the parser
+CHUNK_SIZE = 8 * 1024
+
+# The max number of form pages to cache the extracted values of
+FORM_VALUES_CACHE_SIZE = 256
+
+_SELECT_START_PATTERN = re.compile(rb"<select\b", re.IGNORECASE)
+
+_form_values_cache: OrderedDict[tuple, dict[str, str | None]] = OrderedDict()
+
+
+class _FirstOptionTarget:
+    """An lxml parser target that collects the value of the first option element of the named select elements.
+    The target has no data method, so that lxml does not call back into Python for the text content.
+    """
+
+    def __init__(self, select_names: tuple[str, ...]):
+        self.select_names = select_names
+        self.values: dict[str, str | None] = {}
+        self._current_select: str | None = None
+
+    @property
+    def is_done(self) -> bool:
+        return len(self.values) == len(self.select_names)
+
+    def start(self, tag, attrib):
+        if tag == "select":
+            name = attrib.get("name")
+            self._current_select = name if name in self.select_names and name not in self.values else None
+        elif tag == "option" and self._current_select is not None:
+            self.values[self._current_select] = attrib.get("value")
+            self._current_select = None
+
+    def end(self, tag):
+        if tag == "select":
+            self._current_select = None
+
+    def close(self):
+        return self.values
+
+
+def extract_first_option_values(html: bytes | str, select_names: tuple[str, ...]) -> dict[str, str | None]:
+    """Returns the value of the first option element of each of the named select elements in the HTML.
+    The value is None for select elements that are not found or have no option elements.
+
+    :param html: The HTML content of the form page.
+    :param select_names: The names of the select elements.
+    """
+    content = html.encode() if isinstance(html, str) else html
+    target = _FirstOptionTarget(select_names)
+
+    # Skip the part of the page before the first select element, such as the head and navigation
+    match = _SELECT_START_PATTERN.search(content)
+    if match is None:
+        return {name: None for name in select_names}
+
+    parser = etree.HTMLParser(target=target)
+    for offset in range(match.start(), len(content), CHUNK_SIZE):
+        parser.feed(content[offset : offset + CHUNK_SIZE])
+        if target.is_done:
+            break
+    else:
+        parser.close()
+
+    return {name: target.values.get(name) for name in select_names}
+
+
+def get_first_option_values(form_url: str, html: bytes | str, select_names: tuple[str, ...]) -> dict[str, str | None]:
+    """Returns the value of the first option element of each of the named select elements of a form page,
+    using the cached values if the same content has already been parsed for the form URL.
+
+    :param form_url: The URL of the form page.
+    :param html: The HTML content of the form page.
+    :param select_names: The names of the select elements.
+    """
+    content = html.encode() if isinstance(html, str) else html
+    key = (form_url, hashlib.blake2b(content, digest_size=16).digest(), select_names)
+
+    values = _form_values_cache.get(key)
+    if values is not None:
+        _form_values_cache.move_to_end(key)
+        return values
+
+    values = extract_first_option_values(content, select_names)
+    _form_values_cache[key] = values
+    if len(_form_values_cache) > FORM_VALUES_CACHE_SIZE:
+        _form_values_cache.popitem(last=False)
+    return values
@@ -0,0 +1,138 @@
+"""A high dynamic range (HDR) histogram of response times, with the bucket layout of HdrHistogram.
+
+Each power of two range of values is divided into linear sub-buckets, so that any recorded value is kept with
+a relative error of at most 10^-significant_digits, such as 0.1% for 3 significant digits, from 1 microsecond
+up to the highest trackable value. The memory is bounded by the number of buckets of that range, independent
+of the number of recorded values, and the counts are kept sparsely so that narrow distributions use little memory.
+Histograms with the same layout are merged by adding their counts, which is how the histograms of the workers
+are combined on the master node.
+"""
+
+import math
+from dataclasses import dataclass, field
+
+# The resolution of the recorded values. Response times in ms are recorded in microseconds.
+UNITS_PER_MS = 1000
+# One hour in microseconds. Larger values are recorded as the highest trackable value.
+DEFAULT_HIGHEST_TRACKABLE_VALUE = 3_600_000_000
+DEFAULT_SIGNIFICANT_DIGITS = 3
+
+
+@dataclass
+class HdrHistogram:
+    """Counts of integer values, such as response times in microseconds, in logarithmic buckets of linear sub-buckets.
+
+    :param highest_trackable_value: The largest value that is recorded with full resolution.
+    :param significant_digits: The number of significant decimal digits kept of each value, 1 to 5.
+    """
+
+    highest_trackable_value: int = DEFAULT_HIGHEST_TRACKABLE_VALUE
+    significant_digits: int = DEFAULT_SIGNIFICANT_DIGITS
+    counts: dict[int, int] = field(default_factory=dict)
+    total_count: int = 0
+    min_value: int | None = None
+    max_value: int = 0
+    value_sum: int = 0
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.significant_digits <= 5:
+            raise ValueError("The significant digits must be 1 to 5")
+        # The sub-buckets of each bucket are enough to tell values apart at the given number of significant digits
+        largest_single_unit_value = 2 * 10**self.significant_digits
+        self._sub_bucket_count_magnitude: int = math.ceil(math.log2(largest_single_unit_value))
+        self._sub_bucket_half_count_magnitude = self._sub_bucket_count_magnitude - 1
+        self._sub_bucket_half_count = 1 << self._sub_bucket_half_count_magnitude
+
+    def record(self, value: int, count: int = 1):
+        """Records a non-negative value, clamped to the highest trackable value."""
+        value = min(max(value, 0), self.highest_trackable_value)
+        index = self._counts_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.value_sum += value * count
+        self.max_value = max(self.max_value, value)
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+
+    def merge(self, other: "HdrHistogram"):
+        """Adds the counts of another histogram with the same layout to this histogram."""
+        if (other.highest_trackable_value, other.significant_digits) != (
+            self.highest_trackable_value,
+            self.significant_digits,
+        ):
+            raise ValueError("Only histograms with the same highest trackable value and significant digits can merge")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.value_sum += other.value_sum
+        self.max_value = max(self.max_value, other.max_value)
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """Returns the value that the given percent of the recorded values are less than or equal to,
+        as the highest value that is equivalent to it at the resolution of the histogram.
+        """
+        if not self.total_count:
+            return 0
+        target = max(1, math.ceil(self.total_count * min(percentile, 100.0) / 100))
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= target:
+                return min(self._highest_equivalent_value(index), self.max_value)
+        return self.max_value
+
+    @property
+    def mean(self) -> float:
+        return self.value_sum / self.total_count if self.total_count else 0.0
+
+    def iter_buckets(self):
+        """Yields the lowest value of each non-empty sub-bucket and its count, in increasing value order."""
+        for index in sorted(self.counts):
+            yield self._value_from_index(index), self.counts[index]
+
+    def to_dict(self) -> dict:
+        """Returns the histogram as a dict of plain values, for sending it to the master node."""
+        return {
+            "highest_trackable_value": self.highest_trackable_value,
+            "significant_digits": self.significant_digits,
+            "counts": list(self.counts.items()),
+            "total_count": self.total_count,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "value_sum": self.value_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HdrHistogram":
+        return cls(
+            highest_trackable_value=data["highest_trackable_value"],
+            significant_digits=data["significant_digits"],
+            counts={index: count for index, count in data["counts"]},
+            total_count=data["total_count"],
+            min_value=data["min_value"],
+            max_value=data["max_value"],
+            value_sum=data["value_sum"],
+        )
+
+    # The bucket layout, as in HdrHistogram: bucket 0 holds the values 0 to 2 * sub_bucket_half_count - 1
+    # at a resolution of 1, and each following bucket covers twice the range at half the resolution.
+
+    def _counts_index(self, value: int) -> int:
+        bucket_index = max(0, value.bit_length() - self._sub_bucket_count_magnitude)
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self._sub_bucket_half_count_magnitude) + (
+            sub_bucket_index - self._sub_bucket_half_count
+        )
+
+    def _value_from_index(self, index: int) -> int:
+        bucket_index = (index >> self._sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (index & (self._sub_bucket_half_count - 1)) + self._sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self._sub_bucket_half_count
+            bucket_index = 0
+        return sub_bucket_index << bucket_index
+
+    def _highest_equivalent_value(self, index: int) -> int:
+        bucket_index = max(0, (index >> self._sub_bucket_half_count_magnitude) - 1)
+        return self._value_from_index(index) + (1 << bucket_index) - 1
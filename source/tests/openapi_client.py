@@ -0,0 +1,251 @@
+"""An API client of the Serve OpenAPI that behaves like a scripted integration, such as a catalogue harvester.
+
+The client lists the public apps, following the next links of paginated responses, and then fetches the details
+of some of the listed apps with a bounded number of concurrent requests. The lists are streamed and their items
+are decoded incrementally as the chunks arrive, instead of loading the whole body and decoding it at once.
+The client keeps the ETags of the responses and sends conditional requests, reusing the cached payloads when
+the API responds with 304 Not Modified.
+
+The listing and detail requests are reported as streamed requests, the GET rows with the time to first byte
+and the TTLB rows with the time to last byte, see streaming.py. The CPU time of decoding each payload is reported
+as a request of type DECODE µs with the same name, and the size of the payload as its response length. Decoding
+a payload takes well under a millisecond, and Locust shows the response times in whole units, so the DECODE µs
+rows are in microseconds instead of the milliseconds of the other rows. The payloads are decoded from gzip
+or deflate before they are parsed, see streaming.py.
+Works for both the requests based HttpSession and the geventhttpclient based FastHttpSession.
+"""
+
+import codecs
+import json
+import logging
+import random
+import re
+import time
+
+import gevent.pool
+import requests
+from page_resources import HttpCache
+from streaming import DEFAULT_CHUNK_SIZE, iter_chunks, report_ttlb, streamed_headers
+from synthetic_requests import log_synthetic_request
+
+logger = logging.getLogger(__name__)
+
+
+OPENAPI_PATH = "/openapi/v1"
+PUBLIC_APPS_PATH = f"{OPENAPI_PATH}/public-apps"
+# The max number of pages of a list that are followed
+MAX_PAGES = 20
+# The request type of the decoding times, which are reported in microseconds
+DECODE_REQUEST_TYPE = "DECODE µs"
+# The fields that each listed public app must have
+PUBLIC_APP_FIELDS = ("id", "name", "url")
+
+_WHITESPACE_PATTERN = re.compile(r"\s*")
+
+
+class InvalidPayloadError(Exception):
+    """Raised when an API response is not the expected JSON document."""
+
+
+class JSONArrayStreamParser:
+    """Decodes the items of the array of a key of a JSON object incrementally, from the chunks of the document.
+    The other keys of the object, such as the pagination links, are decoded when the document is complete.
+
+    :param key: The key of the array, such as data.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._array_start_pattern = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # The text of the document before the array, and whether the array has ended.
+        # After the array has ended, the buffer has the text of the document after the array.
+        self._head: str | None = None
+        self._array_ended = False
+
+    def feed(self, chunk: bytes) -> list:
+        """Returns the items of the array that are complete after the chunk."""
+        self._buffer += self._text_decoder.decode(chunk)
+        if self._head is None:
+            match = self._array_start_pattern.search(self._buffer)
+            if match is None:
+                return []
+            self._head = self._buffer[: match.end() - 1]
+            self._buffer = self._buffer[match.end() :]
+        if self._array_ended:
+            return []
+        return self._decode_items()
+
+    def close(self) -> dict:
+        """Returns the object without the items of the array.
+        Raises InvalidPayloadError if the document is not complete or has no such array.
+        """
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        if self._head is None:
+            raise InvalidPayloadError(f"The JSON document has no {self.key} array")
+        if not self._array_ended:
+            raise InvalidPayloadError(f"The {self.key} array of the JSON document is not complete")
+        try:
+            document: dict = json.loads(f"{self._head}[]{self._buffer}")
+            return document
+        except ValueError as ex:
+            raise InvalidPayloadError(f"Invalid JSON: {ex}") from ex
+
+    def _decode_items(self) -> list:
+        items = []
+        position = 0
+        buffer = self._buffer
+        while True:
+            position = _skip_whitespace(buffer, position)
+            if buffer.startswith(",", position):
+                position = _skip_whitespace(buffer, position + 1)
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                self._array_ended = True
+                position += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The item is not complete yet
+                break
+            if end == len(buffer) and not isinstance(item, (dict, list, str)):
+                # A number or literal at the end of the buffer may continue in the next chunk
+                break
+            items.append(item)
+            position = end
+        self._buffer = buffer[position:]
+        return items
+
+
+def _skip_whitespace(text: str, position: int) -> int:
+    match = _WHITESPACE_PATTERN.match(text, position)
+    # The pattern also matches the empty string, so there is always a match
+    return match.end() if match else position
+
+
+def get_next_link(document: dict) -> str | None:
+    """Returns the link to the next page of a paginated list, in the common next or links.next forms."""
+    links = document.get("links")
+    next_link = document.get("next") or (links.get("next") if isinstance(links, dict) else None)
+    return next_link if isinstance(next_link, str) else None
+
+
+def validate_public_app(item) -> str | None:
+    """Returns the error of a listed public app that does not have the expected fields, or None if it is valid."""
+    if not isinstance(item, dict):
+        return f"A public app is not a JSON object: {item!r:.100}"
+    missing = [field for field in PUBLIC_APP_FIELDS if field not in item]
+    if missing:
+        return f"The public app {item.get('id')} has no {', '.join(missing)}"
+    return None
+
+
+class OpenAPIClient:
+    """Lists the public apps and fetches their details using the HTTP client of a Locust user,
+    with an HTTP cache of the ETags and the payloads of the responses.
+
+    :param client: The HTTP client of the user.
+    :param fan_out: The max number of app details fetched at a time.
+    """
+
+    def __init__(self, client, fan_out: int):
+        self.client = client
+        self.pool = gevent.pool.Pool(fan_out)
+        self.cache = HttpCache()
+        # The decoded payloads of the responses that have an ETag, by path
+        self.payloads: dict[str, dict] = {}
+
+    def list_public_apps(self) -> list[dict]:
+        """Returns the public apps of all pages of the list, an empty list if a page fails."""
+        apps = []
+        path: str | None = PUBLIC_APPS_PATH
+        for _ in range(MAX_PAGES):
+            if path is None:
+                break
+            page = self.get_json(path, PUBLIC_APPS_PATH, array_key="data", validate_item=validate_public_app)
+            if page is None:
+                return []
+            apps.extend(page["data"])
+            path = get_next_link(page)
+        return apps
+
+    def fetch_app_details(self, apps: list[dict], max_apps: int):
+        """Fetches the details of a random sample of the apps in parallel, and waits for them."""
+        sample = random.sample(apps, min(max_apps, len(apps)))
+        greenlets = [self.pool.spawn(self.get_app_details, app["id"]) for app in sample]
+        gevent.joinall(greenlets)
+
+    def get_app_details(self, app_id) -> dict | None:
+        return self.get_json(f"{PUBLIC_APPS_PATH}/{app_id}", f"{PUBLIC_APPS_PATH}/[id]")
+
+    def get_json(self, path: str, name: str, array_key: str | None = None, validate_item=None) -> dict | None:
+        """Sends a conditional GET request for a JSON document and decodes it as it streams in,
+        or reuses the cached document if it has not been modified. Returns None if the request fails.
+        When array_key is given, the items of that array are decoded incrementally and validated.
+        """
+        started = time.perf_counter()
+        headers = streamed_headers(self.cache.conditional_headers(path) if path in self.payloads else {})
+        document: dict | None = None
+        error = None
+        length = 0
+        decode_time = 0.0
+        with self.client.get(path, name=name, headers=headers, stream=True, catch_response=True) as response:
+            if response.status_code == 304:
+                document = self.payloads[path]
+            elif response.status_code and response.ok:
+                parser = JSONArrayStreamParser(array_key) if array_key else None
+                chunks = []
+                items = []
+                try:
+                    for chunk in iter_chunks(response, DEFAULT_CHUNK_SIZE):
+                        length += len(chunk)
+                        if parser is None:
+                            chunks.append(chunk)
+                            continue
+                        decode_started = time.perf_counter()
+                        items.extend(parser.feed(chunk))
+                        decode_time += time.perf_counter() - decode_started
+
+                    decode_started = time.perf_counter()
+                    if parser is None:
+                        document = json.loads(b"".join(chunks))
+                    else:
+                        document = parser.close()
+                        document[array_key] = items
+                    decode_time += time.perf_counter() - decode_started
+                except InvalidPayloadError as ex:
+                    error = str(ex)
+                except ValueError as ex:
+                    error = f"Invalid JSON: {ex}"
+                except Exception as ex:
+                    error = f"{type(ex).__name__}: {ex}"
+                    # Release the connection of a partly read response to the connection pool of the requests session
+                    if isinstance(response, requests.Response):
+                        response.close()
+
+                if document is not None and validate_item is not None:
+                    error = next(filter(None, map(validate_item, document[array_key])), None)
+                if error:
+                    response.failure(error)
+                    document = None
+                else:
+                    self.report_decode(name, decode_time, length)
+            else:
+                error = f"Status code {response.status_code}"
+
+            self.cache.store(path, response)
+            if document is not None and path in self.cache.entries:
+                self.payloads[path] = document
+            else:
+                self.payloads.pop(path, None)
+
+        report_ttlb(self.client, name, started, length, error)
+        return document
+
+    def report_decode(self, name: str, decode_time: float, length: int):
+        """Reports the CPU time of decoding a payload in microseconds, and the size of the payload."""
+        log_synthetic_request(self.client.user.environment, DECODE_REQUEST_TYPE, name, decode_time * 1_000_000, length)
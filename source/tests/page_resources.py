@@ -0,0 +1,186 @@
+"""Fetching of the subresources of pages, such as stylesheets, scripts and images, as a browser does.
+
+The stylesheets, scripts, images and icons linked from a page are extracted once per page URL with an event based
+lxml parser that does not build any tree, and the lists are cached and shared by all users of the Locust process.
+Each user then fetches the subresources of a page in parallel, with at most a given number of requests at a time,
+as browsers open up to 6 connections per host. Only the subresources on the host of the page are fetched,
+since the load on the ingress of Serve is what is measured, not the load on CDNs.
+
+Each user keeps an HTTP cache of the validators and freshness of the fetched subresources, as a browser does.
+A subresource that is still fresh by its Cache-Control max-age is not requested again, and a stale subresource
+with an ETag or Last-Modified header is revalidated with a conditional request, which Serve answers with
+304 Not Modified and no body if it has not changed.
+Works for both the requests based HttpSession and the geventhttpclient based FastHttpSession.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+
+import gevent.pool
+from lxml import etree
+
+# The max number of page URLs to cache the subresources of
+SUBRESOURCES_CACHE_SIZE = 256
+
+# The link relations of the link elements that browsers fetch when loading a page
+_FETCHED_LINK_RELS = {"stylesheet", "icon", "shortcut", "preload", "modulepreload", "apple-touch-icon"}
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+_subresources_cache: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+
+
+class _SubresourceTarget:
+    """An lxml parser target that collects the URLs of the subresources of a page, in document order."""
+
+    def __init__(self):
+        self.urls: list[str] = []
+
+    def start(self, tag, attrib):
+        if tag == "link":
+            rels = set(attrib.get("rel", "").lower().split())
+            if rels & _FETCHED_LINK_RELS and attrib.get("href"):
+                self.urls.append(attrib["href"])
+        elif tag in ("script", "img") and attrib.get("src"):
+            self.urls.append(attrib["src"])
+
+    def end(self, tag):
+        pass
+
+    def close(self):
+        return self.urls
+
+
+def extract_subresources(page_path: str, html: bytes | str) -> tuple[str, ...]:
+    """Returns the paths of the distinct subresources of a page that are on the host of the page,
+    resolved against the page path.
+
+    :param page_path: The path of the page, such as /home/.
+    :param html: The HTML content of the page.
+    """
+    content = html.encode() if isinstance(html, str) else html
+    if not content:
+        return ()
+    target = _SubresourceTarget()
+    parser = etree.HTMLParser(target=target)
+    parser.feed(content)
+    parser.close()
+
+    paths = []
+    for url in target.urls:
+        parts = urlsplit(urljoin(page_path, url))
+        # Skip other hosts and data URIs
+        if parts.scheme or parts.netloc:
+            continue
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        if path not in paths:
+            paths.append(path)
+    return tuple(paths)
+
+
+def get_cached_subresources(page_path: str) -> tuple[str, ...] | None:
+    """Returns the cached subresources of a page, or None if the page has not been parsed yet."""
+    subresources = _subresources_cache.get(page_path)
+    if subresources is not None:
+        _subresources_cache.move_to_end(page_path)
+    return subresources
+
+
+def get_subresources(page_path: str, html: bytes | str) -> tuple[str, ...]:
+    """Returns the subresources of a page, parsing the page only if it has not been parsed yet."""
+    subresources = get_cached_subresources(page_path)
+    if subresources is None:
+        subresources = extract_subresources(page_path, html)
+        _subresources_cache[page_path] = subresources
+        if len(_subresources_cache) > SUBRESOURCES_CACHE_SIZE:
+            _subresources_cache.popitem(last=False)
+    return subresources
+
+
+@dataclass
+class CacheEntry:
+    etag: str | None
+    last_modified: str | None
+    # The time.monotonic() until which the subresource is fresh
+    fresh_until: float
+
+
+class HttpCache:
+    """The HTTP cache of a user, with the validators and the freshness of the fetched subresources.
+    Only the headers are kept, since the bodies of the subresources are not used.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, CacheEntry] = {}
+
+    def is_fresh(self, path: str) -> bool:
+        entry = self.entries.get(path)
+        return entry is not None and time.monotonic() < entry.fresh_until
+
+    def conditional_headers(self, path: str) -> dict[str, str]:
+        """Returns the headers of a conditional request revalidating the cached subresource."""
+        entry = self.entries.get(path)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, path: str, response):
+        """Updates the cache entry of a subresource from the headers of its response."""
+        headers = response.headers or {}
+        cache_control = (headers.get("Cache-Control") or "").lower()
+        if response.status_code == 304:
+            # A 304 response refreshes the freshness of the cached entry, and may update its validators
+            entry = self.entries.get(path)
+            if entry is None:
+                return
+            entry.etag = headers.get("ETag") or entry.etag
+            entry.last_modified = headers.get("Last-Modified") or entry.last_modified
+        elif response.ok and "no-store" not in cache_control:
+            entry = CacheEntry(headers.get("ETag"), headers.get("Last-Modified"), 0.0)
+            if not entry.etag and not entry.last_modified and "max-age" not in cache_control:
+                return
+            self.entries[path] = entry
+        else:
+            self.entries.pop(path, None)
+            return
+
+        match = _MAX_AGE_PATTERN.search(cache_control)
+        max_age = int(match.group(1)) if match and "no-cache" not in cache_control else 0
+        entry.fresh_until = time.monotonic() + max_age
+
+
+class SubresourceFetcher:
+    """Fetches the subresources of the pages visited by a user, through the HTTP cache of the user.
+
+    :param client: The HTTP client of the user.
+    :param concurrency: The max number of subresources fetched at a time.
+    """
+
+    def __init__(self, client, concurrency: int):
+        self.client = client
+        self.pool = gevent.pool.Pool(concurrency)
+        self.cache = HttpCache()
+
+    def fetch(self, page_path: str, html: bytes | str | None = None):
+        """Fetches the subresources of a page in parallel and waits for them.
+        The HTML is only needed if the page has not been parsed yet, see get_cached_subresources.
+        """
+        subresources = get_cached_subresources(page_path) if html is None else get_subresources(page_path, html)
+        if not subresources:
+            return
+        greenlets = [
+            self.pool.spawn(self.fetch_subresource, path) for path in subresources if not self.cache.is_fresh(path)
+        ]
+        gevent.joinall(greenlets)
+
+    def fetch_subresource(self, path: str):
+        response = self.client.get(path, headers=self.cache.conditional_headers(path))
+        self.cache.store(path, response)
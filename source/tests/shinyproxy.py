@@ -0,0 +1,161 @@
+"""Starts user apps the way the ShinyProxy web page does, by replaying its HTTP calls without a browser.
+
+Opening an app URL such as https://{app}.serve.scilifelab.se/app/{app} returns a page whose javascript
+1. starts an instance of the app with POST app_i/{app}/{instance}/, which creates the app pod,
+2. waits until the proxy status is Up, using long polling GET api/proxy/{proxy_id}/status?watch=true,
+3. loads the app from app_proxy/{proxy_id}/ in an iframe.
+The app is regarded as started when app_proxy/{proxy_id}/ responds with status 200.
+The websocket traffic of the Shiny app after it has been loaded is not replayed.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from time import perf_counter
+
+import gevent
+
+logger = logging.getLogger(__name__)
+
+
+# The max time in seconds from opening the app page until the app is serving
+SERVE_LOCUST_APP_STARTUP_TIMEOUT = float(os.environ.get("SERVE_LOCUST_APP_STARTUP_TIMEOUT", 300))
+# The max time in seconds of one long polling request for the proxy status
+STATUS_WATCH_TIMEOUT_SECONDS = 10
+# The min time in seconds between the checks of the proxy status and whether the app is serving
+APP_SERVING_POLL_INTERVAL_SECONDS = 1
+
+# The proxy states that mean that the app will not start
+FAILED_PROXY_STATES = ("Stopping", "Stopped", "Failed")
+
+_CSRF_META_PATTERN = re.compile(r'<meta\s+name="_csrf(_header)?"\s+content="([^"]*)"')
+
+
+class AppStartupError(Exception):
+    """Raised when a user app does not start."""
+
+
+@dataclass
+class ShinyProxyApp:
+    """A user app served by ShinyProxy, identified by the base URL of ShinyProxy and the app id."""
+
+    base_url: str
+    app_id: str
+
+    @classmethod
+    def from_url(cls, app_url: str) -> "ShinyProxyApp":
+        """Parses an app URL such as https://{app}.serve.scilifelab.se/app/{app}"""
+        base_url, separator, app_id = app_url.partition("/app/")
+        if not separator or not app_id.strip("/"):
+            raise ValueError(f"Not a ShinyProxy app URL: {app_url}")
+        return cls(base_url + "/", app_id.strip("/"))
+
+
+class ShinyProxyClient:
+    """Starts and stops a user app using the HTTP client of a Locust user,
+    which is either the requests based HttpSession or the geventhttpclient based FastHttpSession.
+    The client keeps the ShinyProxy session cookie, which the proxy of the started app belongs to.
+    """
+
+    def __init__(self, client, app_url: str, instance: str = "_"):
+        self.client = client
+        self.app_url = app_url
+        self.app = ShinyProxyApp.from_url(app_url)
+        self.instance = instance
+        self.proxy_id: str | None = None
+        self.headers: dict[str, str] = {}
+
+    def start_app(self):
+        """Starts the app and waits until it is serving. Raises AppStartupError if it does not start in time."""
+        deadline = perf_counter() + SERVE_LOCUST_APP_STARTUP_TIMEOUT
+
+        self._open_app_page()
+        self._start_proxy()
+        self._wait_until_proxy_is_up(deadline)
+        self._wait_until_app_is_serving(deadline)
+
+    def stop_app(self):
+        """Stops the app, which removes the app pod, instead of waiting for the heartbeat timeout."""
+        if self.proxy_id is None:
+            return
+        self.client.put(
+            f"{self.app.base_url}api/proxy/{self.proxy_id}/status",
+            json={"desiredState": "Stopping"},
+            headers=self.headers,
+            name="---APP-STARTUP---STOP",
+        )
+        self.proxy_id = None
+
+    def _open_app_page(self):
+        with self.client.get(self.app_url, name="---APP-STARTUP---PAGE", catch_response=True) as response:
+            if response.status_code != 200:
+                response.failure(f"Opening the app page failed with status {response.status_code}")
+                raise AppStartupError(f"Opening the app page {self.app_url} failed with status {response.status_code}")
+
+            # ShinyProxy uses Spring Security csrf protection, with the token and header name in meta elements
+            meta = dict(_CSRF_META_PATTERN.findall(response.text))
+            if meta.get("") and meta.get("_header"):
+                self.headers = {meta["_header"]: meta[""]}
+
+    def _start_proxy(self):
+        url = f"{self.app.base_url}app_i/{self.app.app_id}/{self.instance}/"
+        with self.client.post(
+            url,
+            json={"parameters": None},
+            headers=self.headers,
+            name="---APP-STARTUP---START",
+            catch_response=True,
+        ) as response:
+            proxy = self._get_proxy(response)
+            if proxy is None:
+                response.failure(f"Starting the app failed with status {response.status_code}")
+                raise AppStartupError(f"Starting the app {self.app.app_id} failed with status {response.status_code}")
+            self.proxy_id = proxy["id"]
+            logger.debug("Started proxy %s of app %s with status %s", self.proxy_id, self.app.app_id, proxy["status"])
+
+    def _wait_until_proxy_is_up(self, deadline: float):
+        url = f"{self.app.base_url}api/proxy/{self.proxy_id}/status?watch=true&timeout={STATUS_WATCH_TIMEOUT_SECONDS}"
+        while True:
+            polled = perf_counter()
+            with self.client.get(url, name="---APP-STARTUP---STATUS", catch_response=True) as response:
+                proxy = self._get_proxy(response)
+                if proxy is None:
+                    response.failure(f"Getting the app status failed with status {response.status_code}")
+                    raise AppStartupError(f"Getting the status of proxy {self.proxy_id} failed")
+                if proxy["status"] == "Up":
+                    return
+                if proxy["status"] in FAILED_PROXY_STATES:
+                    response.failure(f"The app did not start. Status {proxy['status']}")
+                    raise AppStartupError(f"The proxy {self.proxy_id} did not start. Status {proxy['status']}")
+            if perf_counter() > deadline:
+                raise AppStartupError(f"The proxy {self.proxy_id} was not up in {SERVE_LOCUST_APP_STARTUP_TIMEOUT} s")
+            # Avoid polling in a tight loop if the server does not support the long polling
+            if perf_counter() - polled < APP_SERVING_POLL_INTERVAL_SECONDS:
+                gevent.sleep(APP_SERVING_POLL_INTERVAL_SECONDS)
+
+    def _wait_until_app_is_serving(self, deadline: float):
+        url = f"{self.app.base_url}app_proxy/{self.proxy_id}/"
+        while True:
+            with self.client.get(url, name="---APP-STARTUP---APP", catch_response=True) as response:
+                if response.status_code == 200:
+                    return
+                # The app container may still be starting its web server after the pod is up
+                response.success()
+            if perf_counter() > deadline:
+                raise AppStartupError(
+                    f"The app {self.app.app_id} was not serving in {SERVE_LOCUST_APP_STARTUP_TIMEOUT} s"
+                )
+            gevent.sleep(APP_SERVING_POLL_INTERVAL_SECONDS)
+
+    @staticmethod
+    def _get_proxy(response) -> dict | None:
+        """Returns the proxy from a ShinyProxy API response such as {"status": "success", "data": {proxy}}"""
+        if response.status_code != 200:
+            return None
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        proxy = data.get("data") if isinstance(data, dict) else None
+        return proxy if isinstance(proxy, dict) and "id" in proxy and "status" in proxy else None
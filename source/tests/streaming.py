@@ -0,0 +1,109 @@
+"""Streaming GET requests of pages, reporting the time to first byte and the time to last byte separately.
+
+A page check of a visiting user only needs the status and, optionally, a marker string in the page. With stream=True
+the body is not downloaded when the request returns, so the time that Locust records for the request is the time to
+the response headers, the time to first byte (TTFB). The body is then read and discarded in fixed-size chunks,
+without building the content or the decoded text of the response, and the time to the last byte (TTLB) is reported
+as a request of type TTLB with the same name, see synthetic_requests.py. The marker is searched for in the chunks
+as they arrive. Works for both the requests based HttpSession and the geventhttpclient based FastHttpSession.
+
+The streamed requests accept the gzip and deflate content codings. The requests based HttpSession decodes them, while
+the FastHttpSession yields the body as sent, so its chunks are decompressed with zlib. The lengths are the lengths
+of the decoded bodies with both clients.
+"""
+
+import time
+import zlib
+
+import requests
+from locust.contrib.fasthttp import FastResponse
+from synthetic_requests import log_synthetic_request
+
+# The request type of the time to last byte series
+TTLB_REQUEST_TYPE = "TTLB"
+DEFAULT_CHUNK_SIZE = 16 * 1024
+# The content codings that iter_chunks decodes. The FastHttpSession otherwise also accepts br.
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+def streamed_headers(headers: dict | None = None) -> dict:
+    """Returns the headers of a streamed request, which only accept the content codings that iter_chunks decodes."""
+    return {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+
+
+def iter_chunks(response, chunk_size: int):
+    """Yields the decoded body of a streamed response in chunks of bytes."""
+    if not isinstance(response, FastResponse):
+        return response.iter_content(chunk_size)
+    chunks = response.iter_content(chunk_size, decode_content=False)
+    content_encodings = response.headers.getlist("Content-Encoding") if response.headers else []
+    content_encoding = ", ".join(content_encodings).strip().lower() or "identity"
+    if content_encoding == "identity":
+        return chunks
+    if content_encoding not in ("gzip", "x-gzip", "deflate"):
+        raise ValueError(f"Unsupported Content-Encoding {content_encoding}")
+    return _decompress(chunks)
+
+
+def _decompress(chunks):
+    # 32 + MAX_WBITS detects both the gzip and the zlib header
+    decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if data := decompressor.decompress(chunk):
+            yield data
+    if data := decompressor.flush():
+        yield data
+
+
+def drain(response, marker: bytes | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[int, bool]:
+    """Reads the body of a streamed response and discards it.
+    Returns the number of bytes read, and whether the marker was found, True if no marker is given.
+    """
+    length = 0
+    found = not marker
+    tail = b""
+    for chunk in iter_chunks(response, chunk_size):
+        length += len(chunk)
+        if not found and marker:
+            # Keep the end of the previous chunk, for a marker split between two chunks
+            found = marker in tail + chunk
+            tail = chunk[-(len(marker) - 1) :] if len(marker) > 1 else b""
+    return length, found
+
+
+def get_streamed(client, path: str, name: str | None = None, marker: str | None = None, **kwargs):
+    """Sends a GET request of a page, streams the body, and reports the time to first byte as the GET request
+    and the time to last byte as a TTLB request. The request fails if the status is not ok, if the connection
+    fails during the body, or if the marker is not in the page.
+    """
+    name = name or path
+    started = time.perf_counter()
+    error = None
+    length = 0
+    headers = streamed_headers(kwargs.pop("headers", None))
+    with client.get(path, name=name, headers=headers, stream=True, catch_response=True, **kwargs) as response:
+        if response.status_code and response.ok:
+            try:
+                length, found = drain(response, marker.encode() if marker else None)
+                if not found:
+                    error = f"The marker {marker!r} was not found in the page"
+            except Exception as ex:
+                error = f"{type(ex).__name__}: {ex}"
+                # Release the connection of a partly read response to the connection pool of the requests session
+                if isinstance(response, requests.Response):
+                    response.close()
+            if error:
+                response.failure(error)
+        else:
+            error = f"Status code {response.status_code}"
+
+    report_ttlb(client, name, started, length, error)
+    return response
+
+
+def report_ttlb(client, name: str, started: float, length: int, error: str | None = None):
+    """Reports the time to last byte of a streamed request, from the start of the request,
+    with the length of the decoded body.
+    """
+    response_time = (time.perf_counter() - started) * 1000
+    log_synthetic_request(client.user.environment, TTLB_REQUEST_TYPE, name, response_time, length, error)
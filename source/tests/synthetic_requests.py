@@ -0,0 +1,36 @@
+"""Statistics rows of the timings that are not HTTP requests, such as the phases of a workflow or the time to last byte.
+
+The test plans report such timings next to the HTTP requests, in their own rows of the statistics with a custom
+request type, such as the PHASE and TRANSACTION rows of transactions.py. Firing them as request events would also
+count them in the Aggregated row, so that its request count, failures and percentiles would mix the HTTP requests
+with the timings that overlap them. They are instead logged directly to their rows, the same way as the corrected
+rows of _coordinated_omission.py, and the Aggregated row has the HTTP requests only. Since there is no request
+event, they are not in the HDR histograms of _hdr_reporting.py either.
+"""
+
+from locust.stats import StatsError
+
+
+def log_synthetic_request(
+    environment,
+    request_type: str,
+    name: str,
+    response_time: float,
+    response_length: int = 0,
+    error: Exception | str | None = None,
+):
+    """Logs a timing to the row of its request type and name, and to the failures if there is an error,
+    without affecting the Aggregated row.
+    """
+    stats = environment.stats
+    entry = stats.get(name, request_type)
+    entry.log(response_time, response_length)
+    if error is None:
+        return
+    entry.log_error(error)
+    key = StatsError.create_key(request_type, name, error)
+    stats_error = stats.errors.get(key)
+    if stats_error is None:
+        stats_error = StatsError(request_type, name, error)
+        stats.errors[key] = stats_error
+    stats_error.occurred()
@@ -0,0 +1,14 @@
+"""Locust test file defining the test plan scenario for scripted integrations using the Serve API.
+The API clients harvest the public apps, paging through the list and fetching the details of the apps.
+"""
+
+from base_user_types import SelectedExtendedOpenAPIClientUser
+from wait_times import think_time
+
+
+class IntegrationAPIClientUser(SelectedExtendedOpenAPIClientUser):
+    """Implements the ExtendedOpenAPIClientBaseUser user type."""
+
+    user_type = "IntegrationAPIClientUser"
+    weight = 1
+    wait_time = think_time(1, 5)
@@ -0,0 +1,14 @@
+"""Locust test file defining the test plan scenario for the startup of user apps.
+Each app start creates a pod on the k8s cluster, so run this test plan with few users.
+"""
+
+from base_user_types import SelectedAppStartupUser
+from locust import between
+
+
+class AppStartupTestUser(SelectedAppStartupUser):
+    """Implements the AppStartupUser user type."""
+
+    user_type = "AppStartupTestUser"
+    weight = 1
+    wait_time = between(10, 20)
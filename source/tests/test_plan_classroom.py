@@ -1,30 +1,34 @@
 """Locust test file defining the test plan scenario for the classroom load."""
 
-from base_user_types import AppViewerUser, PowerBaseUser, VisitingBaseUser
-from locust import between
+from base_user_types import (
+    SelectedAppViewerUser,
+    SelectedPowerUser,
+    SelectedVisitingUser,
+)
+from wait_times import think_time
 
 
-class VisitingClassroomUser(VisitingBaseUser):
+class VisitingClassroomUser(SelectedVisitingUser):
     """Implements the VisitingBaseUser user type."""
 
     user_type = "VisitingClassroomUser"
     weight = 2
-    wait_time = between(2, 3)
+    wait_time = think_time(2, 3)
 
 
-class StudentClassroomUser(PowerBaseUser):
+class StudentClassroomUser(SelectedPowerUser):
     """Implements the PowerBaseUser user type as a Student type user."""
 
     is_student_user = True
 
     user_type = "StudentClassroomUser"
     weight = 7
-    wait_time = between(2, 3)
+    wait_time = think_time(2, 3)
 
 
-class AppViewerClassroomUser(AppViewerUser):
+class AppViewerClassroomUser(SelectedAppViewerUser):
     """Implements the VisitingBaseUser user type."""
 
     user_type = "AppViewerClassroomUser"
     weight = 1
-    wait_time = between(4, 8)
+    wait_time = think_time(4, 8)
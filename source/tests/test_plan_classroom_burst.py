@@ -0,0 +1,15 @@
+"""Locust test file defining the test plan scenario for a classroom burst, where all students start together.
+The students are held until all of them have been spawned, and then log in, create a project and create
+a JupyterLab app at the same moment. The number of students is the number of users of the test run.
+"""
+
+from base_user_types import SelectedClassroomBurstUser
+from locust import constant
+
+
+class StudentClassroomBurstUser(SelectedClassroomBurstUser):
+    """Implements the ClassroomBurstUser user type."""
+
+    user_type = "StudentClassroomBurstUser"
+    weight = 1
+    wait_time = constant(1)
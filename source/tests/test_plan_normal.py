@@ -1,41 +1,41 @@
 """Locust test file defining the test plan scenario for normal load."""
 
 from base_user_types import (
-    AppViewerUser,
-    OpenAPIClientBaseUser,
-    PowerBaseUser,
-    VisitingBaseUser,
+    SelectedAppViewerUser,
+    SelectedOpenAPIClientUser,
+    SelectedPowerUser,
+    SelectedVisitingUser,
 )
-from locust import between
+from wait_times import think_time
 
 
-class VisitingNormalUser(VisitingBaseUser):
+class VisitingNormalUser(SelectedVisitingUser):
     """Implements the VisitingBaseUser user type."""
 
     user_type = "VisitingNormalUser"
     weight = 6
-    wait_time = between(2, 3)
+    wait_time = think_time(2, 3)
 
 
-class PowerNormalUser(PowerBaseUser):
+class PowerNormalUser(SelectedPowerUser):
     """Implements the PowerBaseUser user type."""
 
     user_type = "PowerNormalUser"
     weight = 1
-    wait_time = between(1, 2)
+    wait_time = think_time(1, 2)
 
 
-class AppViewerNormalUser(AppViewerUser):
+class AppViewerNormalUser(SelectedAppViewerUser):
     """Implements the AppViewerUser user type."""
 
     user_type = "AppViewerNormalUser"
     weight = 2
-    wait_time = between(4, 8)
+    wait_time = think_time(4, 8)
 
 
-class OpenAPIClientNormalUser(OpenAPIClientBaseUser):
+class OpenAPIClientNormalUser(SelectedOpenAPIClientUser):
     """Implements the ApiBaseUser user type."""
 
     user_type = "OpenAPIClientNormalUser"
     weight = 1
-    wait_time = between(0.5, 2)
+    wait_time = think_time(0.5, 2)
@@ -0,0 +1,69 @@
+"""Locust test file defining the test plan scenario for an open model load, where the users arrive at a target rate.
+The arrival profile is selected by the env var SERVE_LOCUST_ARRIVAL_PROFILE. The classroom profile runs the
+student users of the classroom test plan, and the other profiles run the user types of the normal test plan.
+The load shape sets the number of users, so the options --users, --spawn-rate and --run-time are not used.
+"""
+
+from _open_model import (
+    SERVE_LOCUST_ARRIVAL_PROFILE,
+    ArrivalRateShape,
+    OpenModelUserMixin,
+)
+from base_user_types import (
+    SelectedAppViewerUser,
+    SelectedOpenAPIClientUser,
+    SelectedPowerUser,
+    SelectedVisitingUser,
+)
+
+
+class VisitingOpenModelUser(OpenModelUserMixin, SelectedVisitingUser):
+    """Implements the VisitingBaseUser user type."""
+
+    user_type = "VisitingOpenModelUser"
+    weight = 6
+
+
+class PowerOpenModelUser(OpenModelUserMixin, SelectedPowerUser):
+    """Implements the PowerBaseUser user type."""
+
+    user_type = "PowerOpenModelUser"
+    weight = 1
+    run_task_once = False
+
+
+class AppViewerOpenModelUser(OpenModelUserMixin, SelectedAppViewerUser):
+    """Implements the AppViewerUser user type."""
+
+    user_type = "AppViewerOpenModelUser"
+    weight = 2
+
+
+class OpenAPIClientOpenModelUser(OpenModelUserMixin, SelectedOpenAPIClientUser):
+    """Implements the ApiBaseUser user type."""
+
+    user_type = "OpenAPIClientOpenModelUser"
+    weight = 1
+
+
+class StudentOpenModelUser(OpenModelUserMixin, SelectedPowerUser):
+    """Implements the PowerBaseUser user type as a Student type user."""
+
+    is_student_user = True
+
+    user_type = "StudentOpenModelUser"
+    weight = 1
+    run_task_once = False
+
+
+class OpenModelShape(ArrivalRateShape):
+    """Sets the arrival rates of the user types from the arrival profile."""
+
+    # Locust uses the shape for all test plans when the tests directory is the locustfile,
+    # so the shape is only used when an arrival profile has been selected
+    abstract = SERVE_LOCUST_ARRIVAL_PROFILE is None
+
+    def get_user_classes(self):
+        if self.profile.name == "classroom":
+            return [StudentOpenModelUser]
+        return [VisitingOpenModelUser, PowerOpenModelUser, AppViewerOpenModelUser, OpenAPIClientOpenModelUser]
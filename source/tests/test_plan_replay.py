@@ -0,0 +1,18 @@
+"""Locust test file defining the test plan scenario that replays a production access log of the Serve ingress.
+The access log is selected by the env var SERVE_LOCUST_REPLAY_LOG. The users are a pool that replays the sessions
+of the log at their original times, so set --users to the max number of concurrent sessions of the log.
+"""
+
+from _log_replay import SERVE_LOCUST_REPLAY_LOG
+from base_user_types import SelectedReplayUser
+
+
+class AccessLogReplayUser(SelectedReplayUser):
+    """Implements the ReplayBaseUser user type."""
+
+    # Locust runs all test plans when the tests directory is the locustfile,
+    # so the replay users are only used when an access log has been selected
+    abstract = SERVE_LOCUST_REPLAY_LOG is None
+
+    user_type = "AccessLogReplayUser"
+    weight = 1
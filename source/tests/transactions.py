@@ -0,0 +1,73 @@
+"""Timing of a user workflow as a transaction of phases, reported to Locust as custom requests.
+
+Each phase of a workflow, such as login or create-project, is reported as a request of type PHASE named
+{transaction}:{phase}, and the whole workflow as a request of type TRANSACTION named {transaction}.
+A milestone of a workflow, such as the login of a student of a classroom, is instead timed from the start of the
+transaction until it is reached, and is reported as a request of type MILESTONE named {transaction}:{milestone}.
+The phases and the transactions get their own rows and percentiles in the statistics, next to the rows of the
+individual HTTP requests, and are not counted in the Aggregated row, see synthetic_requests.py. A phase fails if
+it is marked as failed, if a response checked with Phase.check did not succeed, or if it raises an exception,
+and the transaction fails if any of its phases fails.
+"""
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from synthetic_requests import log_synthetic_request
+
+
+@dataclass
+class Phase:
+    name: str
+    error: str | None = None
+
+    def fail(self, error: str):
+        """Marks the phase as failed, for example when a request of the phase did not succeed."""
+        self.error = error
+
+    def check(self, response):
+        """Marks the phase as failed if the response of a request of the phase did not succeed."""
+        if not (response.status_code and response.ok):
+            self.fail(f"Status code {response.status_code}")
+
+
+class Transaction:
+    """Times the phases of a workflow of a user, and the whole workflow from the start of the transaction."""
+
+    def __init__(self, environment, name: str, started: float | None = None):
+        """:param started: The perf_counter time of the start of the workflow, by default now."""
+        self.environment = environment
+        self.name = name
+        self.started = time.perf_counter() if started is None else started
+        self.error: str | None = None
+
+    def phase(self, name: str):
+        """Times the phase run in the with block, and yields the Phase for marking it as failed."""
+        return self._step("PHASE", name, time.perf_counter())
+
+    def milestone(self, name: str):
+        """Times from the start of the transaction until the end of the with block, and yields the Phase
+        for marking it as failed.
+        """
+        return self._step("MILESTONE", name, self.started)
+
+    @contextmanager
+    def _step(self, request_type: str, name: str, started: float):
+        phase = Phase(name)
+        try:
+            yield phase
+        except Exception as ex:
+            phase.fail(f"{type(ex).__name__}: {ex}")
+            raise
+        finally:
+            self._report(request_type, f"{self.name}:{name}", started, phase.error)
+            if phase.error and not self.error:
+                self.error = f"The phase {name} failed: {phase.error}"
+
+    def end(self):
+        """Reports the time of the whole workflow."""
+        self._report("TRANSACTION", self.name, self.started, self.error)
+
+    def _report(self, request_type: str, name: str, started: float, error: str | None):
+        log_synthetic_request(self.environment, request_type, name, (time.perf_counter() - started) * 1000, error=error)
@@ -0,0 +1,159 @@
+"""Think-time distributions of the user types, as wait_time functions like locust.between.
+
+The uniform waits of between(min, max) give unrealistically smooth traffic. Real users think for mostly short and
+sometimes very long times, and the arrivals of the users are bursty, which triggers queueing in Serve that uniform
+waits never reveal. The wait_time functions of this module are:
+
+- uniform(min_wait, max_wait): the same as between.
+- exponential(mean): the waits of a Poisson process, the memoryless arrivals of independent users.
+- lognormal(median, sigma): a heavy tailed distribution, a common fit of the think times of web users.
+- empirical(edges, counts): samples a histogram of measured think times, such as one fitted by
+  tools/fit_workload_model.py, uniformly within the bins.
+- diurnal(wait_time, amplitude): modulates another wait_time function with a daily cycle, so that the request
+  rate peaks at SERVE_LOCUST_DIURNAL_PEAK and is lowest 12 hours later.
+
+The samples are generated in batches into a buffer that is shared by the users of a user class, so that the cost
+per task is taking a sample from the buffer.
+
+The test plans use think_time(min_wait, max_wait), which returns the distribution selected by the env var
+SERVE_LOCUST_WAIT_TIME_DISTRIBUTION with the same mean as between(min_wait, max_wait), so that the load is
+the same on average and only its burstiness changes.
+"""
+
+import logging
+import math
+import os
+import random
+import time
+from bisect import bisect
+from itertools import accumulate
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+# The distribution of the think times of the test plans, one of uniform, exponential, lognormal or empirical
+SERVE_LOCUST_WAIT_TIME_DISTRIBUTION = os.environ.get("SERVE_LOCUST_WAIT_TIME_DISTRIBUTION", "uniform").lower()
+# The shape of the lognormal distribution, the standard deviation of the log of the think times
+SERVE_LOCUST_WAIT_TIME_SIGMA = float(os.environ.get("SERVE_LOCUST_WAIT_TIME_SIGMA", 1.0))
+# The relative amplitude of the daily cycle of the request rate, from 0 to below 1. 0 disables the cycle.
+SERVE_LOCUST_DIURNAL_AMPLITUDE = float(os.environ.get("SERVE_LOCUST_DIURNAL_AMPLITUDE", 0))
+# The length in seconds of the cycle, by default a day. A shorter period compresses the day into a test run.
+SERVE_LOCUST_DIURNAL_PERIOD = float(os.environ.get("SERVE_LOCUST_DIURNAL_PERIOD", 86400))
+# The time of the peak of the request rate, in seconds since the start of the cycle, by default 14:00 UTC
+SERVE_LOCUST_DIURNAL_PEAK = float(os.environ.get("SERVE_LOCUST_DIURNAL_PEAK", 14 * 3600))
+
+WAIT_TIME_DISTRIBUTIONS = ("uniform", "exponential", "lognormal", "empirical")
+
+# The number of samples generated at a time
+SAMPLE_BUFFER_SIZE = 1024
+
+
+class SampleBuffer:
+    """A buffer of pre-generated samples of a distribution, refilled in batches when empty.
+
+    :param generate: Returns a list of the given number of samples.
+    :param size: The number of samples generated at a time.
+    """
+
+    def __init__(self, generate: Callable[[int], list[float]], size: int = SAMPLE_BUFFER_SIZE):
+        self.generate = generate
+        self.size = size
+        self.samples: list[float] = []
+
+    def next(self) -> float:
+        if not self.samples:
+            self.samples = self.generate(self.size)
+        return self.samples.pop()
+
+
+def uniform(min_wait: float, max_wait: float):
+    """Returns a wait_time function of uniformly distributed waits between min_wait and max_wait seconds."""
+    width = max_wait - min_wait
+    buffer = SampleBuffer(lambda n: [min_wait + width * random.random() for _ in range(n)])
+    return lambda instance: buffer.next()
+
+
+def exponential(mean: float):
+    """Returns a wait_time function of exponentially distributed waits with the mean in seconds."""
+    if mean <= 0:
+        return lambda instance: 0.0
+    rate = 1 / mean
+    buffer = SampleBuffer(lambda n: [random.expovariate(rate) for _ in range(n)])
+    return lambda instance: buffer.next()
+
+
+def lognormal(median: float, sigma: float):
+    """Returns a wait_time function of lognormally distributed waits with the median in seconds.
+    The mean is median * exp(sigma ** 2 / 2).
+    """
+    if median <= 0:
+        return lambda instance: 0.0
+    mu = math.log(median)
+    buffer = SampleBuffer(lambda n: [random.lognormvariate(mu, sigma) for _ in range(n)])
+    return lambda instance: buffer.next()
+
+
+def empirical(edges: list[float], counts: list[int]):
+    """Returns a wait_time function that samples a histogram of think times, uniformly within the bins.
+
+    :param edges: The increasing edges of the bins in seconds, one more than the counts.
+    :param counts: The number of think times in each bin.
+    """
+    if len(edges) != len(counts) + 1 or not sum(counts):
+        raise ValueError("A histogram must have one more edge than counts, and a positive total count")
+    cum_counts = list(accumulate(counts))
+    total = cum_counts[-1]
+
+    def generate(n: int) -> list[float]:
+        samples = []
+        for _ in range(n):
+            i = bisect(cum_counts, random.random() * total)
+            samples.append(edges[i] + (edges[i + 1] - edges[i]) * random.random())
+        return samples
+
+    buffer = SampleBuffer(generate)
+    return lambda instance: buffer.next()
+
+
+def diurnal(
+    wait_time: Callable[..., float],
+    amplitude: float,
+    period: float = SERVE_LOCUST_DIURNAL_PERIOD,
+    peak: float = SERVE_LOCUST_DIURNAL_PEAK,
+):
+    """Modulates a wait_time function with a cycle, so that the request rate at time t is multiplied by
+    1 + amplitude * cos(2 * pi * (t - peak) / period). The time is the UNIX time, so the default daily cycle
+    follows the UTC time of day.
+    """
+    if not 0 <= amplitude < 1:
+        raise ValueError("The amplitude of the diurnal cycle must be at least 0 and below 1")
+
+    def wait_time_func(instance) -> float:
+        phase = 2 * math.pi * (time.time() - peak) / period
+        return wait_time(instance) / (1 + amplitude * math.cos(phase))
+
+    return wait_time_func
+
+
+def think_time(min_wait: float, max_wait: float, histogram: tuple[list[float], list[int]] | None = None):
+    """Returns the wait_time function of SERVE_LOCUST_WAIT_TIME_DISTRIBUTION with the mean of
+    between(min_wait, max_wait), modulated by the diurnal cycle when SERVE_LOCUST_DIURNAL_AMPLITUDE is set.
+    The empirical distribution samples the histogram of (edges, counts), and is uniform without a histogram.
+    """
+    distribution = SERVE_LOCUST_WAIT_TIME_DISTRIBUTION
+    mean = (min_wait + max_wait) / 2
+    if distribution == "exponential":
+        wait_time = exponential(mean)
+    elif distribution == "lognormal":
+        wait_time = lognormal(mean / math.exp(SERVE_LOCUST_WAIT_TIME_SIGMA**2 / 2), SERVE_LOCUST_WAIT_TIME_SIGMA)
+    elif distribution == "empirical" and histogram is not None:
+        wait_time = empirical(*histogram)
+    elif distribution in WAIT_TIME_DISTRIBUTIONS:
+        wait_time = uniform(min_wait, max_wait)
+    else:
+        raise ValueError(f"Unknown wait time distribution {distribution}. Use one of {WAIT_TIME_DISTRIBUTIONS}")
+
+    if SERVE_LOCUST_DIURNAL_AMPLITUDE:
+        wait_time = diurnal(wait_time, SERVE_LOCUST_DIURNAL_AMPLITUDE)
+    return wait_time
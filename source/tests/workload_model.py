@@ -0,0 +1,137 @@
+"""The workload model of the test plans, fitted from production access logs by tools/fit_workload_model.py.
+
+The weights, wait times and task weights of the user types in the test plans are hand-picked. A workload model
+replaces them with values fitted from the traffic of Serve, so that the test mix stays calibrated as the traffic
+changes. The model is a JSON object with an entry per user type of the traffic, for example:
+
+    {
+      "user_types": {
+        "visiting": {"weight": 12, "wait_time": {"min": 1.8, "max": 24.5}, "tasks": {"browse_homepage": 5}},
+        "api_client": {"weight": 1, "wait_time": {"min": 0.4, "max": 3.2}}
+      }
+    }
+
+The user types of the traffic are visiting, power, app_viewer and api_client, see classify_session.
+The wait_time may also have a histogram of the think times, {"edges": [...], "counts": [...]}, which is sampled
+when SERVE_LOCUST_WAIT_TIME_DISTRIBUTION is empirical, see wait_times.py.
+The model is applied to the user classes of the test plans that set their own wait_time, see
+WorkloadModelUserMixin in base_user_types.py. The user types and tasks that are not in the model keep
+the values of the test plan.
+
+The env var SERVE_LOCUST_WORKLOAD_MODEL is the path of the model. Unset uses the values of the test plans.
+"""
+
+import json
+import logging
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import cache
+
+logger = logging.getLogger(__name__)
+
+
+SERVE_LOCUST_WORKLOAD_MODEL = os.environ.get("SERVE_LOCUST_WORKLOAD_MODEL") or None
+
+WORKLOAD_USER_TYPES = ("visiting", "power", "app_viewer", "api_client")
+
+# The paths of the requests that identify the tasks of the user types, by user type
+TASK_PATHS: dict[str, dict[str, str]] = {
+    "visiting": {
+        "/home/": "browse_homepage",
+        "/about/": "browse_about",
+        "/apps/": "browse_apps",
+        "/models/": "browse_models",
+        "/docs/": "browse_user_guide",
+    },
+    "api_client": {
+        "/openapi/v1/api-info": "call_api_info",
+        "/openapi/v1/system-version": "call_system_version",
+        "/openapi/v1/public-apps": "get_public_apps",
+    },
+}
+
+# The path prefixes of the requests of the authenticated users, and of the user apps served by ShinyProxy
+_POWER_PATH_PREFIXES = ("/accounts/", "/projects/")
+_APP_PATH_PREFIXES = ("/app/", "/app_i/", "/app_proxy/", "/api/proxy/")
+_API_PATH_PREFIX = "/openapi/"
+
+
+def classify_path(path: str) -> str | None:
+    """Returns the user type that a request path is evidence of, or None for the public pages."""
+    if path.startswith(_POWER_PATH_PREFIXES):
+        return "power"
+    if path.startswith(_APP_PATH_PREFIXES):
+        return "app_viewer"
+    if path.startswith(_API_PATH_PREFIX):
+        return "api_client"
+    return None
+
+
+def classify_session(paths: Iterable[str]) -> str:
+    """Returns the user type of a session from the paths of its page requests. A session that logs in or uses
+    the projects is a power user, one that opens a user app is an app viewer, one that only uses the API is
+    an API client, and one that only browses the public pages is a visiting user.
+    """
+    evidence = {classify_path(path) for path in paths}
+    for user_type in ("power", "app_viewer"):
+        if user_type in evidence:
+            return user_type
+    if evidence == {"api_client"}:
+        return "api_client"
+    return "visiting"
+
+
+@dataclass(frozen=True)
+class UserWorkload:
+    """The fitted workload of a user type."""
+
+    # The weight of the user type in the test plans
+    weight: int | None = None
+    # The wait time between the tasks in seconds, as between(min_wait, max_wait)
+    min_wait: float | None = None
+    max_wait: float | None = None
+    # The weights of the tasks by task name
+    task_weights: dict[str, int] = field(default_factory=dict)
+    # The histogram of the think times as (edges, counts), for the empirical wait time distribution
+    histogram: tuple[list[float], list[int]] | None = None
+
+
+def parse_workload_model(model: dict) -> dict[str, UserWorkload]:
+    """Returns the workloads by user type of a workload model. Raises a ValueError if the model is invalid."""
+    workloads = {}
+    for user_type, entry in model.get("user_types", {}).items():
+        if user_type not in WORKLOAD_USER_TYPES:
+            raise ValueError(f"Unknown user type {user_type} in the workload model. Use {WORKLOAD_USER_TYPES}")
+        weight = entry.get("weight")
+        wait_time = entry.get("wait_time") or {}
+        min_wait, max_wait = wait_time.get("min"), wait_time.get("max")
+        task_weights = entry.get("tasks", {})
+        if weight is not None and not (isinstance(weight, int) and weight > 0):
+            raise ValueError(f"The weight of {user_type} in the workload model must be a positive integer")
+        if (min_wait is None) != (max_wait is None) or (min_wait is not None and not 0 <= min_wait <= max_wait):
+            raise ValueError(f"The wait_time of {user_type} in the workload model must have 0 <= min <= max")
+        if not all(isinstance(value, int) and value >= 0 for value in task_weights.values()):
+            raise ValueError(f"The task weights of {user_type} in the workload model must be integers >= 0")
+        histogram = None
+        if "histogram" in wait_time:
+            edges, counts = wait_time["histogram"]["edges"], wait_time["histogram"]["counts"]
+            if len(edges) != len(counts) + 1 or any(a >= b for a, b in zip(edges, edges[1:])) or not sum(counts):
+                raise ValueError(f"The wait_time histogram of {user_type} in the workload model is invalid")
+            histogram = (edges, counts)
+        workloads[user_type] = UserWorkload(weight, min_wait, max_wait, dict(task_weights), histogram)
+    return workloads
+
+
+def load_workload_model(path: str) -> dict[str, UserWorkload]:
+    with open(path) as f:
+        return parse_workload_model(json.load(f))
+
+
+@cache
+def get_workload_model() -> dict[str, UserWorkload]:
+    """Returns the workloads of SERVE_LOCUST_WORKLOAD_MODEL by user type, empty if unset."""
+    if SERVE_LOCUST_WORKLOAD_MODEL is None:
+        return {}
+    logger.info("Using the workload model %s", SERVE_LOCUST_WORKLOAD_MODEL)
+    return load_workload_model(SERVE_LOCUST_WORKLOAD_MODEL)
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the extraction of the JupyterLab create app form values.
+Compares the full lxml DOM and XPath approach, previously used by PowerBaseUser._create_app,
+with the streaming extraction of form_parsing.py, with and without the cache.
+
+Run from the source directory:
+
+    python3 ./tools/bench_form_parsing.py
+    python3 ./tools/bench_form_parsing.py --html ./a-saved-serve-form-page.html --number 2000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+from lxml import etree
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from form_parsing import (  # noqa: E402
+    extract_first_option_values,
+    get_first_option_values,
+)
+
+DEFAULT_HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "jupyterlab_create_form.html")
+
+FORM_URL = "/projects/locust_test_project_new_1/apps/create/jupyter-lab?from=overview"
+SELECT_NAMES = ("volume", "flavor", "environment")
+
+
+def parse_with_dom_and_xpath(html_content: bytes) -> dict[str, str | None]:
+    """The previous approach: builds the full DOM and runs one XPath query per select element."""
+    tree = etree.fromstring(html_content, etree.HTMLParser())
+    values = {}
+    for name in SELECT_NAMES:
+        elements = tree.xpath(f'//select[@name="{name}"]/option')
+        values[name] = elements[0].get("value") if elements else None
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html", default=DEFAULT_HTML_PATH, help="Path to a saved Serve form page")
+    parser.add_argument("--number", type=int, default=1000, help="Number of parses per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of measurements, the best is reported")
+    args = parser.parse_args()
+
+    with open(args.html, "rb") as f:
+        html_content = f.read()
+
+    expected = parse_with_dom_and_xpath(html_content)
+    if extract_first_option_values(html_content, SELECT_NAMES) != expected:
+        raise Exception("The streaming extraction does not return the same values as the DOM and XPath approach")
+
+    print(f"Form page {args.html} ({len(html_content)} bytes), extracted values: {expected}")
+
+    candidates = {
+        "dom + xpath": lambda: parse_with_dom_and_xpath(html_content),
+        "streaming": lambda: extract_first_option_values(html_content, SELECT_NAMES),
+        "streaming + cache": lambda: get_first_option_values(FORM_URL, html_content, SELECT_NAMES),
+    }
+
+    baseline = None
+    for name, func in candidates.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+        baseline = baseline or best
+        print(f"{name:<20} {best * 1e6:10.1f} us per parse {baseline / best:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Benchmark of the load generator capacity per user type.
+
+Runs each user class alone, in a single Locust process, against the local mock of Serve at increasing user counts.
+For each user count it records the achieved requests per second, the CPU usage of the Locust process, its memory,
+and the client side latency overhead, which is the average response time measured by Locust minus the average
+time the mock server spent on the requests. The results are written as JSON, for sizing the CPU and memory
+limits and the number of workers in the manifests.
+
+Run from the source directory:
+
+    python3 ./tools/benchmark_user_types.py
+    python3 ./tools/benchmark_user_types.py --users 10,50,100,200,400 --run-time 60 VisitingNormalUser
+
+The env vars of the test plans, such as SERVE_LOCUST_USE_FAST_HTTP_CLIENT, are passed on to Locust.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import locust
+import psutil
+from locust_runs import (
+    get_mock_server_time_ms,
+    mock_serve,
+    reset_mock_stats,
+    run_locust,
+)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from env_vars import get_env_bool  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_USER_CLASSES = ["VisitingNormalUser", "PowerNormalUser", "OpenAPIClientNormalUser", "AppViewerNormalUser"]
+
+# Users of the same class are independent, so the memory per user is the slope of the memory over the user count
+MIN_LEVELS_FOR_MEMORY_SLOPE = 2
+
+
+def get_slope(xs: list[float], ys: list[float]) -> float | None:
+    """Returns the least squares slope of ys over xs."""
+    if len(xs) < MIN_LEVELS_FOR_MEMORY_SLOPE:
+        return None
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def get_cpu_seconds(process) -> float:
+    cpu_times = psutil.Process(process.pid).cpu_times()
+    return float(cpu_times.user + cpu_times.system)
+
+
+def benchmark_user_class(args, user_class: str, host: str, mock_process) -> list[dict]:
+    levels = []
+    for users in args.users:
+        reset_mock_stats(host)
+        mock_cpu_start, wall_start = get_cpu_seconds(mock_process), time.monotonic()
+
+        run = run_locust(
+            args.locustfile,
+            [user_class],
+            users=users,
+            spawn_rate=args.spawn_rate or users,
+            run_time=args.run_time,
+            host=host,
+            env=args.env,
+        )
+
+        mock_cpu_percent = 100 * (get_cpu_seconds(mock_process) - mock_cpu_start) / (time.monotonic() - wall_start)
+        server_time_ms = get_mock_server_time_ms(host)
+        stats = run.aggregated
+
+        if stats is None:
+            logger.error("The run of %s with %s users failed with exit code %s", user_class, users, run.returncode)
+            break
+
+        level = {
+            "users": users,
+            "requests": stats.requests,
+            "failures": stats.failures,
+            # Over the whole run time, as Locust reports the rate until the last request, which is
+            # misleading for the power users that only run their workflow once
+            "rps": round(stats.requests / args.run_time, 2),
+            "avg_ms": stats.avg,
+            "p50_ms": stats.p50,
+            "p95_ms": stats.p95,
+            "p99_ms": stats.p99,
+            "server_time_ms": round(server_time_ms, 2) if server_time_ms is not None else None,
+            "latency_overhead_ms": (
+                round(stats.avg - server_time_ms, 2) if stats.avg is not None and server_time_ms is not None else None
+            ),
+            "locust_cpu_percent": round(run.cpu_percent, 1) if run.cpu_percent is not None else None,
+            "mock_cpu_percent": round(mock_cpu_percent, 1),
+            "locust_rss_mb": round(run.max_rss / 1024**2, 1) if run.max_rss else None,
+        }
+        levels.append(level)
+        logger.info("%s %s", user_class, level)
+
+        if run.cpu_percent is not None and run.cpu_percent > args.cpu_limit:
+            logger.info(
+                "The Locust process is CPU bound at %s users of %s. Skipping higher user counts.", users, user_class
+            )
+            break
+
+    return levels
+
+
+def summarize(args, levels: list[dict]) -> dict:
+    """Returns the capacity of one Locust core for a user class, from the levels below the CPU limit."""
+    measured = [level for level in levels if level["locust_rss_mb"] is not None]
+    slope = get_slope([level["users"] for level in measured], [level["locust_rss_mb"] for level in measured])
+
+    below_limit = [
+        level
+        for level in levels
+        if level["locust_cpu_percent"] is not None and level["locust_cpu_percent"] <= args.cpu_limit
+    ]
+    best = below_limit[-1] if below_limit else None
+    return {
+        "memory_per_user_kb": round(slope * 1024, 1) if slope is not None else None,
+        "max_users_below_cpu_limit": best["users"] if best else None,
+        "rps_at_max_users": best["rps"] if best else None,
+        "rps_per_core": (
+            round(100 * best["rps"] / best["locust_cpu_percent"], 1) if best and best["locust_cpu_percent"] else None
+        ),
+    }
+
+
+def parse_user_counts(value: str) -> list[int]:
+    return sorted(int(users) for users in value.split(","))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("user_classes", nargs="*", default=DEFAULT_USER_CLASSES, help="The user classes to benchmark")
+    parser.add_argument("--locustfile", default="./tests/test_plan_normal.py", help="The file of the user classes")
+    parser.add_argument(
+        "--users", type=parse_user_counts, default=[10, 50, 100, 200], help="Comma separated user counts"
+    )
+    parser.add_argument("--spawn-rate", type=float, default=None, help="Default: all users at once")
+    parser.add_argument("--run-time", type=int, default=30, help="The run time in seconds of each user count")
+    parser.add_argument("--cpu-limit", type=float, default=80, help="The Locust CPU percent regarded as saturated")
+    parser.add_argument("--port", type=int, default=8090, help="The port of the mock server")
+    parser.add_argument("--mock-latency", default="constant:20", help="The latency distribution of the mock server")
+    parser.add_argument("--output", default="./reports/benchmark-user-types.json", help="The JSON results file")
+    parser.add_argument("--loglevel", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+
+    # The mock server accepts any password, and the power users need one
+    args.env = {
+        "SERVE_LOCUST_TEST_USER_PASS": os.environ.get("SERVE_LOCUST_TEST_USER_PASS", "benchmark"),
+        "SERVE_LOCUST_DO_CREATE_OBJECTS": os.environ.get("SERVE_LOCUST_DO_CREATE_OBJECTS", "True"),
+    }
+
+    results = {}
+    with mock_serve(args.port, ["--latency", args.mock_latency]) as (host, mock_process):
+        for user_class in args.user_classes:
+            levels = benchmark_user_class(args, user_class, host, mock_process)
+            results[user_class] = {"levels": levels, "summary": summarize(args, levels)}
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "locust_version": locust.__version__,
+        "python_version": platform.python_version(),
+        "cpu_count": psutil.cpu_count(),
+        "fast_http_client": get_env_bool("SERVE_LOCUST_USE_FAST_HTTP_CLIENT"),
+        "locustfile": args.locustfile,
+        "run_time": args.run_time,
+        "cpu_limit": args.cpu_limit,
+        "mock_latency": args.mock_latency,
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for user_class, result in results.items():
+        print(f"{user_class}: {result['summary']}")
+    print(f"Wrote the results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
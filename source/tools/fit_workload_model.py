@@ -0,0 +1,263 @@
+"""
+Fits the workload model of the test plans from production access logs of the Serve ingress.
+
+The access logs are streamed in the nginx combined log format, see tests/access_log.py, and their requests are
+grouped into sessions by client, the remote address and the user agent. A session ends when the client has been idle
+for --session-gap seconds. The static files are skipped, and the requests within --page-view-gap seconds of the
+previous request, such as redirects, are part of the same page view. Each session is classified as one of the user
+types visiting, power, app_viewer or api_client from the paths of its requests, see tests/workload_model.py.
+
+For each user type the tool fits:
+- the wait time between(min, max) from the --wait-quantiles of the think times, the gaps between the page views,
+  and a histogram of the think times for the empirical wait time distribution of tests/wait_times.py,
+- the weight from the time that the clients of the user type spend in sessions, which by Little's law is
+  proportional to their average number of concurrent users. A client also thinks after its last page view,
+  for the mean think time of its user type. The user types without think times, such as the scripted API
+  clients whose sessions are single requests, use the median think time of all user types instead.
+- the task weights from the counts of the page views of the tasks, for the user types that have tasks by path.
+The weights are scaled so that the smallest weight is 1.
+
+Run from the source directory, and use the model in the test runs with SERVE_LOCUST_WORKLOAD_MODEL:
+
+    python3 ./tools/fit_workload_model.py ./access.log.1.gz ./access.log --output ./workload-model.json
+    SERVE_LOCUST_WORKLOAD_MODEL=./workload-model.json locust --headless -f ./tests/test_plan_normal.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from access_log import iter_log_records  # noqa: E402
+from workload_model import (  # noqa: E402
+    TASK_PATHS,
+    WORKLOAD_USER_TYPES,
+    classify_session,
+    parse_workload_model,
+)
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SESSION_GAP = 1800
+DEFAULT_PAGE_VIEW_GAP = 1.0
+DEFAULT_WAIT_QUANTILES = (0.1, 0.9)
+
+# The number of bins of the think time histograms, with an equal share of the think times in each bin
+HISTOGRAM_BINS = 20
+
+# The path prefixes and suffixes of the static files, which the browsers fetch with the pages
+STATIC_PATH_PREFIXES = ("/static/", "/media/")
+STATIC_PATH_SUFFIXES = (".css", ".js", ".png", ".jpg", ".svg", ".ico", ".woff", ".woff2", ".map")
+
+
+def is_page_request(path: str) -> bool:
+    return not path.startswith(STATIC_PATH_PREFIXES) and not path.endswith(STATIC_PATH_SUFFIXES)
+
+
+@dataclass
+class Session:
+    """The page views of a session of a client."""
+
+    first_timestamp: float
+    last_timestamp: float
+    # The distinct paths of the page requests, for classifying the session
+    paths: set[str] = field(default_factory=set)
+    # The counts of the page views by path
+    page_views: Counter = field(default_factory=Counter)
+    # The gaps in seconds between the page views
+    think_times: list[float] = field(default_factory=list)
+
+
+@dataclass
+class UserTypeStats:
+    """The sessions of the clients of a user type."""
+
+    sessions: int = 0
+    # The time in seconds that the clients spent in sessions, without the think time after the last page view
+    session_seconds: float = 0.0
+    think_times: list[float] = field(default_factory=list)
+    page_views: Counter = field(default_factory=Counter)
+
+    def add(self, session: Session):
+        self.sessions += 1
+        self.session_seconds += session.last_timestamp - session.first_timestamp
+        self.think_times.extend(session.think_times)
+        self.page_views.update(session.page_views)
+
+
+class WorkloadFitter:
+    """Groups the requests of the access logs into sessions, and collects the statistics of the user types."""
+
+    def __init__(self, session_gap: float = DEFAULT_SESSION_GAP, page_view_gap: float = DEFAULT_PAGE_VIEW_GAP):
+        self.session_gap = session_gap
+        self.page_view_gap = page_view_gap
+        # The open sessions by client, the least recently active client first
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.stats: defaultdict[str, UserTypeStats] = defaultdict(UserTypeStats)
+        self.requests = 0
+
+    def add_log(self, path: str):
+        for record in iter_log_records(path):
+            request_path = urlsplit(record.url).path
+            if not is_page_request(request_path):
+                continue
+            self.requests += 1
+            self.end_idle_sessions(record.timestamp)
+
+            session = self.sessions.get(record.client)
+            if session is None:
+                session = Session(record.timestamp, record.timestamp)
+                self.sessions[record.client] = session
+            else:
+                self.sessions.move_to_end(record.client)
+                gap = record.timestamp - session.last_timestamp
+                if gap <= self.page_view_gap:
+                    # A redirect or a request of the same page view
+                    session.last_timestamp = max(session.last_timestamp, record.timestamp)
+                    session.paths.add(request_path)
+                    continue
+                session.think_times.append(gap)
+                session.last_timestamp = record.timestamp
+            session.paths.add(request_path)
+            session.page_views[request_path] += 1
+
+    def end_idle_sessions(self, timestamp: float | None):
+        """Ends the sessions that have been idle for the session gap, or all sessions if None."""
+        while self.sessions:
+            client, session = next(iter(self.sessions.items()))
+            if timestamp is not None and timestamp - session.last_timestamp < self.session_gap:
+                break
+            del self.sessions[client]
+            self.stats[classify_session(session.paths)].add(session)
+
+    def fit(self, wait_quantiles: tuple[float, float] = DEFAULT_WAIT_QUANTILES) -> dict:
+        """Ends the open sessions and returns the fitted workload model."""
+        self.end_idle_sessions(None)
+        user_types: dict[str, dict] = {}
+        concurrency: dict[str, float] = {}
+        # Without any think times, a session lasts at least a page view
+        all_think_times = [think_time for stats in self.stats.values() for think_time in stats.think_times]
+        median_think_time = statistics.median(all_think_times) if all_think_times else self.page_view_gap
+        for user_type in WORKLOAD_USER_TYPES:
+            stats = self.stats.get(user_type)
+            if stats is None or not stats.sessions:
+                continue
+            entry: dict = {"sessions": stats.sessions, "think_times": len(stats.think_times)}
+            mean_think_time = statistics.fmean(stats.think_times) if stats.think_times else median_think_time
+            if len(stats.think_times) >= 2:
+                entry["wait_time"] = fit_between(stats.think_times, wait_quantiles)
+            # A client also thinks after its last page view before it leaves, so that every session has a duration
+            concurrency[user_type] = stats.session_seconds + stats.sessions * mean_think_time
+            task_weights = fit_task_weights(stats.page_views, TASK_PATHS.get(user_type, {}))
+            if task_weights:
+                entry["tasks"] = task_weights
+            user_types[user_type] = entry
+
+        for user_type, weight in scale_weights(concurrency).items():
+            user_types[user_type]["weight"] = weight
+        model = {
+            "fitted_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "requests": self.requests,
+            "user_types": user_types,
+        }
+        # Validate the model the way the test plans load it
+        parse_workload_model(model)
+        return model
+
+
+def fit_between(think_times: list[float], wait_quantiles: tuple[float, float]) -> dict:
+    """Returns the wait time between(min, max) spanning the quantiles of the think times,
+    with the histogram of the think times.
+    """
+    cut_points = statistics.quantiles(think_times, n=100, method="inclusive")
+    lower, upper = (cut_points[min(98, max(0, round(quantile * 100) - 1))] for quantile in wait_quantiles)
+    return {"min": round(lower, 2), "max": round(upper, 2), "histogram": fit_histogram(think_times)}
+
+
+def fit_histogram(think_times: list[float], bins: int = HISTOGRAM_BINS) -> dict[str, list]:
+    """Returns the histogram of the think times, with the bin edges at the quantiles of the think times.
+    Equal quantiles, from think times with a resolution of one second, are merged into one bin.
+    """
+    cut_points = statistics.quantiles(think_times, n=bins, method="inclusive")
+    edges = sorted({round(edge, 2) for edge in [min(think_times), *cut_points, max(think_times)]})
+    if len(edges) == 1:
+        edges.append(edges[0] + 1)
+    counts = [0] * (len(edges) - 1)
+    for think_time in think_times:
+        counts[min(len(counts) - 1, max(0, bisect_right(edges, think_time) - 1))] += 1
+    return {"edges": edges, "counts": counts}
+
+
+def fit_task_weights(page_views: Counter, task_paths: dict[str, str]) -> dict[str, int]:
+    """Returns the weights of the tasks from the page views of their paths, 0 for the tasks without page views."""
+    counts = {task: page_views[path] for path, task in task_paths.items()}
+    if not any(counts.values()):
+        return {}
+    return scale_weights(counts)
+
+
+def scale_weights(values: Mapping[str, float]) -> dict[str, int]:
+    """Scales the values to integer weights, where the smallest positive value is 1."""
+    smallest = min((value for value in values.values() if value > 0), default=None)
+    if smallest is None:
+        return {key: 1 for key in values}
+    return {key: max(1, round(value / smallest)) if value > 0 else 0 for key, value in values.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="The access logs in time order, optionally gzip compressed")
+    parser.add_argument("--output", default="./workload-model.json", help="The JSON file of the workload model")
+    parser.add_argument(
+        "--session-gap", type=float, default=DEFAULT_SESSION_GAP, help="The idle seconds that end a session"
+    )
+    parser.add_argument(
+        "--page-view-gap",
+        type=float,
+        default=DEFAULT_PAGE_VIEW_GAP,
+        help="The max seconds between the requests of a page view",
+    )
+    parser.add_argument(
+        "--wait-quantiles",
+        type=float,
+        nargs=2,
+        default=DEFAULT_WAIT_QUANTILES,
+        help="The quantiles of the think times that are the min and max of the wait time",
+    )
+    parser.add_argument("--loglevel", default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.loglevel, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+
+    fitter = WorkloadFitter(args.session_gap, args.page_view_gap)
+    for path in args.logs:
+        logger.info("Reading the access log %s", path)
+        fitter.add_log(path)
+    model = fitter.fit(tuple(args.wait_quantiles))
+    model["logs"] = [os.path.basename(path) for path in args.logs]
+
+    with open(args.output, "w") as f:
+        json.dump(model, f, indent=2)
+    for user_type, entry in model["user_types"].items():
+        logger.info(
+            "%s: %s sessions, weight %s, wait time %s",
+            user_type,
+            entry["sessions"],
+            entry["weight"],
+            entry.get("wait_time"),
+        )
+    logger.info("Wrote the workload model of %s page requests to %s", model["requests"], args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Helpers for the tools that run Locust test plans as subprocesses and collect the results,
+optionally against the local mock of Serve in mock_serve.py.
+"""
+
+import csv
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections.abc import Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.dirname(TOOLS_DIR)
+MOCK_SERVE_PATH = os.path.join(TOOLS_DIR, "mock_serve.py")
+
+# The max time in seconds to wait for the mock server to accept requests
+MOCK_SERVE_STARTUP_TIMEOUT = 10
+# The time in seconds that Locust needs to import the locustfiles and start, excluded from the CPU measurement
+LOCUST_STARTUP_TIME = 2
+
+# The request types of the HTTP requests. The test plans also report custom request types, such as TTLB or PHASE.
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+
+# The local mock of Serve
+
+
+@contextmanager
+def mock_serve(port: int, mock_args: Sequence[str] = ()):
+    """Runs mock_serve.py for the duration of the with block and yields its base URL and process."""
+    host = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, MOCK_SERVE_PATH, "--port", str(port), "--loglevel", "WARNING", *mock_args],
+        cwd=SOURCE_DIR,
+    )
+    try:
+        deadline = time.monotonic() + MOCK_SERVE_STARTUP_TIMEOUT
+        while True:
+            try:
+                get_mock_stats(host)
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise Exception(f"The mock Serve server did not start on port {port}")
+                time.sleep(0.1)
+        yield host, process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def get_mock_stats(host: str) -> dict:
+    with urllib.request.urlopen(f"{host}/__mock__/stats", timeout=5) as response:
+        stats: dict = json.load(response)
+    return stats
+
+
+def reset_mock_stats(host: str):
+    request = urllib.request.Request(f"{host}/__mock__/reset", data=b"", method="POST")
+    with urllib.request.urlopen(request, timeout=5):
+        pass
+
+
+def get_mock_server_time_ms(host: str) -> float | None:
+    """Returns the average server side time per request in ms since the mock stats were last reset."""
+    stats = get_mock_stats(host)
+    requests: int = sum(values["requests"] for values in stats["endpoints"].values())
+    if not requests:
+        return None
+    server_time: float = sum(values["server_time"] for values in stats["endpoints"].values())
+    return 1000 * server_time / requests
+
+
+# Locust runs
+
+
+def to_number(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        # Locust writes N/A for the percentiles of endpoints without requests
+        return None
+
+
+@dataclass
+class EndpointStats:
+    """The statistics of a request name, as written by Locust to the _stats.csv file. Times are in ms."""
+
+    method: str
+    name: str
+    requests: int
+    failures: int
+    rps: float
+    avg: float | None
+    p50: float | None
+    p95: float | None
+    p99: float | None
+    max: float | None
+    # The counts of the rounded response times in ms, from the JSON statistics of Locust
+    response_times: dict[int, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_csv_row(cls, row: dict) -> "EndpointStats":
+        return cls(
+            method=row["Type"],
+            name=row["Name"],
+            requests=int(row["Request Count"]),
+            failures=int(row["Failure Count"]),
+            rps=float(row["Requests/s"]),
+            avg=to_number(row["Average Response Time"]),
+            p50=to_number(row["50%"]),
+            p95=to_number(row["95%"]),
+            p99=to_number(row["99%"]),
+            max=to_number(row["Max Response Time"]),
+        )
+
+    @property
+    def failure_ratio(self) -> float:
+        return self.failures / self.requests if self.requests else 0.0
+
+
+def response_time_percentile(response_times: dict[int, int], percent: float) -> float | None:
+    """Returns the percentile of the counts of the response times, computed the same way as Locust does."""
+    requests = sum(response_times.values())
+    if not requests:
+        return None
+    processed = 0
+    for response_time in sorted(response_times, reverse=True):
+        processed += response_times[response_time]
+        if requests - processed <= int(requests * percent):
+            return response_time
+    return 0
+
+
+def merge_endpoints(endpoints: list[EndpointStats], name: str) -> EndpointStats | None:
+    """Returns the combined statistics of the request names, with the percentiles of their merged response times."""
+    if not endpoints:
+        return None
+    requests = sum(endpoint.requests for endpoint in endpoints)
+    response_times: dict[int, int] = {}
+    for endpoint in endpoints:
+        for response_time, count in endpoint.response_times.items():
+            response_times[response_time] = response_times.get(response_time, 0) + count
+    avgs = [(endpoint.avg, endpoint.requests) for endpoint in endpoints if endpoint.avg is not None]
+    maxes = [endpoint.max for endpoint in endpoints if endpoint.max is not None]
+    return EndpointStats(
+        method="",
+        name=name,
+        requests=requests,
+        failures=sum(endpoint.failures for endpoint in endpoints),
+        rps=sum(endpoint.rps for endpoint in endpoints),
+        avg=sum(avg * count for avg, count in avgs) / requests if requests and avgs else None,
+        p50=response_time_percentile(response_times, 0.5),
+        p95=response_time_percentile(response_times, 0.95),
+        p99=response_time_percentile(response_times, 0.99),
+        max=max(maxes, default=None),
+        response_times=response_times,
+    )
+
+
+@dataclass
+class LocustRun:
+    """The results of one headless Locust run."""
+
+    users: int
+    run_time: int
+    returncode: int
+    aggregated: EndpointStats | None
+    endpoints: list[EndpointStats] = field(default_factory=list)
+    # The CPU usage of the Locust process after all users were spawned, where 100 is one fully used core
+    cpu_percent: float | None = None
+    # The max resident memory of the Locust process in bytes
+    max_rss: int | None = None
+
+    @property
+    def http_endpoints(self) -> list[EndpointStats]:
+        """The statistics of the HTTP request names, without the rows of the custom request types."""
+        return [endpoint for endpoint in self.endpoints if endpoint.method in HTTP_METHODS]
+
+    @property
+    def http_aggregated(self) -> EndpointStats | None:
+        """The combined statistics of the HTTP requests."""
+        return merge_endpoints(self.http_endpoints, "HTTP")
+
+
+def run_locust(
+    locustfile: str,
+    user_classes: list[str],
+    users: int,
+    spawn_rate: float,
+    run_time: int,
+    host: str,
+    env: dict | None = None,
+    extra_args: Sequence[str] = (),
+    sample_interval: float = 0.5,
+) -> LocustRun:
+    """Runs Locust headlessly in a subprocess from the source directory and returns its statistics.
+    The CPU usage is measured from when all users have been spawned until the end of the run.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_prefix = os.path.join(tmp_dir, "run")
+        command = [
+            sys.executable,
+            "-m",
+            "locust",
+            "--headless",
+            "--only-summary",
+            "-f",
+            locustfile,
+            "--host",
+            host,
+            "--users",
+            str(users),
+            "--spawn-rate",
+            str(spawn_rate),
+            "--run-time",
+            f"{run_time}s",
+            "--csv",
+            csv_prefix,
+            "--json-file",
+            csv_prefix,
+            "--exit-code-on-error",
+            "0",
+            "--loglevel",
+            "WARNING",
+            *extra_args,
+            *user_classes,
+        ]
+        logger.debug("Running %s", " ".join(command))
+
+        with open(os.path.join(tmp_dir, "locust.log"), "wb") as log_file:
+            process = subprocess.Popen(
+                command,
+                cwd=SOURCE_DIR,
+                env={**os.environ, **(env or {})},
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+            ramp_up = LOCUST_STARTUP_TIME + users / spawn_rate
+            cpu_percent, max_rss = _sample_process(process, ramp_up, sample_interval)
+            returncode = process.wait()
+
+        endpoints, aggregated = [], None
+        stats_path = f"{csv_prefix}_stats.csv"
+        if os.path.exists(stats_path):
+            with open(stats_path, newline="") as f:
+                for row in csv.DictReader(f):
+                    if row["Name"] == "Aggregated":
+                        aggregated = EndpointStats.from_csv_row(row)
+                    else:
+                        endpoints.append(EndpointStats.from_csv_row(row))
+        else:
+            with open(os.path.join(tmp_dir, "locust.log"), errors="replace") as f:
+                logger.error("Locust did not write any statistics. Output:\n%s", f.read()[-4000:])
+        json_path = f"{csv_prefix}.json"
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                response_times = {
+                    (entry["method"], entry["name"]): {
+                        int(key): count for key, count in entry["response_times"].items()
+                    }
+                    for entry in json.load(f)
+                }
+            for endpoint in endpoints:
+                endpoint.response_times = response_times.get((endpoint.method, endpoint.name), {})
+
+    return LocustRun(users, run_time, returncode, aggregated, endpoints, cpu_percent, max_rss)
+
+
+def _sample_process(process: subprocess.Popen, ramp_up: float, sample_interval: float):
+    """Samples the CPU time and memory of a running process until it exits.
+    Returns the CPU usage after the ramp up in percent of one core, and the max resident memory in bytes.
+    """
+    started = time.monotonic()
+    first = last = None
+    max_rss = 0
+    try:
+        ps_process = psutil.Process(process.pid)
+        while process.poll() is None:
+            with ps_process.oneshot():
+                cpu_times = ps_process.cpu_times()
+                max_rss = max(max_rss, ps_process.memory_info().rss)
+            sample = (time.monotonic(), cpu_times.user + cpu_times.system)
+            if sample[0] - started >= ramp_up:
+                first = first or sample
+                last = sample
+            time.sleep(sample_interval)
+    except psutil.NoSuchProcess:
+        pass
+
+    if first is None or last is None or last[0] <= first[0]:
+        return None, max_rss or None
+    return 100 * (last[1] - first[1]) / (last[0] - first[0]), max_rss
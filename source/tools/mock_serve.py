@@ -0,0 +1,594 @@
+"""
+A local stand-in for the SciLifeLab Serve web application, for running the test plans without network access.
+
+It implements the endpoints used by the user types in tests/base_user_types.py, with Django-like csrf cookies,
+sessions and redirects, configurable latency distributions and error injection. It is used to measure and
+regression test the load generator itself, for example the requests per second per Locust core.
+
+Run from the source directory:
+
+    python3 ./tools/mock_serve.py --port 8080
+
+Then run a test plan against it:
+
+    SERVE_LOCUST_TEST_USER_PASS=any SERVE_LOCUST_DO_CREATE_OBJECTS=True \
+        locust --headless -f ./tests/test_plan_normal.py --host http://localhost:8080 --users 10 --run-time 30s
+
+Latency distributions are given as KIND:PARAMS in milliseconds, for example:
+    constant:20, uniform:10,50, exponential:30, lognormal:40,0.5 (median, sigma), normal:50,10 (mean, sd)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import secrets
+import string
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, quote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+FORM_PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "jupyterlab_create_form.html")
+
+# The default latency of the endpoints in milliseconds, before any overrides from the command line.
+# Logging in is slow in Serve because of the password hashing.
+DEFAULT_LATENCY = "lognormal:20,0.5"
+DEFAULT_LATENCY_OVERRIDES = {
+    "login": "lognormal:250,0.3",
+    "signup": "lognormal:250,0.3",
+    "create-project": "lognormal:150,0.4",
+    "create-app": "lognormal:200,0.4",
+    # The static files are served by the ingress without the application
+    "static": "lognormal:2,0.3",
+}
+
+# The sizes in bytes of the static files linked from the pages, by file extension
+STATIC_FILE_SIZES = {".css": 160_000, ".js": 80_000, ".png": 12_000, ".ico": 4_000}
+# The default max-age in seconds of the Cache-Control header of the static files
+DEFAULT_STATIC_MAX_AGE = 60
+
+# The number of public apps listed by the OpenAPI
+PUBLIC_APP_COUNT = 50
+
+# The startup time of the ShinyProxy app pods in milliseconds
+DEFAULT_APP_STARTUP = "lognormal:3000,0.3"
+
+TEST_USER_PATTERN = re.compile(r"^locust_test_user_\d+@test\.uu\.net$")
+
+
+# Latency distributions
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Parses a latency distribution KIND:PARAMS and returns a function that samples a latency in seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",")] if params else []
+
+    if kind == "constant":
+        (ms,) = values
+        return lambda: ms / 1000
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high) / 1000
+    if kind == "exponential":
+        (mean,) = values
+        return lambda: random.expovariate(1 / mean) / 1000 if mean > 0 else 0
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: median * random.lognormvariate(0, sigma) / 1000
+    if kind == "normal":
+        mean, sd = values
+        return lambda: max(0.0, random.gauss(mean, sd)) / 1000
+
+    raise ValueError(f"Unknown latency distribution {spec}")
+
+
+# The mocked Serve application
+
+
+class MockServe:
+    """The state and configuration of the mocked Serve application, shared by all request handler threads."""
+
+    def __init__(
+        self,
+        latency: str,
+        latency_overrides: dict[str, str],
+        error_rate: float,
+        error_overrides: dict[str, float],
+        password,
+        app_startup: str,
+        static_max_age: int = DEFAULT_STATIC_MAX_AGE,
+    ):
+        self.default_latency = parse_latency(latency)
+        self.latency = {endpoint: parse_latency(spec) for endpoint, spec in latency_overrides.items()}
+        self.default_error_rate = error_rate
+        self.error_rates = error_overrides
+        self.password = password
+        self.app_startup = parse_latency(app_startup)
+        self.static_max_age = static_max_age
+
+        with open(FORM_PAGE_PATH, "rb") as f:
+            self.form_page = f.read()
+
+        self.lock = threading.Lock()
+        self.sessions: dict[str, str] = {}
+        self.projects: dict[str, str] = {}
+        # The ShinyProxy proxies by id, with the time when they are up
+        self.proxies: dict[str, dict] = {}
+        self.stats: defaultdict[str, dict] = defaultdict(lambda: {"requests": 0, "errors": 0, "server_time": 0.0})
+        self.started = time.time()
+
+    def sample_latency(self, endpoint: str) -> float:
+        return self.latency.get(endpoint, self.default_latency)()
+
+    def inject_error(self, endpoint: str) -> bool:
+        return random.random() < self.error_rates.get(endpoint, self.default_error_rate)
+
+    def record(self, endpoint: str, server_time: float, is_error: bool):
+        with self.lock:
+            stats = self.stats[endpoint]
+            stats["requests"] += 1
+            stats["errors"] += int(is_error)
+            stats["server_time"] += server_time
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            endpoints = {name: dict(values) for name, values in self.stats.items()}
+        return {
+            "uptime": time.time() - self.started,
+            "requests": sum(values["requests"] for values in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+            self.started = time.time()
+
+
+def page(title: str, body: str = "") -> bytes:
+    return (
+        f"<!DOCTYPE html><html><head><title>{title} | SciLifeLab Serve (beta)</title>"
+        '<link href="/static/css/bootstrap.min.css" rel="stylesheet"><link href="/static/favicon.ico" rel="icon">'
+        '<script src="/static/js/bootstrap.bundle.min.js"></script></head>'
+        f'<body><main><img src="/static/images/logo.png" alt="Serve"><h1>{title}</h1>{body}</main></body></html>'
+    ).encode()
+
+
+class MockServeHandler(BaseHTTPRequestHandler):
+    """Handles the requests to the mocked Serve endpoints."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MockServe/1.0"
+    app: MockServe
+
+    # Routes: (method, path pattern, endpoint name, handler method name)
+    routes = [
+        ("GET", r"/__mock__/stats", "mock-stats", "handle_mock_stats"),
+        ("POST", r"/__mock__/reset", "mock-reset", "handle_mock_reset"),
+        ("GET", r"/(home|about|apps|models|docs)/", "public-page", "handle_public_page"),
+        ("GET", r"/static/(?P<file>.+)", "static", "handle_static"),
+        ("GET", r"/signup/", "signup-page", "handle_form_page"),
+        ("POST", r"/signup/", "signup", "handle_signup"),
+        ("GET", r"/accounts/login/", "login-page", "handle_form_page"),
+        ("POST", r"/accounts/login/", "login", "handle_login"),
+        ("POST", r"/accounts/logout/", "logout", "handle_logout"),
+        ("GET", r"/projects/?", "projects", "handle_projects"),
+        ("GET", r"/projects/create/", "create-project-page", "handle_create_project_page"),
+        ("POST", r"/projects/create/", "create-project", "handle_create_project"),
+        ("GET", r"/projects/(?P<project>[^/]+)/", "project", "handle_project"),
+        ("GET", r"/projects/(?P<project>[^/]+)/delete/", "delete-project", "handle_delete_project"),
+        ("GET", r"/projects/(?P<project>[^/]+)/apps/create/jupyter-lab", "create-app-page", "handle_create_app_page"),
+        ("POST", r"/projects/(?P<project>[^/]+)/apps/create/jupyter-lab", "create-app", "handle_create_app"),
+        ("GET", r"/openapi/v1/api-info", "openapi", "handle_api_info"),
+        ("GET", r"/openapi/v1/system-version", "openapi", "handle_system_version"),
+        ("GET", r"/openapi/v1/public-apps", "openapi", "handle_public_apps"),
+        ("GET", r"/openapi/v1/public-apps/(?P<app_id>\d+)", "openapi", "handle_public_app"),
+        ("GET", r"/app/(?P<app>[^/]+)/?", "shinyproxy-app", "handle_shinyproxy_app"),
+        ("POST", r"/app_i/(?P<app>[^/]+)/(?P<instance>[^/]+)/", "shinyproxy-start", "handle_shinyproxy_start"),
+        ("GET", r"/api/proxy/(?P<proxy_id>[^/]+)/status", "shinyproxy-status", "handle_shinyproxy_status"),
+        ("PUT", r"/api/proxy/(?P<proxy_id>[^/]+)/status", "shinyproxy-stop", "handle_shinyproxy_stop"),
+        ("GET", r"/app_proxy/(?P<proxy_id>[^/]+)/", "shinyproxy-app-proxy", "handle_shinyproxy_app_proxy"),
+    ]
+    compiled_routes = [
+        (method, re.compile(pattern + "$"), endpoint, name) for method, pattern, endpoint, name in routes
+    ]
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    # Request handling
+
+    def dispatch(self, method: str):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        self.cookies = {key: morsel.value for key, morsel in SimpleCookie(self.headers.get("Cookie", "")).items()}
+        self.set_cookies: list[str] = []
+
+        # Always read the body, also of GET requests, to keep the connection usable
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode() if length else ""
+        self.form = {key: values[0] for key, values in parse_qs(body).items()}
+
+        for route_method, pattern, endpoint, handler_name in self.compiled_routes:
+            match = pattern.match(url.path)
+            if match and route_method == method:
+                break
+        else:
+            self.send_page(404, page("Page not found"))
+            self.app.record("not-found", time.perf_counter() - started, True)
+            return
+
+        if not endpoint.startswith("mock-"):
+            time.sleep(self.app.sample_latency(endpoint))
+            if self.app.inject_error(endpoint):
+                self.send_page(500, page("Server Error (500)"))
+                self.app.record(endpoint, time.perf_counter() - started, True)
+                return
+
+        getattr(self, handler_name)(**match.groupdict())
+        self.app.record(endpoint, time.perf_counter() - started, False)
+
+    def send_page(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        for cookie in self.set_cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status: int = 200):
+        self.send_page(status, json.dumps(data).encode(), "application/json")
+
+    def send_cacheable_json(self, data):
+        """Sends the JSON with an ETag of its content, or 304 Not Modified if the client has the same content."""
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_page(200, body, "application/json", headers=[("ETag", etag)])
+
+    def redirect(self, location: str):
+        self.send_page(302, b"", headers=[("Location", location)])
+
+    # Django-like csrf protection and sessions
+
+    def ensure_csrf_cookie(self) -> str:
+        csrftoken = self.cookies.get("csrftoken")
+        if not csrftoken:
+            csrftoken = self.rotate_csrf_cookie()
+        return csrftoken
+
+    def rotate_csrf_cookie(self) -> str:
+        csrftoken = secrets.token_hex(16)
+        self.cookies["csrftoken"] = csrftoken
+        self.set_cookies.append(f"csrftoken={csrftoken}; Path=/; SameSite=Lax")
+        return csrftoken
+
+    def csrf_is_valid(self) -> bool:
+        csrftoken = self.cookies.get("csrftoken")
+        return bool(csrftoken) and self.form.get("csrfmiddlewaretoken") == csrftoken
+
+    def csrf_failure(self):
+        self.send_page(403, page("Forbidden (403)", "<p>CSRF verification failed. Request aborted.</p>"))
+
+    def current_user(self) -> str | None:
+        with self.app.lock:
+            return self.app.sessions.get(self.cookies.get("sessionid", ""))
+
+    def login_required(self) -> bool:
+        """Redirects to the login page and returns False if the user is not logged in."""
+        if self.current_user():
+            return True
+        self.redirect(f"/accounts/login/?next={quote(self.path)}")
+        return False
+
+    # Endpoints
+
+    def handle_mock_stats(self):
+        self.send_json(self.app.get_stats())
+
+    def handle_mock_reset(self):
+        self.app.reset_stats()
+        self.send_json({"status": "reset"})
+
+    def handle_public_page(self):
+        self.send_page(200, page(self.path.strip("/").capitalize()))
+
+    def handle_static(self, file: str):
+        size = STATIC_FILE_SIZES.get(os.path.splitext(file)[1])
+        if size is None:
+            return self.send_page(404, page("Page not found"))
+        # The static files never change, so their ETag only depends on the file name
+        etag = f'"{hashlib.md5(file.encode()).hexdigest()}"'
+        headers = [("ETag", etag), ("Cache-Control", f"max-age={self.app.static_max_age}")]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        content_type = mimetypes.guess_type(file)[0] or "application/octet-stream"
+        self.send_page(200, b"x" * size, content_type, headers)
+
+    def handle_form_page(self):
+        self.ensure_csrf_cookie()
+        self.send_page(200, page("Form", '<form method="post"><input type="hidden" name="csrfmiddlewaretoken"></form>'))
+
+    def handle_signup(self):
+        if not self.csrf_is_valid():
+            return self.csrf_failure()
+        if not self.form.get("email") or self.form.get("password1") != self.form.get("password2"):
+            return self.send_page(200, page("Sign up", "<p>Please correct the errors below.</p>"))
+        self.redirect("/accounts/login/")
+
+    def handle_login(self):
+        if not self.csrf_is_valid():
+            return self.csrf_failure()
+
+        username = self.form.get("username", "")
+        password_ok = self.app.password is None or self.form.get("password") == self.app.password
+        if not TEST_USER_PATTERN.match(username) or not password_ok:
+            return self.send_page(200, page("Log in", "<p>Please enter a correct email and password.</p>"))
+
+        sessionid = secrets.token_hex(16)
+        with self.app.lock:
+            self.app.sessions[sessionid] = username
+        self.set_cookies.append(f"sessionid={sessionid}; Path=/; HttpOnly; SameSite=Lax")
+        # Django rotates the csrf token on login
+        self.rotate_csrf_cookie()
+        self.redirect(self.query.get("next", ["/projects/"])[0])
+
+    def handle_logout(self):
+        if not self.csrf_is_valid():
+            return self.csrf_failure()
+        with self.app.lock:
+            self.app.sessions.pop(self.cookies.get("sessionid", ""), None)
+        self.set_cookies.append("sessionid=; Path=/; Max-Age=0")
+        self.redirect("/home/")
+
+    def handle_projects(self):
+        if self.login_required():
+            self.send_page(200, page("My projects"))
+
+    def handle_create_project_page(self):
+        if self.login_required():
+            self.ensure_csrf_cookie()
+            self.send_page(200, page("Create project", '<form method="post"><input name="name"></form>'))
+
+    def handle_create_project(self):
+        if not self.login_required():
+            return
+        if not self.csrf_is_valid():
+            return self.csrf_failure()
+        name = self.form.get("name")
+        if not name:
+            return self.send_page(200, page("Create project", "<p>This field is required.</p>"))
+        # Serve appends a short random suffix to the project slug
+        slug = f"{name}-{''.join(random.choices(string.ascii_lowercase, k=3))}"
+        user = self.current_user()
+        with self.app.lock:
+            self.app.projects[slug] = user
+        self.redirect(f"/projects/{slug}/")
+
+    def project_exists(self, project: str) -> bool:
+        with self.app.lock:
+            return project in self.app.projects
+
+    def handle_project(self, project: str):
+        if not self.login_required():
+            return
+        if not self.project_exists(project):
+            return self.send_page(404, page("Page not found"))
+        self.ensure_csrf_cookie()
+        self.send_page(200, page(f"Project {project}"))
+
+    def handle_delete_project(self, project: str):
+        if not self.login_required():
+            return
+        with self.app.lock:
+            self.app.projects.pop(project, None)
+        self.redirect("/projects/")
+
+    def handle_create_app_page(self, project: str):
+        if not self.login_required():
+            return
+        self.ensure_csrf_cookie()
+        self.send_page(200, self.app.form_page)
+
+    def handle_create_app(self, project: str):
+        if not self.login_required():
+            return
+        if not self.csrf_is_valid():
+            return self.csrf_failure()
+        if not all(self.form.get(field) for field in ("name", "flavor", "environment")):
+            # An incomplete submission returns the form with the errors, as Serve does
+            return self.send_page(200, self.app.form_page)
+        self.redirect(f"/projects/{project}/")
+
+    def handle_api_info(self):
+        self.send_json({"apiName": "SciLifeLab Serve OpenAPI", "apiVersion": "1.0.0", "apiBuildDate": "2024-10-01"})
+
+    def handle_system_version(self):
+        self.send_json({"system-version": "mock", "build-date": "2024-10-01", "image-tag": "mock"})
+
+    def handle_public_apps(self):
+        self.send_cacheable_json({"data": [self.public_app(i) for i in range(1, PUBLIC_APP_COUNT + 1)]})
+
+    def handle_public_app(self, app_id: str):
+        if not 1 <= int(app_id) <= PUBLIC_APP_COUNT:
+            return self.send_json({"error": "Not found"}, 404)
+        self.send_cacheable_json({"app": self.public_app(int(app_id))})
+
+    @staticmethod
+    def public_app(i: int) -> dict:
+        return {
+            "id": i,
+            "name": f"Mock public app {i}",
+            "app_id": i,
+            "url": f"https://mock-app-{i}.serve.scilifelab.se",
+            "description": "A public app of the mocked Serve.",
+            "created_on": "2024-10-01T12:00:00Z",
+            "updated_on": "2024-10-01T12:00:00Z",
+            "access": "public",
+        }
+
+    # A ShinyProxy 3 server, where the app pods start after a delay sampled from the app startup distribution
+
+    def handle_shinyproxy_app(self, app: str):
+        csrf_meta = '<meta name="_csrf" content="mock-csrf-token"><meta name="_csrf_header" content="X-CSRF-TOKEN">'
+        body = f'{csrf_meta}<div id="loading">Starting {app}</div><iframe id="shinyframe"></iframe>'
+        self.send_page(200, page(f"ShinyProxy app {app}", body))
+
+    def handle_shinyproxy_start(self, app: str, instance: str):
+        if self.headers.get("X-CSRF-TOKEN") != "mock-csrf-token":
+            return self.send_json({"status": "fail", "data": "Invalid CSRF token"}, 403)
+        proxy: dict = {"id": secrets.token_hex(8), "app": app, "up_at": time.time() + self.app.app_startup()}
+        with self.app.lock:
+            self.app.proxies[proxy["id"]] = proxy
+        self.send_json({"status": "success", "data": self.proxy_state(proxy)})
+
+    def handle_shinyproxy_status(self, proxy_id: str):
+        with self.app.lock:
+            proxy = self.app.proxies.get(proxy_id)
+        if proxy is None:
+            return self.send_json({"status": "fail", "data": "Proxy not found"}, 404)
+        if self.query.get("watch") == ["true"]:
+            # Long polling: respond when the proxy is up, or at the timeout
+            timeout = float(self.query.get("timeout", ["10"])[0])
+            time.sleep(max(0.0, min(proxy["up_at"] - time.time(), timeout)))
+        self.send_json({"status": "success", "data": self.proxy_state(proxy)})
+
+    def handle_shinyproxy_stop(self, proxy_id: str):
+        with self.app.lock:
+            proxy = self.app.proxies.pop(proxy_id, None)
+        if proxy is None:
+            return self.send_json({"status": "fail", "data": "Proxy not found"}, 404)
+        self.send_json({"status": "success", "data": None})
+
+    def handle_shinyproxy_app_proxy(self, proxy_id: str):
+        with self.app.lock:
+            proxy = self.app.proxies.get(proxy_id)
+        if proxy is None or time.time() < proxy["up_at"]:
+            return self.send_page(503, page("Service Unavailable"))
+        self.send_page(200, page(f"Shiny app {proxy['app']}", '<div class="shiny-bound-output"></div>'))
+
+    @staticmethod
+    def proxy_state(proxy: dict) -> dict:
+        status = "Up" if time.time() >= proxy["up_at"] else "New"
+        return {"id": proxy["id"], "specId": proxy["app"], "status": status}
+
+
+class MockServeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes the kernel drop connections when many users connect at once,
+    # which shows up as one second connect latencies from the SYN retries
+    request_queue_size = 1024
+
+
+def parse_overrides(values: list[str], convert) -> dict:
+    """Parses a list of ENDPOINT=VALUE overrides."""
+    overrides = {}
+    for value in values:
+        endpoint, _, setting = value.partition("=")
+        overrides[endpoint] = convert(setting)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="The interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="The port to listen on")
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="The default latency distribution")
+    parser.add_argument(
+        "--latency-for",
+        action="append",
+        default=[],
+        metavar="ENDPOINT=DISTRIBUTION",
+        help="The latency distribution of an endpoint, such as login=constant:300. Can be repeated.",
+    )
+    parser.add_argument("--no-latency", action="store_true", help="Respond without any added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="The fraction of requests that fail with 500")
+    parser.add_argument(
+        "--error-rate-for",
+        action="append",
+        default=[],
+        metavar="ENDPOINT=RATE",
+        help="The error rate of an endpoint, such as create-app=0.1. Can be repeated.",
+    )
+    parser.add_argument("--password", default=None, help="The password of the test users. Default: any password")
+    parser.add_argument(
+        "--app-startup",
+        default=DEFAULT_APP_STARTUP,
+        metavar="DISTRIBUTION",
+        help=f"The distribution of the startup time of the ShinyProxy app pods. Default: {DEFAULT_APP_STARTUP}",
+    )
+    parser.add_argument(
+        "--static-max-age",
+        type=int,
+        default=DEFAULT_STATIC_MAX_AGE,
+        help=f"The max-age in seconds of the static files. Default: {DEFAULT_STATIC_MAX_AGE}",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random latencies and errors")
+    parser.add_argument("--loglevel", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if args.no_latency:
+        latency, latency_overrides = "constant:0", {}
+    else:
+        latency = args.latency
+        latency_overrides = {**DEFAULT_LATENCY_OVERRIDES, **parse_overrides(args.latency_for, str)}
+
+    MockServeHandler.app = MockServe(
+        latency,
+        latency_overrides,
+        args.error_rate,
+        parse_overrides(args.error_rate_for, float),
+        args.password,
+        args.app_startup,
+        args.static_max_age,
+    )
+
+    server = MockServeServer((args.host, args.port), MockServeHandler)
+    logger.info("Mock Serve listening on http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
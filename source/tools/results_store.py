@@ -0,0 +1,355 @@
+"""
+A local file based store of the results of the Locust runs, and a comparison of the results of two runs.
+
+Locust overwrites the CSV files of the previous run in ./stats, as configured in locust.conf.
+The ingest command copies the statistics and the time series of each request name of a run into a SQLite database,
+tagged with the git commit, test plan, host and user count, so that the history of the runs is kept.
+The compare command compares the response time percentiles per request name of two runs,
+and flags the p50, p95 and p99 regressions. It exits with status 1 if there are any regressions.
+
+Run from the source directory after a Locust run:
+
+    python3 ./tools/results_store.py ingest --test-plan normal --host https://serve-dev.scilifelab.se
+    python3 ./tools/results_store.py list
+    python3 ./tools/results_store.py compare          # The previous run against the latest run
+    python3 ./tools/results_store.py compare 3 7 --threshold 0.2
+
+The database is SERVE_LOCUST_RESULTS_DB, by default ./stats/locust-results.sqlite.
+Keep it on a persistent volume to keep the history when the pod restarts.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from locust_runs import SOURCE_DIR, EndpointStats, to_number
+
+logger = logging.getLogger(__name__)
+
+
+SERVE_LOCUST_RESULTS_DB = os.environ.get("SERVE_LOCUST_RESULTS_DB", "./stats/locust-results.sqlite")
+
+# The percentiles that are compared between runs, by column name
+COMPARED_PERCENTILES = ("p50", "p95", "p99")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    git_commit TEXT,
+    test_plan TEXT,
+    host TEXT,
+    users INTEGER,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS endpoint_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    method TEXT NOT NULL,
+    name TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    rps REAL,
+    avg REAL,
+    p50 REAL,
+    p95 REAL,
+    p99 REAL,
+    max REAL,
+    PRIMARY KEY (run_id, method, name)
+);
+CREATE TABLE IF NOT EXISTS endpoint_history (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    user_count INTEGER,
+    method TEXT NOT NULL,
+    name TEXT NOT NULL,
+    rps REAL,
+    failures_per_s REAL,
+    p50 REAL,
+    p95 REAL,
+    p99 REAL,
+    total_requests INTEGER,
+    total_failures INTEGER
+);
+CREATE INDEX IF NOT EXISTS endpoint_history_run ON endpoint_history (run_id, method, name, timestamp);
+"""
+
+
+def connect(path: str = SERVE_LOCUST_RESULTS_DB) -> sqlite3.Connection:
+    """Opens the results database, and creates its tables if it is new."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def get_git_commit() -> str | None:
+    """Returns the git commit of the test plans, from SERVE_LOCUST_GIT_COMMIT or from the git repository."""
+    if commit := os.environ.get("SERVE_LOCUST_GIT_COMMIT"):
+        return commit
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SOURCE_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        # The container image does not include the git repository
+        return None
+    return result.stdout.strip()
+
+
+# Ingest
+
+
+def read_history(path: str) -> list[dict]:
+    """Reads the time series of the _stats_history.csv file.
+    The file has rows per request name only when Locust runs with --csv-full-history, as in locust.conf.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        return [
+            {
+                "timestamp": int(row["Timestamp"]),
+                "user_count": int(row["User Count"]),
+                "method": row["Type"],
+                "name": row["Name"],
+                "rps": to_number(row["Requests/s"]),
+                "failures_per_s": to_number(row["Failures/s"]),
+                "p50": to_number(row["50%"]),
+                "p95": to_number(row["95%"]),
+                "p99": to_number(row["99%"]),
+                "total_requests": int(row["Total Request Count"]),
+                "total_failures": int(row["Total Failure Count"]),
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def ingest(
+    connection: sqlite3.Connection,
+    csv_prefix: str,
+    test_plan: str | None,
+    host: str | None,
+    users: int | None = None,
+    label: str | None = None,
+) -> int:
+    """Stores the results of the Locust CSV files with the prefix, such as ./stats/locust, and returns the run id."""
+    stats_path = f"{csv_prefix}_stats.csv"
+    with open(stats_path, newline="") as f:
+        endpoints = [EndpointStats.from_csv_row(row) for row in csv.DictReader(f)]
+    history = read_history(f"{csv_prefix}_stats_history.csv")
+
+    if history:
+        started_at = datetime.fromtimestamp(history[0]["timestamp"], timezone.utc)
+        users = users if users is not None else max(row["user_count"] for row in history)
+    else:
+        started_at = datetime.fromtimestamp(os.path.getmtime(stats_path), timezone.utc)
+
+    with connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (started_at, ingested_at, git_commit, test_plan, host, users, label) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                started_at.isoformat(timespec="seconds"),
+                datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                get_git_commit(),
+                test_plan,
+                host,
+                users,
+                label,
+            ),
+        )
+        run_id = cursor.lastrowid
+        if run_id is None:
+            raise Exception("The run could not be stored")
+        connection.executemany(
+            "INSERT INTO endpoint_stats (run_id, method, name, requests, failures, rps, avg, p50, p95, p99, max) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, e.method, e.name, e.requests, e.failures, e.rps, e.avg, e.p50, e.p95, e.p99, e.max)
+                for e in endpoints
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO endpoint_history (run_id, timestamp, user_count, method, name, rps, failures_per_s, "
+            "p50, p95, p99, total_requests, total_failures) "
+            "VALUES (:run_id, :timestamp, :user_count, :method, :name, :rps, :failures_per_s, "
+            ":p50, :p95, :p99, :total_requests, :total_failures)",
+            [{"run_id": run_id, **row} for row in history],
+        )
+
+    logger.info("Stored run %s with %s request names and %s history rows", run_id, len(endpoints), len(history))
+    return run_id
+
+
+# Compare
+
+
+@dataclass
+class Regression:
+    method: str
+    name: str
+    percentile: str
+    base: float
+    candidate: float
+
+    @property
+    def change(self) -> float:
+        return self.candidate / self.base - 1 if self.base else float("inf")
+
+
+def resolve_run_id(connection: sqlite3.Connection, run: int) -> int:
+    """Returns the id of a run given as an id, or as a negative index where -1 is the latest run."""
+    if run > 0:
+        if connection.execute("SELECT 1 FROM runs WHERE id = ?", (run,)).fetchone() is None:
+            raise ValueError(f"There is no run {run}")
+        return run
+    row = connection.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (-run - 1,)).fetchone()
+    if row is None:
+        raise ValueError(f"There is no run {run}")
+    return int(row["id"])
+
+
+def get_endpoint_stats(connection: sqlite3.Connection, run_id: int) -> dict[tuple[str, str], sqlite3.Row]:
+    rows = connection.execute("SELECT * FROM endpoint_stats WHERE run_id = ?", (run_id,))
+    return {(row["method"], row["name"]): row for row in rows}
+
+
+def compare_runs(
+    connection: sqlite3.Connection,
+    base_id: int,
+    candidate_id: int,
+    threshold: float,
+    min_delta_ms: float,
+    min_requests: int,
+) -> tuple[list[tuple], list[Regression]]:
+    """Compares the percentiles per request name of two runs.
+    A percentile has regressed if it has increased by more than the threshold ratio and by at least min_delta_ms,
+    so that small absolute changes of fast requests are not flagged.
+    Request names with fewer than min_requests requests in either run are not compared.
+    Returns the rows of the comparison table and the regressions.
+    """
+    base = get_endpoint_stats(connection, base_id)
+    candidate = get_endpoint_stats(connection, candidate_id)
+
+    table, regressions = [], []
+    for key in sorted(base.keys() & candidate.keys(), key=lambda key: (key[1] == "Aggregated", key[1], key[0])):
+        before, after = base[key], candidate[key]
+        if before["requests"] < min_requests or after["requests"] < min_requests:
+            continue
+        row = [key[0], key[1]]
+        for percentile in COMPARED_PERCENTILES:
+            row += [before[percentile], after[percentile]]
+            if before[percentile] is None or after[percentile] is None:
+                continue
+            if (
+                after[percentile] > before[percentile] * (1 + threshold)
+                and after[percentile] - before[percentile] >= min_delta_ms
+            ):
+                regressions.append(Regression(key[0], key[1], percentile, before[percentile], after[percentile]))
+        row += [before["failures"] / before["requests"], after["failures"] / after["requests"]]
+        table.append(tuple(row))
+
+    for method, name in sorted(base.keys() ^ candidate.keys()):
+        logger.info(
+            "The request %s %s is only in run %s", method, name, base_id if (method, name) in base else candidate_id
+        )
+
+    return table, regressions
+
+
+def format_ms(value: float | None) -> str:
+    return "N/A" if value is None else f"{value:.0f}"
+
+
+def print_comparison(table: list[tuple], regressions: list[Regression]):
+    regressed = {(r.method, r.name, r.percentile) for r in regressions}
+    print(
+        f"{'Type':<8} {'Name':<50} " + " ".join(f"{p + ' ms':>16}" for p in COMPARED_PERCENTILES) + f" {'failures':>15}"
+    )
+    for method, name, *values in table:
+        cells = []
+        for i, percentile in enumerate(COMPARED_PERCENTILES):
+            marker = "!" if (method, name, percentile) in regressed else " "
+            cells.append(f"{format_ms(values[2 * i]):>7} -> {format_ms(values[2 * i + 1]):>5}{marker}")
+        failures = f"{values[-2]:>6.1%} -> {values[-1]:>5.1%}"
+        print(f"{method:<8} {name[:50]:<50} " + " ".join(cells) + f" {failures:>15}")
+
+    print()
+    if not regressions:
+        print("No regressions")
+    for r in regressions:
+        request = f"{r.method} {r.name}".strip()
+        print(f"REGRESSION {request} {r.percentile}: {r.base:.0f} ms -> {r.candidate:.0f} ms ({r.change:+.0%})")
+
+
+def print_runs(connection: sqlite3.Connection, limit: int):
+    rows = connection.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    print(f"{'Id':>5}  {'Started':<25} {'Commit':<10} {'Test plan':<20} {'Users':>6}  {'Host':<45} Label")
+    for row in reversed(rows):
+        print(
+            f"{row['id']:>5}  {row['started_at']:<25} {row['git_commit'] or '':<10} {row['test_plan'] or '':<20} "
+            f"{row['users'] if row['users'] is not None else '':>6}  {row['host'] or '':<45} {row['label'] or ''}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SERVE_LOCUST_RESULTS_DB, help="The SQLite database file")
+    parser.add_argument("--loglevel", default="INFO")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Store the results of a Locust run")
+    ingest_parser.add_argument("--csv-prefix", default="./stats/locust", help="The --csv prefix of the Locust run")
+    ingest_parser.add_argument("--test-plan", help="The test plan, such as normal or classroom")
+    ingest_parser.add_argument("--host", default=os.environ.get("LOCUST_HOST"), help="The host of the Serve instance")
+    ingest_parser.add_argument("--users", type=int, help="Default: the max user count of the run")
+    ingest_parser.add_argument("--label", help="A free text label of the run")
+
+    list_parser = subparsers.add_parser("list", help="List the stored runs")
+    list_parser.add_argument("--limit", type=int, default=20)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare the percentiles of two runs")
+    compare_parser.add_argument("base", type=int, nargs="?", default=-2, help="Run id, or -1 for the latest run")
+    compare_parser.add_argument("candidate", type=int, nargs="?", default=-1, help="Run id, or -1 for the latest run")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="The max allowed relative increase")
+    compare_parser.add_argument("--min-delta", type=float, default=5, help="The min increase in ms that is flagged")
+    compare_parser.add_argument("--min-requests", type=int, default=10, help="The min requests per name to compare")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=args.loglevel, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+
+    connection = connect(args.db)
+    try:
+        if args.command == "ingest":
+            run_id = ingest(connection, args.csv_prefix, args.test_plan, args.host, args.users, args.label)
+            print(f"Stored the results as run {run_id} in {args.db}")
+        elif args.command == "list":
+            print_runs(connection, args.limit)
+        else:
+            try:
+                base_id = resolve_run_id(connection, args.base)
+                candidate_id = resolve_run_id(connection, args.candidate)
+            except ValueError as ex:
+                parser.error(str(ex))
+            print(f"Comparing run {base_id} with run {candidate_id}")
+            table, regressions = compare_runs(
+                connection, base_id, candidate_id, args.threshold, args.min_delta, args.min_requests
+            )
+            print_comparison(table, regressions)
+            if regressions:
+                sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Automatic search of the max number of users of a test plan that Serve sustains within the SLOs.
+
+Runs the test plan headlessly at increasing user counts, multiplying the users by --step-factor after each run,
+and checks the SLOs of each run: the p95 response time and the error rate of all HTTP requests, and with
+--per-endpoint also of each request name. The custom request types of the test plans, such as TTLB or PHASE,
+are not HTTP requests and are not part of the SLOs of all requests. When a run breaks an SLO, the user count is
+bisected between the highest passing and the lowest failing user count, until they are within --precision of
+each other.
+
+The step up also stops early at the knee of the throughput, when adding users no longer adds requests per second:
+the relative increase of the requests per second is below --knee-efficiency times the relative increase of the
+users. Serve is then saturated, and more users only queue up, so the capacity is the last user count before
+the knee. The requests per second of a single run are noisy, so a knee is only accepted when both user counts
+have been measured another --knee-confirmations times, and the mean requests per second of their runs still show
+the knee. A rerun that breaks an SLO is bisected as any other failing run.
+
+The result is a capacity report, written as JSON: the max sustainable user count, the statistics of each run,
+and per request name the highest user count at which it met the SLOs and the lowest at which it did not,
+which tells the endpoints that saturate first. Track the max sustainable user count per Serve release.
+
+Run from the source directory:
+
+    python3 ./tools/saturation_search.py --host https://serve-staging.serve-dev.scilifelab.se --p95-slo 2000
+    python3 ./tools/saturation_search.py --locustfile ./tests/test_plan_api.py --start-users 20 --max-users 2000
+    python3 ./tools/saturation_search.py --mock VisitingNormalUser OpenAPIClientNormalUser
+
+The env vars of the test plans, such as SERVE_LOCUST_TEST_USER_PASS, are passed on to Locust.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+from datetime import datetime, timezone
+
+from locust_runs import EndpointStats, LocustRun, mock_serve, run_locust
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from env_vars import get_env_bool  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+# A Locust process above this CPU percent is saturated itself, and limits the load on Serve
+LOCUST_CPU_WARNING_PERCENT = 90
+
+
+def check_slos(args, stats: EndpointStats | None) -> list[str]:
+    """Returns the SLO violations of the statistics of a request name or of all requests."""
+    if stats is None or not stats.requests:
+        return ["no requests"]
+    violations = []
+    if stats.p95 is not None and stats.p95 > args.p95_slo:
+        violations.append(f"p95 {stats.p95:.0f} ms > {args.p95_slo:.0f} ms")
+    if stats.failure_ratio > args.error_rate_slo:
+        violations.append(f"error rate {stats.failure_ratio:.2%} > {args.error_rate_slo:.2%}")
+    return violations
+
+
+def check_endpoints(args, run: LocustRun) -> dict[str, list[str]]:
+    """Returns the SLO violations by HTTP request name, of the request names with at least --min-requests requests."""
+    return {
+        f"{endpoint.method} {endpoint.name}": violations
+        for endpoint in run.http_endpoints
+        if endpoint.requests >= args.min_requests and (violations := check_slos(args, endpoint))
+    }
+
+
+def measure(args, users: int, host: str) -> dict:
+    """Runs the test plan with the user count and returns the result of the run."""
+    run = run_locust(
+        args.locustfile,
+        args.user_classes,
+        users=users,
+        spawn_rate=args.spawn_rate or users,
+        run_time=args.run_time,
+        host=host,
+        env=args.env,
+        extra_args=args.locust_args,
+    )
+    stats = run.http_aggregated
+    violations = check_slos(args, stats)
+    endpoint_violations = check_endpoints(args, run)
+    if args.per_endpoint:
+        violations += [f"{name}: {', '.join(errors)}" for name, errors in endpoint_violations.items()]
+
+    result = {
+        "users": users,
+        "passed": not violations,
+        "violations": violations,
+        "requests": stats.requests if stats else 0,
+        "failures": stats.failures if stats else 0,
+        # Over the whole run time, as in benchmark_user_types.py
+        "rps": round(stats.requests / args.run_time, 2) if stats else 0.0,
+        "p50_ms": stats.p50 if stats else None,
+        "p95_ms": stats.p95 if stats else None,
+        "p99_ms": stats.p99 if stats else None,
+        "locust_cpu_percent": round(run.cpu_percent, 1) if run.cpu_percent is not None else None,
+        "endpoints": [
+            {
+                "name": f"{endpoint.method} {endpoint.name}",
+                "requests": endpoint.requests,
+                "error_rate": round(endpoint.failure_ratio, 4),
+                "rps": round(endpoint.requests / args.run_time, 2),
+                "p50_ms": endpoint.p50,
+                "p95_ms": endpoint.p95,
+                "p99_ms": endpoint.p99,
+                "passed": f"{endpoint.method} {endpoint.name}" not in endpoint_violations,
+            }
+            for endpoint in run.http_endpoints
+            if endpoint.requests >= args.min_requests
+        ],
+    }
+    logger.info(
+        "%s users: %s, %s rps, p95 %s ms, %s failures%s",
+        users,
+        "passed" if result["passed"] else "failed",
+        result["rps"],
+        result["p95_ms"],
+        result["failures"],
+        f" ({'; '.join(violations)})" if violations else "",
+    )
+    if run.cpu_percent is not None and run.cpu_percent > LOCUST_CPU_WARNING_PERCENT:
+        logger.warning(
+            "The Locust process used %.0f%% CPU at %s users and limits the load. Use more --processes.",
+            run.cpu_percent,
+            users,
+        )
+    return result
+
+
+def is_knee(args, previous: dict, current: dict) -> bool:
+    """Returns whether the requests per second stopped scaling with the users between two passing runs."""
+    if not previous["rps"]:
+        return False
+    user_increase = current["users"] / previous["users"] - 1
+    rps_increase = current["rps"] / previous["rps"] - 1
+    return bool(rps_increase < args.knee_efficiency * user_increase)
+
+
+def get_mean_rps(results: list[dict], users: int) -> dict:
+    """Returns the user count with the mean requests per second of its runs."""
+    return {"users": users, "rps": statistics.fmean(result["rps"] for result in results if result["users"] == users)}
+
+
+def search(args, host: str) -> dict:
+    """Steps up the users until an SLO is broken, the knee is reached or --max-users, and then bisects."""
+    results: list[dict] = []
+    # The highest passing and the lowest failing user count. 0 users pass by definition.
+    passing, failing = 0, None
+    knee = None
+
+    users = args.start_users
+    previous = None
+    while len(results) < args.max_runs:
+        result = measure(args, users, host)
+        results.append(result)
+        if not result["passed"]:
+            failing = users
+            break
+        if previous is not None and is_knee(args, previous, result):
+            logger.info("The requests per second may have stopped scaling at %s users. Measuring again.", users)
+            reruns = [
+                measure(args, run_users, host)
+                for _ in range(args.knee_confirmations)
+                for run_users in (previous["users"], users)
+            ]
+            results.extend(reruns)
+            failed = [rerun["users"] for rerun in reruns if not rerun["passed"]]
+            if failed:
+                failing = min(failed)
+                # The user counts below the previous one only have passing runs
+                passing = max((run["users"] for run in results if run["users"] < failing), default=0)
+                break
+            previous, result = get_mean_rps(results, previous["users"]), get_mean_rps(results, users)
+            if is_knee(args, previous, result):
+                knee = users
+                passing = previous["users"]
+                logger.info("The requests per second stopped scaling at %s users", users)
+                break
+            logger.info("The requests per second still scale at %s users, %s rps", users, result["rps"])
+        passing = users
+        previous = result
+        if users >= args.max_users:
+            break
+        users = min(args.max_users, max(users + 1, math.ceil(users * args.step_factor)))
+
+    while failing is not None and knee is None and len(results) < args.max_runs:
+        if failing - passing <= max(1, args.precision * passing):
+            break
+        users = (passing + failing) // 2
+        result = measure(args, users, host)
+        results.append(result)
+        if result["passed"]:
+            passing = users
+        else:
+            failing = users
+
+    if len(results) >= args.max_runs:
+        logger.warning("Stopped the search after --max-runs %s runs", args.max_runs)
+    return {
+        "max_sustainable_users": passing or None,
+        "lowest_failing_users": failing,
+        "knee_users": knee,
+        "reached_max_users": failing is None and knee is None and passing >= args.max_users,
+        "endpoints": summarize_endpoints(results),
+        "runs": results,
+    }
+
+
+def summarize_endpoints(results: list[dict]) -> dict[str, dict]:
+    """Returns per request name the lowest user count at which it broke the SLOs, and the highest user count
+    below that at which it met them, with its p95 response time at each user count.
+    """
+    endpoints: dict[str, dict] = {}
+    for result in sorted(results, key=lambda result: result["users"]):
+        for endpoint in result["endpoints"]:
+            summary = endpoints.setdefault(
+                endpoint["name"], {"max_passing_users": None, "min_failing_users": None, "p95_ms_by_users": {}}
+            )
+            summary["p95_ms_by_users"][result["users"]] = endpoint["p95_ms"]
+            if summary["min_failing_users"] is not None:
+                continue
+            if endpoint["passed"]:
+                summary["max_passing_users"] = result["users"]
+            else:
+                summary["min_failing_users"] = result["users"]
+    return endpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("user_classes", nargs="*", help="The user classes to run. Default: all of the locustfile")
+    parser.add_argument("--locustfile", default="./tests/test_plan_normal.py", help="The test plan")
+    parser.add_argument("--host", default=os.environ.get("LOCUST_HOST"), help="The host of the Serve instance")
+    parser.add_argument("--mock", action="store_true", help="Run against the local mock of Serve instead of --host")
+    parser.add_argument("--port", type=int, default=8091, help="The port of the mock server")
+    parser.add_argument("--mock-latency", default="lognormal:40,0.5", help="The latency distribution of the mock")
+    parser.add_argument("--start-users", type=int, default=10)
+    parser.add_argument("--max-users", type=int, default=1000)
+    parser.add_argument("--step-factor", type=float, default=2, help="The factor of the users between the steps")
+    parser.add_argument("--spawn-rate", type=float, default=None, help="Default: all users at once")
+    parser.add_argument("--run-time", type=int, default=60, help="The run time in seconds of each user count")
+    parser.add_argument("--processes", type=int, default=1, help="The number of Locust processes of each run")
+    parser.add_argument("--p95-slo", type=float, default=1000, help="The max p95 response time in ms")
+    parser.add_argument("--error-rate-slo", type=float, default=0.01, help="The max ratio of failed requests")
+    parser.add_argument("--per-endpoint", action="store_true", help="Also apply the SLOs to each request name")
+    parser.add_argument("--min-requests", type=int, default=20, help="The min requests of a request name to judge")
+    parser.add_argument(
+        "--knee-efficiency",
+        type=float,
+        default=0.5,
+        help="The min relative increase of the requests per second per relative increase of the users",
+    )
+    parser.add_argument(
+        "--knee-confirmations",
+        type=int,
+        default=1,
+        help="The number of times that both user counts of a knee are measured again before it is accepted",
+    )
+    parser.add_argument(
+        "--precision", type=float, default=0.1, help="The relative precision of the max sustainable users"
+    )
+    parser.add_argument("--max-runs", type=int, default=12, help="The max number of runs of the search")
+    parser.add_argument("--output", default="./reports/saturation-search.json", help="The JSON capacity report")
+    parser.add_argument("--loglevel", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel, format="[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+    if not args.mock and not args.host:
+        parser.error("Set --host or LOCUST_HOST, or use --mock")
+    args.locust_args = ["--processes", str(args.processes)] if args.processes > 1 else []
+    args.env = {}
+
+    if args.mock:
+        # The mock server accepts any password, and the power users need one
+        args.env["SERVE_LOCUST_TEST_USER_PASS"] = os.environ.get("SERVE_LOCUST_TEST_USER_PASS", "saturation")
+        with mock_serve(args.port, ["--latency", args.mock_latency]) as (host, _):
+            report = search(args, host)
+    else:
+        host = args.host
+        report = search(args, host)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "locustfile": args.locustfile,
+        "user_classes": args.user_classes,
+        "host": host,
+        "fast_http_client": get_env_bool("SERVE_LOCUST_USE_FAST_HTTP_CLIENT"),
+        "run_time": args.run_time,
+        "slos": {"p95_ms": args.p95_slo, "error_rate": args.error_rate_slo, "per_endpoint": args.per_endpoint},
+        **report,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Max sustainable users: {report['max_sustainable_users']}")
+    if report["knee_users"]:
+        print(f"The requests per second stopped scaling at {report['knee_users']} users")
+    if report["reached_max_users"]:
+        print(f"All SLOs were met up to --max-users {args.max_users}")
+    for name, summary in sorted(report["endpoints"].items(), key=lambda item: item[1]["min_failing_users"] or math.inf):
+        failed = f", failed at {summary['min_failing_users']} users" if summary["min_failing_users"] else ""
+        print(f"{name}: met the SLOs up to {summary['max_passing_users'] or 0} users{failed}")
+    print(f"Wrote the capacity report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Unit tests of fit_workload_model.py. Run from the source directory:
+
+    python3 -m pytest ./tools
+"""
+
+from fit_workload_model import WorkloadFitter
+
+# A request of the access log, in the nginx combined log format
+LOG_LINE = '{client} - - [18/Oct/2026:10:00:{second:02d} +0000] "GET {path} HTTP/1.1" 200 100 "-" "{user_agent}"'
+BROWSER = {"client": "1.2.3.4", "user_agent": "browser"}
+API_CLIENT = {"client": "5.6.7.8", "user_agent": "python-requests"}
+
+
+def fit_log(tmp_path, lines: list[str]) -> dict:
+    log = tmp_path / "access.log"
+    log.write_text("\n".join(lines) + "\n")
+    fitter = WorkloadFitter()
+    fitter.add_log(str(log))
+    return fitter.fit()
+
+
+def test_single_request_sessions_have_a_positive_weight(tmp_path):
+    model = fit_log(
+        tmp_path,
+        [
+            LOG_LINE.format(**BROWSER, second=0, path="/home/"),
+            LOG_LINE.format(**API_CLIENT, second=3, path="/openapi/v1/api-info"),
+            LOG_LINE.format(**BROWSER, second=5, path="/apps/"),
+            LOG_LINE.format(**BROWSER, second=12, path="/models/"),
+            LOG_LINE.format(**BROWSER, second=20, path="/docs/"),
+        ],
+    )
+
+    user_types = model["user_types"]
+    # The API client session lasts the median think time of 7 s, and the visiting session 20 s and a mean of 6.7 s
+    assert user_types["api_client"]["weight"] == 1
+    assert user_types["visiting"]["weight"] == 4
+
+
+def test_only_single_request_sessions_have_equal_weights(tmp_path):
+    model = fit_log(
+        tmp_path,
+        [
+            LOG_LINE.format(**BROWSER, second=0, path="/home/"),
+            LOG_LINE.format(**API_CLIENT, second=3, path="/openapi/v1/api-info"),
+        ],
+    )
+
+    assert {user_type: entry["weight"] for user_type, entry in model["user_types"].items()} == {
+        "visiting": 1,
+        "api_client": 1,
+    }